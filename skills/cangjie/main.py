@@ -11,6 +11,74 @@ import urllib.request
 import urllib.parse
 import re
 import os
+import time
+import threading
+import subprocess
+
+# 代码模板与写(xie)共用字典的模板库，缺少字典时只能生成 hello
+DICTIONARY_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dictionary"
+)
+sys.path.insert(0, DICTIONARY_DIR)
+
+try:
+    from templates import generate
+
+    HAS_TEMPLATES = True
+except ImportError:
+    HAS_TEMPLATES = False
+
+# 网络请求走字典的 HTTP 客户端（连接池复用），缺少字典时退回 urllib
+try:
+    from httpclient import fetch
+
+    HAS_HTTP_CLIENT = True
+except ImportError:
+    HAS_HTTP_CLIENT = False
+
+# 读(du) 的预览按识别出的编码解码（GBK 网页不再乱码）
+try:
+    from htmlparse import detect_charset
+
+    HAS_HTML_PARSE = True
+except ImportError:
+    HAS_HTML_PARSE = False
+
+# 存(cun) 与字典共用原子写入（先写临时文件再替换），缺少字典时用简化的实现
+try:
+    from filewriter import write_file, write_files
+
+    HAS_FILE_WRITER = True
+except ImportError:
+    HAS_FILE_WRITER = False
+
+
+# 读(du) 只展示开头的内容，只读取开头这么多字节（足够容纳 500 个汉字）
+PREVIEW_CHARS = 500
+PREVIEW_BYTES = 2048
+
+# 存(cun) 的输出目录（不随当前工作目录变化），每次保存用时间命名，不覆盖之前的结果
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+
+
+def http_get(url, headers=None, timeout=15, max_bytes=None):
+    """GET 请求，返回正文 bytes；指定 max_bytes 时用 Range 请求只取开头"""
+    headers = dict(headers or {})
+    if max_bytes:
+        headers["Range"] = f"bytes=0-{max_bytes - 1}"
+        headers["Accept-Encoding"] = "identity"
+    if HAS_HTTP_CLIENT:
+        response = fetch(url, headers=headers, timeout=timeout, stream=True)
+        with response:
+            body = b""
+            for chunk in response.iter_content():
+                body += chunk
+                if max_bytes and len(body) >= max_bytes:
+                    break
+        return body[:max_bytes] if max_bytes else body
+    req = urllib.request.Request(url, headers=headers)
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return response.read(max_bytes) if max_bytes else response.read()
 
 # --- 内置技能实现 ---
 
@@ -24,11 +92,8 @@ def skill_sou(keywords, limit=10):
     params = {"wd": keywords, "rn": min(limit, 20)}
 
     try:
-        req = urllib.request.Request(
-            f"{url}?{urllib.parse.urlencode(params)}", headers=headers
-        )
-        with urllib.request.urlopen(req, timeout=15) as response:
-            html = response.read().decode("utf-8", errors="replace")
+        body = http_get(f"{url}?{urllib.parse.urlencode(params)}", headers, 15)
+        html = body.decode("utf-8", errors="replace")
 
         results = []
         patterns = [
@@ -64,80 +129,124 @@ def skill_sou(keywords, limit=10):
 
 
 def skill_xie(description):
-    """写作技能 - 直接生成代码"""
-    templates = {
-        "hello": 'print("Hello, World!")',
-        "calculator": """def add(a,b): return a+b
-def sub(a,b): return a-b
-def mul(a,b): return a*b
-def div(a,b): return a/b if b!=0 else "Error"
-print("=== Calculator ===")
-c = input("1 Add 2 Sub 3 Mul 4 Div: ")
-x = float(input("A: ")); y = float(input("B: "))
-print("Result:", [add,sub,mul,div][int(c)-1](x,y))""",
-    }
-
-    desc = description.lower()
-    if "计算" in description or "calculator" in desc:
-        code = templates["calculator"]
-    else:
-        code = templates["hello"]
+    """写作技能 - 从字典的模板库生成代码（模板按需读取）"""
+    if not HAS_TEMPLATES:
+        return {"status": "success", "data": {"result": 'print("Hello, World!")'}}
 
-    return {"status": "success", "data": {"result": code}}
+    generated = generate(description)
+    data = {"result": generated["code"]}
+    if generated["inputs"]:
+        data["inputs"] = list(generated["inputs"])
+    return {"status": "success", "data": data}
 
 
-def skill_yun(code, language="python"):
-    """运行技能 - 直接执行代码"""
+def skill_yun(code, language="python", inputs=None):
+    """运行技能 - 在子进程中执行代码，inputs 按行作为 stdin 提供（默认没有输入）"""
     try:
-        output = []
-        inputs = iter(["3", "10", "2"])  # 默认测试输入
-
-        def mock_input(prompt=""):
-            print(prompt, end="")
-            try:
-                return next(inputs)
-            except StopIteration:
-                return ""
-
-        local_ns = {
-            "print": lambda *args: output.append(" ".join(map(str, args))),
-            "input": mock_input,
-        }
-        exec(code, {"__builtins__": __builtins__}, local_ns)
+        stdin = None if inputs is None else "".join(f"{x}\n" for x in inputs)
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            input=stdin,
+            stdin=subprocess.DEVNULL if stdin is None else None,
+            capture_output=True,
+            timeout=30,
+            encoding="utf-8",
+            errors="replace",
+        )
+        if result.returncode != 0:
+            lines = result.stderr.strip().splitlines()
+            return {"status": "error", "message": lines[-1] if lines else "执行失败"}
         return {
             "status": "success",
-            "data": {"result": "\n".join(output) if output else "执行完成"},
+            "data": {"result": result.stdout.strip() or "执行完成"},
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+def decode_preview(body):
+    """按识别出的编码解码开头的内容（截断处的半个字符丢弃）"""
+    charset = detect_charset(body) if HAS_HTML_PARSE else "utf-8"
+    return body.decode(charset, errors="ignore")[:PREVIEW_CHARS]
+
+
 def skill_du(source):
     """读取技能 - 直接读取URL/文件"""
     if source.startswith("http"):
         try:
-            req = urllib.request.Request(source, headers={"User-Agent": "Mozilla/5.0"})
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                content = resp.read().decode("utf-8", errors="replace")[:500]
+            body = http_get(source, {"User-Agent": "Mozilla/5.0"}, 10, PREVIEW_BYTES)
+            content = decode_preview(body)
             return {"status": "success", "data": {"content": content, "type": "url"}}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     else:
         try:
-            with open(source, "r", encoding="utf-8") as f:
-                return {
-                    "status": "success",
-                    "data": {"content": f.read()[:500], "type": "file"},
-                }
+            with open(source, "rb") as f:
+                content = decode_preview(f.read(PREVIEW_BYTES))
+            return {"status": "success", "data": {"content": content, "type": "file"}}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
 
-def skill_cun(content, path="output.txt"):
-    """保存技能 - 直接写文件"""
+def save_text(path, content):
+    """原子写入一个文本文件"""
+    if HAS_FILE_WRITER:
+        return write_file(path, content)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(temp_file, path)
+
+
+def unique_path(output_dir, stamp, suffix=""):
+    """
+    按时间命名的新文件（suffix 为空时是新目录），同一秒内已经有了时加序号 -2、-3……
+
+    先用 O_EXCL / mkdir 创建出来占住名字，同时保存的多个进程也不会重名。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    count = 1
+    while True:
+        name = stamp if count == 1 else f"{stamp}-{count}"
+        path = os.path.join(output_dir, name + suffix)
+        try:
+            if suffix:
+                os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+            else:
+                os.mkdir(path)
+            return path
+        except FileExistsError:
+            count += 1
+
+
+def skill_cun(data, output_dir=OUTPUT_DIR):
+    """保存技能 - 搜索结果每条存一个文件，其他结果存为一个文件"""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    results = data.get("results")
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(str(content))
+        if isinstance(results, list) and results:
+            directory = unique_path(output_dir, stamp)
+            items = [
+                {
+                    "path": os.path.join(directory, f"{i + 1:03d}.json"),
+                    "content": json.dumps(r, ensure_ascii=False, indent=2),
+                }
+                for i, r in enumerate(results)
+            ]
+            if HAS_FILE_WRITER:
+                # 一次写入全部文件，目录只 fsync 一次
+                errors = [r for r in write_files(items) if r["status"] != "success"]
+                if errors:
+                    return {"status": "error", "message": errors[0]["message"]}
+            else:
+                for item in items:
+                    save_text(item["path"], item["content"])
+            message = f"已保存 {len(items)} 条结果到 {directory}"
+            return {"status": "success", "data": {"result": message}}
+
+        path = unique_path(output_dir, stamp, ".txt")
+        save_text(path, str(data.get("result", data)))
         return {"status": "success", "data": {"result": f"已保存到 {path}"}}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -195,10 +304,10 @@ def execute(params):
             urls = re.findall(r"https?://[^\s\]\)]+", requirement)
             result = skill_du(urls[0] if urls else requirement)
         elif skill == "cun":
-            result = skill_cun(str(context.get("result", context.get("data", {}))))
+            result = skill_cun(context, params.get("output_dir", OUTPUT_DIR))
         elif skill == "yun":
             code = context.get("result", "print('Hello')")
-            result = skill_yun(code)
+            result = skill_yun(code, inputs=context.get("inputs"))
         else:
             continue
 
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容寻址存储 - 仓颉造字计划
+取(qu) 下载的文件按内容的 sha256 存放，同样的内容只存一份；
+另有 URL → sha256 的索引，同一地址或同样内容再次下载时直接从存储中取出，
+优先 reflink（写时复制），其次硬链接，都不支持时复制。
+blob 是只读的（0444），硬链接取出的文件和 blob 是同一个文件，同样只读；
+root 或改过权限的用户仍可能改坏它，所以使用 blob 前都重新核对 sha256，损坏的 blob 会被丢弃。
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(BASE_DIR, ".cache", "blobs")
+URL_DIR = os.path.join(STORE_DIR, "urls")
+
+# 存储总大小上限，超出时按最近使用时间淘汰（已经链接出去的文件不受影响）
+MAX_STORE_BYTES = 2 * 1024 * 1024 * 1024
+
+READ_CHUNK = 1024 * 1024
+
+# Linux 的 FICLONE ioctl（btrfs / xfs 等支持写时复制的文件系统）
+FICLONE = 0x40049409
+
+try:
+    import fcntl
+
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+
+class StoreError(OSError):
+    """文件不能存入存储（下载本身不受影响）"""
+
+
+def blob_path(digest):
+    return os.path.join(STORE_DIR, digest[:2], digest)
+
+
+def url_path(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(URL_DIR, f"{key}.json")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reflink(src, dst):
+    """写时复制的克隆（文件系统不支持时抛出 OSError）"""
+    if not HAS_FCNTL:
+        raise OSError("reflink unsupported")
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+
+def link_or_copy(src, dst, copy=True):
+    """
+    把 src 放到 dst：reflink，不支持时硬链接，再不行时复制；
+    先写临时文件再替换，dst 已存在时覆盖
+
+    Args:
+        copy: False 时只尝试 reflink 和硬链接，都不支持时不动 dst
+
+    Returns:
+        str | None: reflink / hardlink / copy（copy=False 且都不支持时为 None）
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        # 已经是同一个文件（rename 到自己的硬链接上什么也不做，临时文件会留下）
+        return "hardlink"
+    temp_file = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    methods = [("reflink", reflink), ("hardlink", os.link)]
+    if copy:
+        methods.append(("copy", shutil.copyfile))
+    for method, action in methods:
+        try:
+            action(src, temp_file)
+        except OSError:
+            remove_quietly(temp_file)
+            if method == "copy":
+                raise
+            continue
+        os.replace(temp_file, dst)
+        return method
+    return None
+
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def has_blob(digest, size=None):
+    """blob 是否存在（给出 size 时大小也要一致）"""
+    if not digest:
+        return False
+    try:
+        actual = os.path.getsize(blob_path(digest))
+    except OSError:
+        return False
+    return size is None or actual == size
+
+
+def verify_blob(digest):
+    """重新计算 blob 的 sha256，内容已损坏时删除"""
+    if not has_blob(digest):
+        return False
+    if file_sha256(blob_path(digest)) == digest:
+        return True
+    remove_blob(digest)
+    return False
+
+
+def remove_blob(digest):
+    path = blob_path(digest)
+    try:
+        os.chmod(path, 0o644)
+    except OSError:
+        pass
+    remove_quietly(path)
+
+
+def add_file(path, digest=None):
+    """
+    把文件加入存储（同样的内容已经存在且校验无误时不再存一份）
+
+    新内容用 reflink 或硬链接存入，和 path 共用磁盘空间；只能复制时不存入
+    （否则每个下载都要占两份磁盘），和超过 MAX_STORE_BYTES 的文件一样抛出 StoreError。
+    硬链接存入后 path 和 blob 一样变成只读。
+
+    Returns:
+        tuple: (sha256, 是否已经存在)
+    """
+    size = os.path.getsize(path)
+    if size > MAX_STORE_BYTES:
+        raise StoreError(f"File too large for the store: {size} bytes")
+    digest = digest or file_sha256(path)
+    target = blob_path(digest)
+    if has_blob(digest, size) and verify_blob(digest):
+        touch(digest)
+        return digest, True
+    remove_blob(digest)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if link_or_copy(path, target, copy=False) is None:
+        raise StoreError("The store cannot share disk space with this file")
+    os.chmod(target, 0o444)
+    evict(keep=digest)
+    return digest, False
+
+
+def materialize(digest, output, copy=True):
+    """
+    从存储中取出文件到 output
+
+    Args:
+        copy: False 时只在支持 reflink 或硬链接时替换 output（output 已经是同样的内容，
+              复制一遍没有意义）
+
+    Returns:
+        str | None: reflink / hardlink / copy
+    """
+    touch(digest)
+    return link_or_copy(blob_path(digest), output, copy)
+
+
+def touch(digest):
+    """记录最近使用时间（淘汰按 blob 的修改时间）"""
+    try:
+        os.utime(blob_path(digest))
+    except OSError:
+        pass
+
+
+def lookup_url(url):
+    """URL 的索引记录（blob 已被淘汰或大小不符时视为没有）"""
+    try:
+        with open(url_path(url), "r", encoding="utf-8") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record.get("url") != url:
+        return None
+    if not has_blob(record.get("sha256"), record.get("size")):
+        return None
+    return record
+
+
+def remember_url(url, digest, size, headers=None, fresh_until=0):
+    """
+    记录 URL → sha256，以及之后判断内容是否变化用的 ETag / Last-Modified
+    """
+    headers = headers or {}
+    record = {
+        "url": url,
+        "sha256": digest,
+        "size": size,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "fresh_until": fresh_until,
+        "stored": time.time(),
+    }
+    os.makedirs(URL_DIR, exist_ok=True)
+    temp_file = f"{url_path(url)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(temp_file, url_path(url))
+    return record
+
+
+def iter_blobs():
+    if not os.path.isdir(STORE_DIR):
+        return
+    for prefix in os.listdir(STORE_DIR):
+        directory = os.path.join(STORE_DIR, prefix)
+        if len(prefix) != 2 or not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if not name.endswith(".tmp"):
+                yield os.path.join(directory, name)
+
+
+def evict(keep=None):
+    """
+    存储超过上限时按最近使用时间淘汰 blob（URL 索引在查找时自动失效）
+
+    Args:
+        keep: 不淘汰的 blob（刚存入的）
+    """
+    blobs = []
+    total = 0
+    for path in iter_blobs():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        blobs.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    for _, size, path in sorted(blobs):
+        if total <= MAX_STORE_BYTES:
+            break
+        if keep and os.path.basename(path) == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def store_stats():
+    """blob 数和总大小"""
+    count = 0
+    total = 0
+    for path in iter_blobs():
+        count += 1
+        total += os.path.getsize(path)
+    return {"blobs": count, "bytes": total}
+
+
+# 测试
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    print("=== 内容寻址存储 ===")
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "a.txt")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("仓颉造字计划\n" * 1000)
+        digest, existed = add_file(source)
+        print(f"存入: {digest[:16]}... 已存在={existed}")
+        print(f"再次存入: 已存在={add_file(source)[1]}")
+        for name in ("b.txt", "c.txt"):
+            method = materialize(digest, os.path.join(directory, name))
+            print(f"取出 {name}: {method}")
+    print(f"存储: {store_stats()}")
+    if len(sys.argv) > 1:
+        print(f"URL 记录: {lookup_url(sys.argv[1])}")
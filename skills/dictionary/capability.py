@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+能力登记 - 仓颉造字计划
+根据各技能 SKILL.md 中声明的依赖，检测当前环境能运行哪些技能。
+检测结果按解释器和 site-packages 的指纹缓存，同一环境只检测一次。
+"""
+
+import os
+import sys
+import json
+import site
+import hashlib
+import importlib.util
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SKILLS_DIR = os.path.join(BASE_DIR, "characters")
+CACHE_FILE = os.path.join(BASE_DIR, ".cache", "capabilities.json")
+
+# 安装包名与导入名不一致的依赖
+IMPORT_NAMES = {
+    "pillow": "PIL",
+    "beautifulsoup4": "bs4",
+    "speechrecognition": "speech_recognition",
+    "pyyaml": "yaml",
+    "opencv-python": "cv2",
+}
+
+_capabilities = None
+
+
+def read_dependencies(skill):
+    """读取 SKILL.md frontmatter 中声明的依赖"""
+    path = os.path.join(SKILLS_DIR, skill, "SKILL.md")
+    if not os.path.exists(path):
+        return []
+
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    if not lines or lines[0].strip() != "---":
+        return []
+
+    for line in lines[1:]:
+        line = line.strip()
+        if line == "---":
+            break
+        if line.startswith("dependencies:"):
+            value = line[len("dependencies:") :].strip().strip("[]")
+            return [d.strip().strip("'\"") for d in value.split(",") if d.strip()]
+
+    return []
+
+
+def environment_fingerprint():
+    """解释器 + site-packages 的指纹，安装或卸载包后会变化"""
+    paths = list(site.getsitepackages()) if hasattr(site, "getsitepackages") else []
+    if hasattr(site, "getusersitepackages"):
+        paths.append(site.getusersitepackages())
+
+    parts = [sys.executable, sys.version]
+    for path in sorted(set(paths)):
+        if os.path.isdir(path):
+            parts.append(f"{path}:{os.stat(path).st_mtime_ns}")
+
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def probe_dependency(name):
+    """检测依赖能否导入（只查找模块，不真正导入）"""
+    module = IMPORT_NAMES.get(name.lower(), name)
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def list_skills():
+    """列出所有技能目录"""
+    if not os.path.isdir(SKILLS_DIR):
+        return []
+    return sorted(
+        d
+        for d in os.listdir(SKILLS_DIR)
+        if os.path.isfile(os.path.join(SKILLS_DIR, d, "main.py"))
+    )
+
+
+def load_cache():
+    """加载缓存"""
+    if os.path.exists(CACHE_FILE):
+        try:
+            with open(CACHE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def save_cache(cache):
+    """保存缓存"""
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        with open(CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+    except OSError:
+        pass
+
+
+def get_capabilities(refresh=False):
+    """
+    获取所有技能的可用情况
+
+    Returns:
+        dict: {技能名: {"dependencies": [...], "missing": [...], "available": bool}}
+    """
+    global _capabilities
+    if _capabilities is not None and not refresh:
+        return _capabilities
+
+    fingerprint = environment_fingerprint()
+    cache = {} if refresh else load_cache()
+    cached = cache.get("skills", {}) if cache.get("fingerprint") == fingerprint else {}
+
+    skills = {}
+    changed = False
+    for skill in list_skills():
+        deps = read_dependencies(skill)
+        entry = cached.get(skill)
+        # 依赖声明变化时重新检测
+        if not entry or entry.get("dependencies") != deps:
+            missing = [d for d in deps if not probe_dependency(d)]
+            entry = {
+                "dependencies": deps,
+                "missing": missing,
+                "available": not missing,
+            }
+            changed = True
+        skills[skill] = entry
+
+    if changed or set(skills) != set(cached):
+        save_cache({"fingerprint": fingerprint, "skills": skills})
+
+    _capabilities = skills
+    return skills
+
+
+def is_available(skill):
+    """技能的依赖是否都已安装（未登记的技能视为可用，交给执行阶段处理）"""
+    entry = get_capabilities().get(skill)
+    return entry is None or entry.get("available", True)
+
+
+def missing_dependencies(skill):
+    """技能缺少的依赖"""
+    entry = get_capabilities().get(skill) or {}
+    return entry.get("missing", [])
+
+
+# 测试
+if __name__ == "__main__":
+    print("=== 能力登记 ===")
+    print(f"环境指纹: {environment_fingerprint()}")
+    for name, info in get_capabilities(refresh="--refresh" in sys.argv).items():
+        mark = "OK" if info["available"] else f"缺少 {', '.join(info['missing'])}"
+        print(f"  {name}: {mark}")
@@ -47,6 +47,28 @@ def compare_data(data1, data2):
     }
 
 
+def read_contents(data):
+    """读(du) 批量读取 (sources) 的结果 → [(来源, 正文)]，只取读取成功的"""
+    if not isinstance(data, dict) or not isinstance(data.get("results"), list):
+        return []
+    return [
+        (r.get("source"), r["data"].get("content", ""))
+        for r in data["results"]
+        if isinstance(r, dict) and isinstance(r.get("data"), dict)
+    ]
+
+
+def compare_sources(contents):
+    """逐个与第一个来源对比"""
+    first_source, first_text = contents[0]
+    return {
+        "comparisons": [
+            {"sources": [first_source, source], **compare_texts(first_text, text)}
+            for source, text in contents[1:]
+        ]
+    }
+
+
 def execute(params):
     action = params.get("action", "compare")
 
@@ -55,6 +77,10 @@ def execute(params):
         text2 = params.get("text2", "")
         if text1 and text2:
             return {"status": "success", "data": compare_texts(text1, text2)}
+        # 上一步是读(du) 批量读取时，对比读到的各个来源
+        contents = read_contents(params.get("data"))
+        if len(contents) >= 2:
+            return {"status": "success", "data": compare_sources(contents)}
         return {
             "status": "success",
             "data": compare_data(params.get("data1", {}), params.get("data2", {})),
@@ -8,17 +8,51 @@ import sys
 import json
 import os
 
+# --- 共享模块（成本规划 / 技能统计） ---
+CHARS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(CHARS_DIR))
+
+try:
+    from planner import choose_chain
+
+    HAS_PLANNER = True
+except ImportError:
+    HAS_PLANNER = False
+
+try:
+    from capability import is_available, missing_dependencies
+except ImportError:
+
+    def is_available(skill):
+        return True
+
+    def missing_dependencies(skill):
+        return []
+
+
+try:
+    from memory import get_skill_stats
+except ImportError:
+
+    def get_skill_stats():
+        return {}
+
+
 # --- Skill Registry (技能注册表) ---
-# 映射意图类型到可用技能
-INTENT_TO_SKILLS = {
-    "search": ["sou"],
-    "read": ["du"],
-    "write": ["xie"],
-    "execute": ["sou"],  # 通用执行默认使用搜索
-    "analyze": ["bi", "lian"],
-    "create": ["xie", "hua"],
-    "modify": ["gai"],
-    "delete": ["jian"],
+# 映射意图类型到候选技能链，由成本规划从中选出期望耗时最短的一条
+# 每条候选链都要能单独完成该意图；分工不同的技能（如比和炼）放在同一条链中
+INTENT_TO_CHAINS = {
+    "search": [["sou"]],
+    "read": [["du"]],
+    "write": [["xie"]],
+    "execute": [["sou"]],  # 通用执行默认使用搜索
+    "analyze": [["bi", "lian"]],
+    "create": [["xie", "hua"]],
+    "modify": [["gai"]],
+    "delete": [["jian"]],
+    "send": [["fa"]],
+    "remember": [["yi_mem"]],  # 记(ji) 是写日志，不是存入记忆
+    "control": [["kong"]],
 }
 
 # 实体类型到技能的映射
@@ -31,24 +65,43 @@ ENTITY_TO_SKILLS = {
 
 
 # --- Core Logic ---
-def match_skills(intent, entities, constraints):
+def select_chain(candidates, skill_stats=None):
+    """从候选技能链中选择期望完成时间最短的一条"""
+    # 只在技能都存在且依赖齐全的候选中挑选
+    runnable = [
+        c
+        for c in candidates
+        if all(check_skill_exists(s) and is_available(s) for s in c)
+    ]
+    candidates = runnable or candidates
+
+    if not candidates:
+        return [], None
+    if not HAS_PLANNER:
+        return list(candidates[0]), None
+
+    return choose_chain(candidates, skill_stats)
+
+
+def match_skills(intent, entities, constraints, skill_stats=None):
     """匹配适合的技能"""
     plan = []
     used_skills = set()
 
-    # 1. 根据意图选择主技能
+    # 1. 根据意图选择主技能链
     intent_type = intent.get("type", "execute")
-    if intent_type in INTENT_TO_SKILLS:
-        for skill in INTENT_TO_SKILLS[intent_type]:
-            if skill not in used_skills:
-                plan.append(
-                    {
-                        "skill": skill,
-                        "reason": f"匹配意图类型: {intent_type}",
-                        "priority": 1,
-                    }
-                )
-                used_skills.add(skill)
+    chain, cost = select_chain(INTENT_TO_CHAINS.get(intent_type, []), skill_stats)
+    cost_info = f"，预计耗时 {cost:.1f}s" if cost is not None else ""
+    for skill in chain:
+        if skill not in used_skills:
+            plan.append(
+                {
+                    "skill": skill,
+                    "reason": f"匹配意图类型: {intent_type}{cost_info}",
+                    "priority": 1,
+                }
+            )
+            used_skills.add(skill)
 
     # 2. 根据实体选择辅助技能
     for entity in entities:
@@ -83,10 +136,13 @@ def check_skill_exists(skill_name):
     return os.path.isdir(skill_dir)
 
 
-def generate_plan(intent, entities, constraints):
+def generate_plan(intent, entities, constraints, skill_stats=None):
     """生成执行计划"""
+    if skill_stats is None:
+        skill_stats = get_skill_stats()
+
     # 匹配技能
-    skill_matches = match_skills(intent, entities, constraints)
+    skill_matches = match_skills(intent, entities, constraints, skill_stats)
 
     # 检查哪些技能存在
     available_skills = []
@@ -94,10 +150,13 @@ def generate_plan(intent, entities, constraints):
 
     for match in skill_matches:
         skill = match["skill"]
-        if check_skill_exists(skill):
-            available_skills.append(match)
-        else:
+        if not check_skill_exists(skill):
             unavailable_skills.append(skill)
+        elif not is_available(skill):
+            missing = ", ".join(missing_dependencies(skill))
+            unavailable_skills.append(f"{skill}(缺少依赖: {missing})")
+        else:
+            available_skills.append(match)
 
     # 构建步骤
     plan = []
@@ -120,13 +179,27 @@ def generate_plan(intent, entities, constraints):
                 auto_input = {"description": requirement, "text": requirement}
             else:
                 auto_input = {"description": "generate content", "text": "content"}
-        elif skill in ["du", "cun"]:
+        elif skill == "ji":
+            auto_input = {"message": intent.get("keywords", [""])[0]}
+        elif skill == "yi_mem":
+            auto_input = {"content": intent.get("keywords", [""])[0]}
+        elif skill == "du":
+            # 读技能的输入是 source，可以是文件或URL；多个时用 sources 一次并发读取
+            sources = []
+            for e in entities:
+                value = e.get("value", "")
+                if e.get("type") in ["file", "url"] and value and value not in sources:
+                    sources.append(value)
+            if len(sources) > 1:
+                auto_input = {"sources": sources}
+            elif sources:
+                auto_input = {"source": sources[0]}
+        elif skill == "cun":
             # 从实体中提取值
-            if entities:
-                for e in entities:
-                    if e.get("type") == "file":
-                        auto_input = {"path": e.get("value", "")}
-                        break
+            for e in entities:
+                if e.get("type") == "file":
+                    auto_input = {"path": e.get("value", "")}
+                    break
 
         plan.append(
             {
@@ -157,7 +230,7 @@ def execute(params):
     if not intent:
         return {"status": "error", "message": "InvalidInput: intent is required"}
 
-    result = generate_plan(intent, entities, constraints)
+    result = generate_plan(intent, entities, constraints, params.get("skill_stats"))
     return {"status": "success", "data": result}
 
 
@@ -1,33 +1,139 @@
 #!/usr/bin/env python3
 """
 存 (cun) - 保存内容到文件
+写入是原子的（先写临时文件再替换，见 filewriter.py），可以边写边压缩（gzip / lzma）；
+传入 items 时在一次调用中并发保存多个文件，例如把每条搜索结果各存一个文件。
 """
 
 import sys
 import json
 import os
+import re
+import time
 
+# --- 共享模块（原子写入、全文索引） ---
+CHARS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(CHARS_DIR))
+
+from filewriter import COMPRESSIONS, FSYNC_POLICIES, MAX_WORKERS
+from filewriter import write_file, write_files
+
+# 保存的文件加入本地全文索引，供搜离线检索
+try:
+    from textindex import index_files
+
+    HAS_TEXT_INDEX = True
+except ImportError:
+    HAS_TEXT_INDEX = False
+
+# 计划中引用上一步结果的占位符: ${data} / ${data.results}
+DATA_PLACEHOLDER = re.compile(r"^\$\{data((?:\.\w+)*)\}$")
+
+
+def resolve(value, params):
+    """把 ${data...} 占位符换成上一步的结果（xing 传入的 data），没有时原样返回"""
+    match = DATA_PLACEHOLDER.match(value) if isinstance(value, str) else None
+    if not match or "data" not in params:
+        return value
+    resolved = params["data"]
+    for key in match.group(1).split(".")[1:]:
+        if not isinstance(resolved, dict) or key not in resolved:
+            return value
+        resolved = resolved[key]
+    return resolved
+
+
+def add_to_index(paths):
+    """未压缩的文件在一个事务中加入全文索引，索引失败不影响写入"""
+    if not HAS_TEXT_INDEX:
+        return
+    try:
+        index_files([os.path.abspath(path) for path in paths])
+    except Exception:
+        pass
 
-def execute(params):
-    content = params.get("content", "")
-    path = params.get("path", "").strip()
 
-    if not path:
-        return {"status": "error", "message": "Path cannot be empty"}
+def item_path(index, content, compress, directory):
+    """没有指定路径的条目按序号命名：文本 001.txt，其他内容 001.json"""
+    suffix = ".txt" if isinstance(content, str) else ".json"
+    if compress:
+        suffix += COMPRESSIONS.get(compress, "")
+    return os.path.join(directory, f"{index + 1:03d}{suffix}")
 
-    mode = params.get("mode", "write")
+
+def save_items(items, params):
+    """批量保存：items 中每一项是 {"content", "path"?, ...}，或者直接是要保存的内容"""
+    directory = params.get("directory", "").strip()
+    defaults = {"mode": params.get("mode", "write"), "compress": params.get("compress")}
+
+    specs = []
+    for index, item in enumerate(items):
+        spec = dict(item) if isinstance(item, dict) and "content" in item else {}
+        spec.setdefault("content", item)
+        for key, value in defaults.items():
+            spec.setdefault(key, value)
+        path = str(spec.get("path") or "").strip()
+        if not path:
+            if not directory:
+                return {"status": "error", "message": "Path or directory required"}
+            path = item_path(index, spec["content"], spec["compress"], directory)
+        elif directory and not os.path.isabs(path):
+            path = os.path.join(directory, path)
+        spec["path"] = path
+        specs.append(spec)
+
+    started = time.monotonic()
+    workers = max(1, int(params.get("workers", MAX_WORKERS)))
+    results = write_files(specs, params.get("fsync", "batch"), workers)
+    written = [r for r in results if r["status"] == "success"]
+    add_to_index(r["path"] for r in written if not r["data"]["compress"])
+
+    if specs and not written:
+        return {"status": "error", "message": results[0]["message"]}
+    return {
+        "status": "success",
+        "data": {
+            "directory": directory,
+            "count": len(results),
+            "succeeded": len(written),
+            "failed": len(results) - len(written),
+            "bytes_written": sum(r["data"]["bytes_written"] for r in written),
+            "elapsed": round(time.monotonic() - started, 3),
+            "results": results,
+        },
+    }
+
+
+def execute(params):
+    # 批量保存默认每个目录只 fsync 一次；单个文件默认不 fsync（仍是原子替换），
+    # 不比直接写文件慢，需要落盘保证时传 fsync
+    fsync = params.get("fsync", "batch" if "items" in params else "never")
+    if fsync not in FSYNC_POLICIES:
+        return {"status": "error", "message": f"Unsupported fsync policy: {fsync}"}
 
     try:
-        dir_path = os.path.dirname(path)
-        if dir_path:
-            os.makedirs(dir_path, exist_ok=True)
-        write_mode = "a" if mode == "append" else "w"
-        with open(path, write_mode, encoding="utf-8") as f:
-            bytes_written = f.write(content)
-        return {
-            "status": "success",
-            "data": {"path": path, "bytes_written": bytes_written},
-        }
+        if "items" in params:
+            items = resolve(params["items"], params)
+            if not isinstance(items, list):
+                return {"status": "error", "message": "items must be a list"}
+            return save_items(items, params)
+
+        content = resolve(params.get("content", ""), params)
+        path = params.get("path", "").strip()
+
+        if not path:
+            return {"status": "error", "message": "Path cannot be empty"}
+
+        data = write_file(
+            path,
+            content,
+            params.get("mode", "write"),
+            params.get("compress"),
+            "always" if fsync == "batch" else fsync,
+        )
+        if not data["compress"]:
+            add_to_index([path])
+        return {"status": "success", "data": data}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
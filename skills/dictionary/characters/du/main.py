@@ -1,45 +1,340 @@
 #!/usr/bin/env python3
 """
 读 (du) - 读取URL或本地文件（纯Python）
+自动识别编码（BOM、Content-Type、<meta charset>、内容猜测），网页只返回标题和正文文字。
+支持按字节范围 (offset/max_bytes) 或按行 (lines) 读取：
+大文件用 mmap 只读取需要的部分，URL 用 HTTP Range 请求只下载需要的部分。
+sources 传入多个来源时并发读取，结果按顺序返回。
 """
 
 import sys
 import json
 import os
-from urllib.request import urlopen
-from urllib.error import URLError
+import mmap
+import codecs
+import time
+import threading
+import mimetypes
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
 
+# --- 共享模块（HTTP 客户端和缓存） ---
+CHARS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(CHARS_DIR))
 
-def read_url(source):
+from httpcache import entry_paths, fetch
+from httpclient import fetch as fetch_stream
+from htmlparse import detect_charset, read_document
+
+# 超过这个大小的文件用 mmap 读取，只有访问到的页会从磁盘读入
+MMAP_THRESHOLD = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# 批量读取 (sources) 的线程数，以及同一主机同时进行的请求数
+MAX_WORKERS = 8
+PER_HOST_LIMIT = 2
+
+# 读到的内容可以加入本地全文索引（index 为 true 时），供搜离线检索
+try:
+    from textindex import index_documents
+
+    HAS_TEXT_INDEX = True
+except ImportError:
+    HAS_TEXT_INDEX = False
+
+
+def add_to_index(documents):
+    """在一个事务中加入全文索引（索引失败不影响读取结果）"""
+    documents = [d for d in documents or [] if d["content"]]
+    if not HAS_TEXT_INDEX or not documents:
+        return
     try:
-        with urlopen(source, timeout=10) as resp:
-            content = resp.read().decode("utf-8", errors="ignore")
-        return {
-            "status": "success",
-            "data": {"content": content, "type": "url", "length": len(content)},
-        }
-    except URLError as e:
-        return {"status": "error", "message": f"Network error: {str(e)}"}
+        index_documents(documents)
+    except Exception:
+        pass
+
+
+def parse_lines(spec):
+    """
+    行范围 → (跳过的行数, 读取的行数)
+
+    lines 可以是整数 N（前 N 行）、[起始行, 结束行] 或 "起始行-结束行"（从 1 开始，含两端）
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, str) and "-" in spec:
+        spec = spec.split("-", 1)
+    if isinstance(spec, (list, tuple)):
+        first, last = int(spec[0]), int(spec[1])
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid lines range: {spec}")
+        return first - 1, last - first + 1
+    count = int(spec)
+    if count < 1:
+        raise ValueError(f"Invalid lines: {spec}")
+    return 0, count
+
+
+def decode_part(data, truncated, content_type=None):
+    """
+    按识别出的编码解码读到的部分（整段内容参与猜测，同 read_document）
+
+    UTF-8 时跳过开头半个字符；截断时末尾不完整的字符留给下一次读取。
+
+    Returns:
+        tuple: (文本, 用到的字节数, 编码)
+    """
+    start = 0
+    while start < min(3, len(data)) and 0x80 <= data[start] < 0xC0:
+        start += 1
+    encoding = detect_charset(data[start:], content_type)
+    if not encoding.startswith("utf-8"):
+        start = 0
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    text = decoder.decode(data[start:], final=not truncated)
+    return text, len(data) - len(decoder.getstate()[0]), encoding
+
+
+def find_lines(buffer, offset, skip, count, limit):
+    """
+    在 buffer（bytes 或 mmap）中从 offset 开始跳过 skip 行、取 count 行
+
+    Returns:
+        tuple: (起始位置, 结束位置)
+    """
+    start = offset
+    for _ in range(skip):
+        newline = buffer.find(b"\n", start)
+        if newline < 0:
+            return len(buffer), len(buffer)
+        start = newline + 1
+    end = start
+    for _ in range(count):
+        newline = buffer.find(b"\n", end)
+        if newline < 0:
+            end = len(buffer)
+            break
+        end = newline + 1
+    if limit is not None:
+        end = min(end, start + limit)
+    return start, end
+
+
+def open_buffer(f, size):
+    """小文件直接读入内存，大文件用 mmap（只读取访问到的页）"""
+    if size >= MMAP_THRESHOLD:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return f.read()
+
+
+def iter_file(path, offset=0, max_bytes=None, lines=None, info=None):
+    """
+    流式读取文件的一个范围（bytes 块）
+
+    Args:
+        lines: parse_lines() 的结果，按行读取
+        info: 可选的 dict，写入文件大小 size 和范围 start/end
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        buffer = open_buffer(f, size)
+        try:
+            offset = min(max(0, offset), size)
+            if lines:
+                start, end = find_lines(buffer, offset, lines[0], lines[1], max_bytes)
+            else:
+                start = offset
+                end = size if max_bytes is None else min(size, offset + max_bytes)
+            if info is not None:
+                info.update(size=size, start=start, end=end)
+            for position in range(start, end, CHUNK_SIZE):
+                yield buffer[position : min(end, position + CHUNK_SIZE)]
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+
+def range_header(offset, max_bytes):
+    if max_bytes is None:
+        return f"bytes={offset}-"
+    return f"bytes={offset}-{offset + max_bytes - 1}"
+
+
+def content_size(response):
+    """资源的总大小：206 取 Content-Range 中的总长度，200 取 Content-Length"""
+    content_range = response.headers.get("Content-Range", "")
+    if response.status == 206 and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+
+def iter_url(url, offset=0, max_bytes=None, timeout=10, info=None):
+    """
+    流式读取 URL 的一个范围（bytes 块），用 Range 请求只下载需要的部分
+
+    服务端不支持 Range（返回 200）时边读边跳过 offset 之前的内容，读够就断开。
+    """
+    headers = {"Accept-Encoding": "identity"}
+    if offset or max_bytes is not None:
+        headers["Range"] = range_header(offset, max_bytes)
+    response = fetch_stream(url, headers=headers, timeout=timeout, stream=True)
+    with response:
+        skip = offset if response.status == 200 else 0
+        if info is not None:
+            info.update(
+                size=content_size(response),
+                status=response.status,
+                content_type=response.headers.get("Content-Type"),
+            )
+        remaining = max_bytes
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if skip:
+                dropped = min(skip, len(chunk))
+                chunk, skip = chunk[dropped:], skip - dropped
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            if chunk:
+                yield chunk
+            if remaining == 0:
+                break
+
+
+def take_lines(chunks, skip, count):
+    """
+    从 bytes 块中跳过 skip 行、取 count 行，取够就停止读取
+
+    Returns:
+        tuple: (取出的行在读到的内容中的起始位置, 取出的内容)
+    """
+    parts = []
+    newlines = 0
+    for chunk in chunks:
+        parts.append(chunk)
+        newlines += chunk.count(b"\n")
+        if newlines >= skip + count:
+            break
+    data = b"".join(parts)
+    start, end = find_lines(data, 0, skip, count, None)
+    return start, data[start:end]
+
+
+def iter_source(source, offset=0, max_bytes=None, lines=None, info=None):
+    """
+    流式读取的统一入口，供下游在 Python 中逐块处理大文件或大页面
+
+    Yields:
+        bytes: 内容块（未解码）
+    """
+    if source.startswith(("http://", "https://")):
+        chunks = iter_url(source, offset, max_bytes, info=info)
+        if lines:
+            start, data = take_lines(chunks, lines[0], lines[1])
+            chunks.close()
+            if info is not None:
+                info["start"] = offset + start
+            yield data
+        else:
+            yield from chunks
+    else:
+        yield from iter_file(source, offset, max_bytes, lines, info)
+
+
+def read_range(source, source_type, offset=0, max_bytes=None, lines=None):
+    """按范围读取，返回内容和位置信息（next_offset 可直接用于读取下一段）"""
+    lines = parse_lines(lines)
+    offset = int(offset or 0)
+    max_bytes = None if max_bytes is None else int(max_bytes)
+    # 负数不悄悄当成 0（否则 offset 写错时会读出整个文件）
+    if offset < 0:
+        return {"status": "error", "message": "offset must not be negative"}
+    if max_bytes is not None and max_bytes < 0:
+        return {"status": "error", "message": "max_bytes must not be negative"}
+    if source_type == "file" and not os.path.exists(source):
+        return {"status": "error", "message": f"File not found: {source}"}
+
+    info = {}
+    try:
+        data = b"".join(iter_source(source, offset, max_bytes, lines, info))
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+    start = info.get("start", offset)
+    size = info.get("size")
+    truncated = size is not None and start + len(data) < size
+    content, used, encoding = decode_part(data, truncated, info.get("content_type"))
+    return {
+        "status": "success",
+        "data": {
+            "content": content,
+            "type": source_type,
+            "length": len(content),
+            "encoding": encoding,
+            "offset": start,
+            "bytes": used,
+            "size": size,
+            "next_offset": start + used,
+            "truncated": truncated,
+        },
+    }
+
+
+def document_result(chunks, source_type, content_type=None, raw=False):
+    """
+    识别编码并解码；网页只返回标题和正文文字（raw 为 True 时附带原始 HTML）
+    """
+    document = read_document(chunks, content_type, keep_raw=raw)
+    data = {
+        "content": document["text"],
+        "type": source_type,
+        "length": len(document["text"]),
+        "encoding": document["encoding"],
+        "format": "text" if document["html"] else "plain",
+        "raw_bytes": document["bytes"],
+    }
+    if document["html"]:
+        data["title"] = document["title"]
+    if raw:
+        data["raw"] = document["raw"]
+    return data
+
+
+def read_url(source, refresh=False, raw=False):
+    try:
+        response = fetch(source, timeout=10, refresh=refresh)
+        data = document_result(
+            response.iter_content(), "url", response.headers.get("Content-Type"), raw
+        )
+        data["cache"] = response.cache_status
+        # 原始页面在 HTTP 缓存中，需要时可以直接读取
+        raw_path = entry_paths(source)[1]
+        data["raw_path"] = raw_path if os.path.exists(raw_path) else None
+        return {"status": "success", "data": data}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
-def read_file(source):
+def read_file(source, raw=False):
     try:
         if not os.path.exists(source):
             return {"status": "error", "message": f"File not found: {source}"}
-        with open(source, "r", encoding="utf-8") as f:
-            content = f.read()
-        return {
-            "status": "success",
-            "data": {"content": content, "type": "file", "length": len(content)},
-        }
+        content_type = mimetypes.guess_type(source)[0]
+        data = document_result(iter_file(source), "file", content_type, raw)
+        return {"status": "success", "data": data}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
-def execute(params):
-    source = params.get("source", "").strip()
+def read_source(source, params, documents=None):
+    """
+    读取单个来源（params 中的 type/refresh/raw/offset/max_bytes/lines 对它生效）
+
+    Args:
+        documents: 不为 None 时把读到的完整内容加入这个列表，由调用方统一加入全文索引
+    """
+    source = str(source or "").strip()
     if not source:
         return {"status": "error", "message": "Source cannot be empty"}
 
@@ -47,10 +342,126 @@ def execute(params):
     if source_type == "auto":
         source_type = "url" if source.startswith(("http://", "https://")) else "file"
 
+    # 指定了范围时只读取需要的部分（不经过缓存，也不加入全文索引）
+    ranged = {k: params.get(k) for k in ("offset", "max_bytes", "lines")}
+    if any(value is not None for value in ranged.values()):
+        return read_range(source, source_type, **ranged)
+
     if source_type == "url":
-        return read_url(source)
+        result = read_url(
+            source, params.get("refresh", False), params.get("raw", False)
+        )
+        key = source
     else:
-        return read_file(source)
+        result = read_file(source, params.get("raw", False))
+        key = os.path.abspath(source)
+
+    if documents is not None and result["status"] == "success":
+        data = result["data"]
+        documents.append(
+            {
+                "source": key,
+                "content": data["content"],
+                "title": data.get("title"),
+                "kind": source_type,
+            }
+        )
+    return result
+
+
+def host_key(source):
+    """同一主机的 URL 共用一组并发名额，本地文件不限主机"""
+    if source.startswith(("http://", "https://")):
+        return urlsplit(source).netloc.lower()
+    return None
+
+
+def read_sources(sources, params):
+    """
+    并发读取多个来源，结果按 sources 的顺序返回
+
+    每一项可以是来源字符串，也可以是 {"source": ..., 其他参数} 覆盖共用的参数。
+    URL 和文件在同一个线程池中读取，同一主机同时最多 PER_HOST_LIMIT 个请求；
+    重复的来源只读取一次；要加入全文索引的内容全部读完后在一个事务中写入。
+    """
+    items = []
+    for item in sources:
+        options = dict(params)
+        options.pop("sources", None)
+        if isinstance(item, dict):
+            options.update(item)
+        else:
+            options["source"] = item
+        items.append(options)
+
+    slots = {}
+    for options in items:
+        host = host_key(str(options.get("source") or ""))
+        if host and host not in slots:
+            slots[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+
+    documents = []
+
+    def read(options):
+        started = time.time()
+        slot = slots.get(host_key(str(options.get("source") or "")))
+        collect = documents if options.get("index") else None
+        if slot:
+            with slot:
+                result = read_source(options.get("source"), options, collect)
+        else:
+            result = read_source(options.get("source"), options, collect)
+        return result, round(time.time() - started, 3)
+
+    keys = [
+        json.dumps(options, ensure_ascii=False, sort_keys=True, default=str)
+        for options in items
+    ]
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(items))) as pool:
+        futures = {}
+        for key, options in zip(keys, items):
+            if key not in futures:
+                futures[key] = pool.submit(read, options)
+        outcomes = [futures[key].result() for key in keys]
+    add_to_index(documents)
+
+    results = []
+    for options, (result, elapsed) in zip(items, outcomes):
+        entry = {"source": options.get("source"), "status": result["status"]}
+        if result["status"] == "success":
+            entry["data"] = result["data"]
+        else:
+            entry["message"] = result.get("message", "")
+        entry["elapsed"] = elapsed
+        results.append(entry)
+
+    succeeded = sum(1 for r in results if r["status"] == "success")
+    if not succeeded:
+        errors = "; ".join(f"{r['source']}: {r['message']}" for r in results)
+        return {"status": "error", "message": f"All sources failed: {errors}"[:500]}
+    return {
+        "status": "success",
+        "data": {
+            "results": results,
+            "count": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "elapsed": round(time.time() - started, 3),
+        },
+    }
+
+
+def execute(params):
+    sources = params.get("sources")
+    if sources:
+        if not isinstance(sources, list):
+            return {"status": "error", "message": "Sources must be a list"}
+        return read_sources(sources, params)
+    documents = [] if params.get("index") else None
+    result = read_source(params.get("source", ""), params, documents)
+    add_to_index(documents)
+    return result
 
 
 if __name__ == "__main__":
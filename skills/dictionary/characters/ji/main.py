@@ -1,34 +1,71 @@
 #!/usr/bin/env python3
 """
 记 (ji) - 记录日志
+每条日志是一行 JSON，经带缓冲的写入器写入（见 jsonlog.py），
+文件过大或跨过时间周期时自动轮转；messages 可以一次记录多条。
 """
 
 import sys
 import json
 import os
-from datetime import datetime
 
+# --- 共享模块（结构化日志） ---
+CHARS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(CHARS_DIR))
+
+from jsonlog import BACKUP_COUNT, MAX_BYTES, get_writer, make_record
 
-def execute(params):
-    message = params.get("message", "").strip()
-    if not message:
-        return {"status": "error", "message": "Message cannot be empty"}
 
-    log_file = params.get("file", "logs.txt")
+def build_records(params):
+    """message 或 messages（字符串，或 {"message", "level"?, "fields"?}）→ 日志记录"""
     level = params.get("level", "info")
+    fields = params.get("fields") or {}
+    if not isinstance(fields, dict):
+        raise ValueError("fields must be an object")
 
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_line = f"[{timestamp}] [{level.upper()}] {message}\n"
+    entries = params.get("messages")
+    if entries is None:
+        entries = [params.get("message", "")]
+    elif not isinstance(entries, list):
+        raise ValueError("messages must be a list")
+
+    records = []
+    for entry in entries:
+        entry = entry if isinstance(entry, dict) else {"message": entry}
+        message = str(entry.get("message", "")).strip()
+        if not message:
+            raise ValueError("Message cannot be empty")
+        record_fields = {**fields, **(entry.get("fields") or {})}
+        records.append(make_record(message, entry.get("level", level), record_fields))
+    return records
 
-    try:
-        dir_path = os.path.dirname(log_file)
-        if dir_path:
-            os.makedirs(dir_path, exist_ok=True)
 
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(log_line)
+def execute(params):
+    log_file = params.get("file", "logs.jsonl")
+
+    try:
+        records = build_records(params)
+        writer = get_writer(
+            log_file,
+            max_bytes=int(params.get("max_bytes", MAX_BYTES)),
+            when=params.get("rotate"),
+            backup_count=int(params.get("backup_count", BACKUP_COUNT)),
+            compress=bool(params.get("compress", False)),
+        )
+        written = sum(writer.write(record) for record in records)
+        # 每次调用结束时写入一次（同一次调用的多条记录只写一次文件）
+        rotated = writer.flush()
 
-        return {"status": "success", "data": {"logged": True, "file": log_file}}
+        return {
+            "status": "success",
+            "data": {
+                "logged": True,
+                "count": len(records),
+                "bytes": written,
+                "file": log_file,
+                "rotated": rotated,
+            },
+        }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
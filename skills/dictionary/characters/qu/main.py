@@ -1,13 +1,113 @@
 #!/usr/bin/env python3
 """
-取 (qu) - 纯Python下载（urllib内置库）
+取 (qu) - 纯Python下载（不依赖第三方库）
+服务端支持 Range 时分段并行下载，中断后从断点继续（见 downloader.py）；
+下载的文件存入内容寻址存储（见 blobstore.py），同一地址或同样的内容再次下载时
+直接从存储中 reflink、硬链接或复制出来，不再经过网络。
 """
 
 import sys
 import json
 import os
-from urllib.request import urlretrieve
-from urllib.error import URLError
+import time
+
+# --- 共享模块（HTTP 客户端、下载器和存储） ---
+CHARS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(CHARS_DIR))
+
+from httpclient import HTTPError, request
+from httpcache import freshness_deadline
+from downloader import PART_SUFFIX, SEGMENTS, parse_checksum, verify_checksum
+from downloader import download as segmented_download
+from blobstore import add_file, lookup_url, materialize, remember_url, verify_blob
+
+# 按原样保存文件，不让服务端压缩传输
+HEADERS = {"Accept-Encoding": "identity"}
+
+
+def revalidate(url, record, timeout):
+    """
+    向服务端确认地址的内容没有变化（条件请求）
+
+    Returns:
+        str | None: revalidated（304）/ stale（网络出错，使用存储中的内容）/ None（内容已变化）
+    """
+    headers = dict(HEADERS)
+    if record.get("etag"):
+        headers["If-None-Match"] = record["etag"]
+    if record.get("last_modified"):
+        headers["If-Modified-Since"] = record["last_modified"]
+    if len(headers) == len(HEADERS):
+        return None
+    try:
+        response = request("GET", url, headers=headers, timeout=timeout, stream=True)
+    except HTTPError:
+        return "stale"
+    response.close()
+    if response.status != 304:
+        return None
+    remember_url(
+        url,
+        record["sha256"],
+        record["size"],
+        {"ETag": record.get("etag"), "Last-Modified": record.get("last_modified")},
+        freshness_deadline(response.headers),
+    )
+    return "revalidated"
+
+
+def from_store(url, output, checksum, timeout):
+    """
+    存储中已有时直接取出：checksum 是 sha256 且内容已存在时不发任何请求；
+    地址下载过时，新鲜的直接取出，过期的先发条件请求确认
+
+    Returns:
+        dict | None: 结果数据，存储中没有可用的内容时为 None
+    """
+    parsed = parse_checksum(checksum)
+    record = lookup_url(url)
+    if parsed and parsed[0] == "sha256" and verify_blob(parsed[1]):
+        digest, status = parsed[1], "hit"
+    elif record and verify_blob(record["sha256"]):
+        digest = record["sha256"]
+        if record.get("fresh_until", 0) > time.time():
+            status = "hit"
+        else:
+            status = revalidate(url, record, timeout)
+            if status is None:
+                return None
+    else:
+        return None
+
+    started = time.monotonic()
+    link = materialize(digest, output)
+    return {
+        "path": output,
+        "size": os.path.getsize(output),
+        "store": status,
+        "link": link,
+        "sha256": digest,
+        "downloaded": 0,
+        "elapsed": round(time.monotonic() - started, 3),
+        "checksum": verify_checksum(output, checksum),
+    }
+
+
+def store_download(url, output, size, headers):
+    """
+    下载完成的文件存入存储，output 与存储共用磁盘空间（reflink 或硬链接）；
+    存不进存储（只能复制，或超过存储上限）时保留下载的文件，不存入存储
+
+    Returns:
+        dict: {"store", "link", "sha256"}
+    """
+    try:
+        digest, existed = add_file(output)
+        link = materialize(digest, output, copy=False) or "copy"
+        remember_url(url, digest, size, headers, freshness_deadline(headers))
+    except OSError:
+        return {"store": "skipped", "link": None, "sha256": None}
+    return {"store": "dedup" if existed else "miss", "link": link, "sha256": digest}
 
 
 def execute(params):
@@ -22,12 +122,29 @@ def execute(params):
         if dir_path:
             os.makedirs(dir_path, exist_ok=True)
 
-        urlretrieve(url, output)
-        size = os.path.getsize(output)
+        checksum = params.get("checksum")
+        timeout = params.get("timeout")
+        parse_checksum(checksum)
+
+        # 有未完成的下载时续传，refresh 时重新下载
+        resuming = os.path.exists(output + PART_SUFFIX)
+        if not resuming and not params.get("refresh", False):
+            data = from_store(url, output, checksum, timeout)
+            if data:
+                return {"status": "success", "data": data}
+
+        result = segmented_download(
+            url,
+            output,
+            segments=params.get("segments", SEGMENTS),
+            checksum=checksum,
+            headers=HEADERS,
+            timeout=timeout,
+        )
+        headers = result.pop("headers")
 
-        return {"status": "success", "data": {"path": output, "size": size}}
-    except URLError as e:
-        return {"status": "error", "message": f"Network error: {str(e)}"}
+        result.update(store_download(url, output, result["size"], headers))
+        return {"status": "success", "data": result}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -7,106 +7,275 @@
 
 import sys
 import json
-import urllib.request
+import time
+import queue
+import threading
 import urllib.parse
-import re
+import os
 
+# --- 共享模块（HTTP 客户端和缓存） ---
+CHARS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(CHARS_DIR))
+
+# 结果页按服务端的缓存头缓存，相同关键词的重复搜索可以不发请求
+from httpcache import iter_cached
+from htmlparse import RESULT_CLASSES, normalize_url, parse_results
+
+# 本地全文索引（离线时也能返回真实结果）
+try:
+    import textindex
+
+    HAS_TEXT_INDEX = True
+except ImportError:
+    HAS_TEXT_INDEX = False
+
+# --- 搜索引擎 ---
+# 基于结果页的搜索引擎：地址、查询参数和结果页结构。
+# 也可以用 register_engine() 登记函数形式的引擎。
+ENGINES = {
+    "baidu": {
+        "url": "https://www.baidu.com/s",
+        "query_param": "wd",
+        "count_param": "rn",
+        "max_count": 20,
+        "headers": {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+        },
+        "exclude_hosts": ["baidu.com"],
+        "title_tags": ["h3"],
+    },
+    "bing": {
+        "url": "https://cn.bing.com/search",
+        "query_param": "q",
+        "count_param": "count",
+        "max_count": 50,
+        "headers": {
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+        },
+        "exclude_hosts": ["bing.com", "microsoft.com"],
+        "title_tags": ["h2"],
+    },
+}
+
+# 多引擎并发搜索的默认引擎、总时限和单个引擎的超时（秒）
+DEFAULT_ENGINES = ["baidu", "bing"]
+FANOUT_DEADLINE = 10
+ENGINE_TIMEOUT = 8
+
+# 倒数排名融合 (RRF) 的平滑常数
+RRF_K = 60
+
+
+def search_local(keywords, limit, timeout=None):
+    """本地全文索引检索"""
+    if not HAS_TEXT_INDEX:
+        raise RuntimeError("Local index unavailable")
+    return textindex.search(keywords, limit)
+
+
+def register_engine(name, engine):
+    """
+    登记搜索引擎
+
+    Args:
+        engine: 结果页配置 dict（同 ENGINES），
+                或 search(keywords, limit, timeout) -> 结果列表 的函数
+    """
+    ENGINES[name] = engine
 
-# --- Core Logic ---
-def search_baidu(keywords, limit=10):
-    """百度搜索"""
-    url = "https://www.baidu.com/s"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-    }
-    params = {"wd": keywords, "rn": min(limit, 20)}
 
+register_engine("local", search_local)
+
+
+def resolve_engine(spec):
+    """引擎名或临时的结果页配置 → (名称, 引擎)"""
+    if isinstance(spec, dict):
+        return spec.get("name") or spec.get("url", "custom"), spec
+    if spec not in ENGINES:
+        raise ValueError(f"Unknown engine: {spec}")
+    return spec, ENGINES[spec]
+
+
+def search_page(engine, keywords, limit, timeout):
+    """按结果页配置搜索，边下载边解析（网络错误直接抛出）"""
+    params = dict(engine.get("params", {}))
+    params[engine.get("query_param", "q")] = keywords
+    if engine.get("count_param"):
+        params[engine["count_param"]] = min(limit, engine.get("max_count", limit))
+    separator = "&" if "?" in engine["url"] else "?"
+    url = f"{engine['url']}{separator}{urllib.parse.urlencode(params)}"
+
+    chunks = iter_cached(url, headers=engine.get("headers"), timeout=timeout)
     try:
-        req = urllib.request.Request(
-            f"{url}?{urllib.parse.urlencode(params)}", headers=headers
+        results, _ = parse_results(
+            chunks,
+            limit,
+            exclude_hosts=engine.get("exclude_hosts", []),
+            title_tags=engine.get("title_tags", ["h3"]),
+            result_classes=engine.get("result_classes", RESULT_CLASSES),
         )
-        with urllib.request.urlopen(req, timeout=15) as response:
-            html = response.read().decode("utf-8", errors="replace")
+    finally:
+        chunks.close()
+    return results
 
-        # 简单解析 - 提取搜索结果
-        results = []
 
-        # 尝试多种模式匹配
-        patterns = [
-            # 标准结果: <h3 class="t"><a href="url">title</a></h3>
-            r'<h3[^>]*class="t"[^>]*>.*?<a[^>]+href="(https?://[^"]+)"[^>]*>([^<]*)</a>',
-            # 备用: <h3><a href="url">title</a></h3>
-            r'<h3[^>]*>.*?<a[^>]+href="(https?://[^"]+)"[^>]*>([^<]*)</a>',
-            # 简单匹配
-            r'href="(https?://[^"]+)"[^>]*>([^<]{2,50})</a>',
-        ]
-
-        for pattern in patterns:
-            for match in re.finditer(pattern, html):
-                url = match.group(1)
-                title = match.group(2).strip()
-                # 清理HTML实体
-                title = re.sub(r"&[a-z]+;", "", title)
-                title = re.sub(r"<[^>]+>", "", title)
-                if title and len(title) > 1 and "baidu.com" not in url:
-                    # 去重
-                    if not any(r["url"] == url for r in results):
-                        results.append({"title": title, "url": url, "snippet": ""})
-                        if len(results) >= limit:
-                            break
-            if results:
-                break
+def search_engine(engine, keywords, limit, timeout=ENGINE_TIMEOUT):
+    if callable(engine):
+        return engine(keywords, limit, timeout)
+    return search_page(engine, keywords, limit, timeout)
 
-        # 如果还是没结果，返回模拟数据用于演示
-        if not results:
-            results = [
-                {
-                    "title": f"{keywords} - 搜索结果1",
-                    "url": "https://example.com/result1",
-                    "snippet": f"这是关于{keywords}的搜索结果...",
-                },
-                {
-                    "title": f"{keywords} - 搜索结果2",
-                    "url": "https://example.com/result2",
-                    "snippet": f"更多关于{keywords}的信息...",
-                },
-            ][:limit]
 
-        return {
-            "status": "success",
-            "data": {"results": results, "count": len(results)},
-        }
+# --- Core Logic ---
+def search_baidu(keywords, limit=10):
+    """百度搜索"""
+    try:
+        # 边下载边解析，取够 limit 条结果就停止读取
+        results = search_engine(ENGINES["baidu"], keywords, limit, timeout=15)
     except Exception as e:
-        # 出错时返回模拟数据
-        results = [
-            {
-                "title": f"{keywords} - 结果1",
-                "url": "https://example.com/1",
-                "snippet": "Demo result",
-            },
-            {
-                "title": f"{keywords} - 结果2",
-                "url": "https://example.com/2",
-                "snippet": "Demo result",
-            },
-        ][:limit]
+        results = []
+        note = f"网络搜索失败，使用本地索引: {str(e)[:50]}"
+    else:
+        note = "网络搜索没有结果，使用本地索引"
+
+    if results:
         return {
             "status": "success",
-            "data": {
-                "results": results,
-                "count": len(results),
-                "note": f"使用演示数据: {str(e)[:50]}",
-            },
+            "data": {"results": results, "count": len(results)},
         }
 
+    # 网络不可用或没有结果时退回本地索引，不再返回编造的演示数据
+    local = search_local(keywords, limit) if HAS_TEXT_INDEX else []
+    if not local:
+        return {"status": "error", "message": f"No results: {note}"}
+    return {
+        "status": "success",
+        "data": {"results": local, "count": len(local), "note": note},
+    }
+
 
 def search_google(keywords, limit=10):
     """Google搜索 (需要代理)"""
     return {"status": "error", "message": "Google search requires proxy"}
 
 
+def search_single(name, keywords, limit):
+    """用登记的单个引擎搜索"""
+    try:
+        _, engine = resolve_engine(name)
+        results = search_engine(engine, keywords, limit)
+    except Exception as e:
+        return {"status": "error", "message": f"{name}: {str(e)}"}
+    return {"status": "success", "data": {"results": results, "count": len(results)}}
+
+
+def fuse_results(ranked, limit, k=RRF_K):
+    """
+    倒数排名融合：同一地址（规范化后）在各引擎中的得分 1/(k + 排名) 相加
+
+    Args:
+        ranked: {引擎名: 结果列表}，按返回先后排列，得分相同时先返回的引擎靠前
+    """
+    merged = {}
+    for name, results in ranked.items():
+        for rank, result in enumerate(results, 1):
+            key = normalize_url(result["url"])
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {**result, "engines": [], "score": 0.0}
+            elif len(result.get("snippet", "")) > len(entry.get("snippet", "")):
+                entry["snippet"] = result["snippet"]
+            entry["engines"].append(name)
+            entry["score"] += 1 / (k + rank)
+
+    fused = sorted(merged.values(), key=lambda r: -r["score"])[:limit]
+    for entry in fused:
+        entry["score"] = round(entry["score"], 5)
+    return fused
+
+
+def run_engine(results_queue, name, engine, keywords, limit, timeout):
+    """在线程中执行单个引擎，结果放入队列"""
+    started = time.time()
+    try:
+        results = search_engine(engine, keywords, limit, timeout)
+        error = None
+    except Exception as e:
+        results, error = [], str(e)
+    results_queue.put((name, results, error, round(time.time() - started, 3)))
+
+
+def fan_out(keywords, limit, engines, deadline=FANOUT_DEADLINE):
+    """
+    并发查询多个引擎，合并去重并按融合排名返回
+
+    结果够 limit 条或到达总时限就返回，不等待较慢的引擎；
+    引擎线程是守护线程，返回后不会拖住进程退出。
+    """
+    started = time.time()
+    results_queue = queue.Queue()
+    report = {}
+
+    for spec in engines:
+        try:
+            name, engine = resolve_engine(spec)
+        except ValueError as e:
+            report[str(spec)] = {"status": "error", "error": str(e)}
+            continue
+        timeout = ENGINE_TIMEOUT
+        if isinstance(engine, dict):
+            timeout = engine.get("timeout", ENGINE_TIMEOUT)
+        report[name] = {"status": "pending"}
+        threading.Thread(
+            target=run_engine,
+            args=(results_queue, name, engine, keywords, limit, min(timeout, deadline)),
+            daemon=True,
+        ).start()
+
+    ranked = {}
+    fused = []
+    pending = sum(1 for r in report.values() if r["status"] == "pending")
+    while pending:
+        remaining = deadline - (time.time() - started)
+        if remaining <= 0:
+            break
+        try:
+            name, results, error, elapsed = results_queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        pending -= 1
+        report[name] = {
+            "status": "error" if error else "success",
+            "count": len(results),
+            "elapsed": elapsed,
+        }
+        if error:
+            report[name]["error"] = error[:200]
+        if results:
+            ranked[name] = results
+            fused = fuse_results(ranked, limit)
+            if len(fused) >= limit:
+                break
+
+    # 没有等到的引擎：到达时限的记为 timeout，结果已够而不再等待的记为 skipped
+    timed_out = time.time() - started >= deadline
+    for entry in report.values():
+        if entry["status"] == "pending":
+            entry["status"] = "timeout" if timed_out else "skipped"
+
+    data = {
+        "results": fused,
+        "count": len(fused),
+        "engines": report,
+        "elapsed": round(time.time() - started, 3),
+    }
+    if not fused:
+        return {"status": "error", "message": "所有搜索引擎都没有返回结果", "data": data}
+    return {"status": "success", "data": data}
+
+
 def execute(params):
     keywords = params.get("keywords", "").strip()
     if not keywords:
@@ -115,10 +284,20 @@ def execute(params):
     limit = params.get("limit", 10)
     engine = params.get("engine", "baidu")
 
+    # 多引擎并发搜索: engines 为引擎名或结果页配置的列表，"all" 表示默认引擎
+    engines = params.get("engines")
+    if engines:
+        if engines == "all":
+            engines = DEFAULT_ENGINES
+        deadline = params.get("deadline", FANOUT_DEADLINE)
+        return fan_out(keywords, limit, engines, deadline)
+
     if engine == "baidu":
         return search_baidu(keywords, limit)
     elif engine == "google":
         return search_google(keywords, limit)
+    elif engine in ENGINES:
+        return search_single(engine, keywords, limit)
     else:
         return {"status": "error", "message": f"Unknown engine: {engine}"}
 
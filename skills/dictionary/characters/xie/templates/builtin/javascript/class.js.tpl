@@ -0,0 +1,4 @@
+class {{name}} {
+    constructor() {}
+    method() {}
+}
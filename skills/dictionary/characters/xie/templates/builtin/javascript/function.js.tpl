@@ -0,0 +1,3 @@
+function {{name}}(...args) {
+    return args;
+}
@@ -0,0 +1 @@
+console.log("Hello, World!");
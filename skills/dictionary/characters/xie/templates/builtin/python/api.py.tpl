@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from flask import Flask, jsonify
+
+app = Flask(__name__)
+
+@app.route("/api", methods=["GET"])
+def hello():
+    return jsonify({"message": "Hello, API!"})
+
+if __name__ == "__main__":
+    app.run(debug=True, port={{port}})
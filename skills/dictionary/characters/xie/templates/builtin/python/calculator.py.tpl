@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+def add(a, b): return a + b
+def sub(a, b): return a - b
+def mul(a, b): return a * b
+def div(a, b): return a / b if b != 0 else "Error"
+
+print("=== 计算器 ===")
+print("1. 加法  2. 减法  3. 乘法  4. 除法")
+choice = input("选择运算: ")
+a = float(input("输入第一个数: "))
+b = float(input("输入第二个数: "))
+
+if choice == "1": print(f"结果: {add(a,b)}")
+elif choice == "2": print(f"结果: {sub(a,b)}")
+elif choice == "3": print(f"结果: {mul(a,b)}")
+elif choice == "4": print(f"结果: {div(a,b)}")
+else: print("无效选择")
@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+class {{name}}:
+    def __init__(self):
+        """初始化"""
+        pass
+    
+    def method(self):
+        """方法说明"""
+        pass
@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+my_dict = {"name": "Tom", "age": 25}
+my_dict["city"] = "Beijing"
+for key, value in my_dict.items():
+    print(f"{key}: {value}")
+value = my_dict.get("name", "default")
@@ -0,0 +1,5 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+with open("{{filename}}", "r", encoding="utf-8") as f:
+    content = f.read()
+    print(content)
@@ -0,0 +1,5 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+content = "Hello, World!"
+with open("{{filename}}", "w", encoding="utf-8") as f:
+    f.write(content)
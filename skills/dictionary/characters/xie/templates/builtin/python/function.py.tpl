@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+def {{name}}(*args):
+    """函数说明"""
+    return args
+
+
+if __name__ == "__main__":
+    print({{name}}())
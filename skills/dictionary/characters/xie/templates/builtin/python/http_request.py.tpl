@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import urllib.request
+import json
+url = "{{url}}"
+try:
+    with urllib.request.urlopen(url) as response:
+        data = json.loads(response.read().decode())
+        print(data)
+except Exception as e:
+    print(f"Error: {e}")
@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+data = {"key": "value"}
+with open("{{filename}}", "w", encoding="utf-8") as f:
+    json.dump(data, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+my_list = [1, 2, 3, 4, 5]
+my_list.append(6)
+for item in my_list:
+    print(item)
+filtered = [x for x in my_list if x > 3]
+print(filtered)
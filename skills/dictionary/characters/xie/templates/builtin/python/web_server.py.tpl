@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-type", "text/html")
+        self.end_headers()
+        self.wfile.write(b"Hello, World!")
+
+if __name__ == "__main__":
+    server = HTTPServer(("{{host}}", {{port}}), Handler)
+    print("Server running at http://{{host}}:{{port}}")
+    server.serve_forever()
@@ -8,7 +8,13 @@ import sys
 import json
 import os
 import subprocess
+import time
 import traceback
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+
+# 并发执行的最大步骤数
+MAX_PARALLEL = 4
 
 
 # --- Core Logic ---
@@ -56,9 +62,10 @@ def execute_skill(skill_name, input_params):
                 "error": result.stderr or "Execution failed",
             }
 
-        # 解析输出
+        # 解析输出：最后一行是结果（如运的 stream 模式先逐行输出程序的输出）
         try:
-            output = json.loads(result.stdout)
+            lines = result.stdout.strip().splitlines()
+            output = json.loads(lines[-1] if lines else "")
             return {"status": "success", "output": output, "error": None}
         except json.JSONDecodeError as e:
             return {
@@ -97,6 +104,166 @@ def build_context(previous_results, global_context):
     return context
 
 
+def prepare_input(input_params, context):
+    """合并上下文到输入，并解析特殊占位符"""
+    exec_input = {**input_params, **context}  # context优先
+
+    for key, value in exec_input.items():
+        if isinstance(value, str) and value == "__FROM_CONTEXT_DATA_RESULT__":
+            # 从context.data.result获取代码
+            if isinstance(context.get("data"), dict):
+                exec_input[key] = context["data"].get("result", "")
+
+    return exec_input
+
+
+def context_before(step, results, global_context):
+    """按原始步骤编号，只用排在该步骤之前的结果构建上下文"""
+    earlier = sorted((r for r in results if r["step"] < step), key=lambda r: r["step"])
+    return build_context(earlier, global_context)
+
+
+def normalize_steps(plan):
+    """步骤编号缺失或重复时按顺序重新编号（已优化的计划保持原编号）"""
+    leaves = [s for p in plan for s in (p.get("steps") or [p])]
+    numbers = [s.get("step") for s in leaves]
+    if None not in numbers and len(set(numbers)) == len(numbers):
+        return plan
+    return [{**p, "step": i} for i, p in enumerate(plan, 1)]
+
+
+def run_step(step_info, context, executor=None):
+    """执行单个步骤，返回结果记录"""
+    step = step_info.get("step", 1)
+    skill = step_info.get("skill", "")
+
+    if not skill:
+        return {
+            "step": step,
+            "skill": skill,
+            "status": "error",
+            "output": None,
+            "error": "Empty skill name",
+            "elapsed": 0.0,
+        }
+
+    exec_input = prepare_input(step_info.get("input", {}), context)
+
+    # 执行技能（记录耗时，供策做成本规划）
+    started = time.time()
+    result = (executor or execute_skill)(skill, exec_input)
+    elapsed = round(time.time() - started, 3)
+
+    return {
+        "step": step,
+        "skill": skill,
+        "status": result["status"],
+        "output": result.get("output"),
+        "error": result.get("error"),
+        "elapsed": elapsed,
+    }
+
+
+# 工作进程中已加载的技能模块
+_loaded_skills = {}
+
+
+def load_skill(skill_name):
+    """在当前进程中加载技能模块"""
+    if skill_name not in _loaded_skills:
+        skill_path = get_skill_path(skill_name)
+        if not skill_path:
+            return None
+        spec = importlib.util.spec_from_file_location(f"skill_{skill_name}", skill_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _loaded_skills[skill_name] = module
+    return _loaded_skills[skill_name]
+
+
+def execute_skill_in_process(skill_name, input_params):
+    """在当前进程中直接调用技能的 execute()"""
+    try:
+        module = load_skill(skill_name)
+        if module is None:
+            return {
+                "status": "error",
+                "output": None,
+                "error": f"Skill not found: {skill_name}",
+            }
+        output = module.execute(input_params)
+        # 经过一次JSON往返，与子进程执行的输出保持一致
+        output = json.loads(json.dumps(output, ensure_ascii=False))
+        return {"status": "success", "output": output, "error": None}
+    except (Exception, SystemExit):
+        return {"status": "error", "output": None, "error": traceback.format_exc()}
+
+
+def prewarm_skills(steps):
+    """预先加载本批技能，并让提供 prewarm() 的技能提前准备（如运的沙箱）"""
+    counts = {}
+    for step_info in steps:
+        skill = step_info.get("skill", "")
+        if skill:
+            counts[skill] = counts.get(skill, 0) + 1
+
+    for skill, count in counts.items():
+        try:
+            module = load_skill(skill)
+        except Exception:
+            # 加载失败留到执行该步骤时再报告
+            continue
+        if module is not None and hasattr(module, "prewarm"):
+            module.prewarm(count)
+
+
+def run_worker(steps, global_context=None):
+    """工作进程模式：在同一个进程里依次执行多个步骤"""
+    prewarm_skills(steps)
+    results = []
+    for step_info in steps:
+        context = build_context(results, global_context)
+        result = run_step(step_info, context, execute_skill_in_process)
+        # 进程内执行没有启动开销，耗时不能和单独执行的步骤放在一起统计
+        result["fused"] = True
+        results.append(result)
+    return {"status": "success", "data": {"results": results}}
+
+
+def run_fused(group, context):
+    """把合并的步骤交给一个工作进程执行"""
+    steps = group.get("steps", [])
+    worker = execute_skill("xing", {"worker": steps, "context": context})
+    output = worker.get("output") or {}
+
+    if worker["status"] == "success" and output.get("status") == "success":
+        return output["data"]["results"]
+
+    error = worker.get("error") or output.get("message") or "Worker failed"
+    return [
+        {
+            "step": s.get("step", 1),
+            "skill": s.get("skill", ""),
+            "status": "error",
+            "output": None,
+            "error": error,
+            "elapsed": 0.0,
+        }
+        for s in steps
+    ]
+
+
+def run_parallel(group, results, global_context):
+    """并发执行互相独立的步骤"""
+    steps = group.get("steps", [])
+    contexts = [
+        context_before(s.get("step", 1), results, global_context) for s in steps
+    ]
+
+    with ThreadPoolExecutor(max_workers=min(len(steps), MAX_PARALLEL) or 1) as pool:
+        return list(pool.map(run_step, steps, contexts))
+
+
 def execute_plan(plan, global_context=None):
     """执行计划"""
     if not plan or not isinstance(plan, list):
@@ -106,57 +273,26 @@ def execute_plan(plan, global_context=None):
         }
 
     results = []
-    context = global_context.copy() if global_context else {}
-    failed_count = 0
+    plan = normalize_steps(plan)
 
     for step_info in plan:
         step = step_info.get("step", 1)
-        skill = step_info.get("skill", "")
-        input_params = step_info.get("input", {})
-
-        if not skill:
-            results.append(
-                {
-                    "step": step,
-                    "skill": skill,
-                    "status": "error",
-                    "output": None,
-                    "error": "Empty skill name",
-                }
-            )
-            failed_count += 1
-            continue
-
-        # 合并上下文到输入
-        exec_input = {**input_params, **context}  # context优先
+        group = step_info.get("group")
 
-        # 解析特殊占位符
-        for key, value in exec_input.items():
-            if isinstance(value, str) and value == "__FROM_CONTEXT_DATA_RESULT__":
-                # 从context.data.result获取代码
-                if isinstance(context.get("data"), dict):
-                    exec_input[key] = context["data"].get("result", "")
-
-        # 执行技能
-        result = execute_skill(skill, exec_input)
-
-        results.append(
-            {
-                "step": step,
-                "skill": skill,
-                "status": result["status"],
-                "output": result.get("output"),
-                "error": result.get("error"),
-            }
-        )
+        if group == "parallel":
+            results.extend(run_parallel(step_info, results, global_context))
+            continue
 
-        if result["status"] == "error":
-            failed_count += 1
-            # 可以选择继续或停止，这里选择继续执行
-            # break  # 如需停止，取消注释
+        context = context_before(step, results, global_context)
+        if group == "fused":
+            results.extend(run_fused(step_info, context))
+        else:
+            results.append(run_step(step_info, context))
+        # 失败的步骤不会中断执行，后续步骤继续运行
 
-        # 更新上下文
-        context = build_context(results, global_context)
+    # 按原始步骤顺序整理结果
+    results.sort(key=lambda r: r["step"])
+    failed_count = sum(1 for r in results if r["status"] == "error")
 
     # 获取最终输出
     final_output = None
@@ -182,6 +318,9 @@ def execute(params):
     plan = params.get("plan", [])
     context = params.get("context", {})
 
+    if "worker" in params:
+        return run_worker(params["worker"], context)
+
     if not plan:
         return {"status": "error", "message": "InvalidPlan: plan is required"}
 
@@ -8,66 +8,77 @@
 import sys
 import json
 import re
+import os
+import ast
+import difflib
+import builtins
+import importlib.util
+
+# --- 共享模块（错误分类器、修复缓存） ---
+CHARS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(CHARS_DIR))
+
+from classifier import classify, has_keyword, register_keywords
+from fixcache import error_signature, lookup_fix, store_fix
 
 # --- Python Error Patterns (Python错误模式) ---
 PYTHON_ERROR_PATTERNS = {
     "SyntaxError": {
-        "pattern": r"SyntaxError: (.+)",
         "diagnosis": "代码语法错误",
         "fix_template": "修正语法错误: {error_msg}",
     },
     "IndentationError": {
-        "pattern": r"IndentationError: (.+)",
         "diagnosis": "缩进错误",
         "fix_template": "检查并修正缩进: {error_msg}",
     },
     "NameError": {
-        "pattern": r"NameError: (.+)",
         "diagnosis": "使用了未定义的变量或函数",
         "fix_template": "定义变量或导入模块: {error_msg}",
     },
     "TypeError": {
-        "pattern": r"TypeError: (.+)",
         "diagnosis": "类型不匹配",
         "fix_template": "检查类型转换: {error_msg}",
     },
     "ImportError": {
-        "pattern": r"ImportError|ModuleNotFoundError: (.+)",
         "diagnosis": "模块导入失败",
         "fix_template": "安装或检查模块: {error_msg}",
     },
+    "EOFError": {
+        "diagnosis": "程序在等待输入，但没有提供输入",
+        "fix_template": "通过运的 stdin 或 inputs 参数提供输入: {error_msg}",
+    },
     "FileNotFoundError": {
-        "pattern": r"FileNotFoundError: (.+)",
         "diagnosis": "文件不存在",
         "fix_template": "检查文件路径: {error_msg}",
     },
     "ZeroDivisionError": {
-        "pattern": r"ZeroDivisionError: (.+)",
         "diagnosis": "除零错误",
         "fix_template": "添加除数检查: {error_msg}",
     },
     "IndexError": {
-        "pattern": r"IndexError: (.+)",
         "diagnosis": "索引超出范围",
         "fix_template": "检查索引边界: {error_msg}",
     },
     "KeyError": {
-        "pattern": r"KeyError: (.+)",
         "diagnosis": "字典键不存在",
         "fix_template": "使用get()方法或检查键: {error_msg}",
     },
     "ValueError": {
-        "pattern": r"ValueError: (.+)",
         "diagnosis": "值不合法",
         "fix_template": "检查输入值: {error_msg}",
     },
     "AttributeError": {
-        "pattern": r"AttributeError: (.+)",
         "diagnosis": "对象没有此属性",
         "fix_template": "检查属性名或方法: {error_msg}",
     },
 }
 
+# 归入同一修复策略的异常
+PYTHON_ERROR_ALIASES = {
+    "ModuleNotFoundError": "ImportError",
+    "TabError": "IndentationError",
+}
+
 # --- Error Patterns (通用错误模式) ---
 ERROR_PATTERNS = {
     "SkillNotFound": {
@@ -115,27 +126,35 @@ ERROR_PATTERNS = {
 }
 
 
-# --- Core Logic ---
-def parse_python_error(error_message):
-    """解析Python错误信息，提取错误类型、消息和行号"""
-    # 匹配错误类型和消息
-    for error_type, info in PYTHON_ERROR_PATTERNS.items():
-        match = re.search(info["pattern"], error_message, re.IGNORECASE)
-        if match:
-            error_msg = match.group(1) if match.groups() else error_message
+# 错误信息中的关键词 → 通用错误类型（按顺序匹配）
+KEYWORD_ERROR_TYPES = [
+    (("not found", "不存在"), "SkillNotFound"),
+    (("network", "网络"), "NetworkError"),
+    (("invalid", "无效"), "InvalidInput"),
+    (("timeout", "超时"), "Timeout"),
+    (("permission", "权限"), "PermissionError"),
+]
 
-            # 尝试提取行号
-            line_match = re.search(r"line (\d+)", error_message)
-            line_num = int(line_match.group(1)) if line_match else None
+register_keywords(ERROR_PATTERNS, *(words for words, _ in KEYWORD_ERROR_TYPES))
 
-            return {
-                "type": error_type,
-                "message": error_msg.strip(),
-                "line": line_num,
-                "full_message": error_message,
-            }
 
-    return None
+# --- Core Logic ---
+def parse_python_error(error_message, classified=None):
+    """解析Python错误信息，提取错误类型、消息、行号和调用栈"""
+    if classified is None:
+        classified = classify(error_message)
+
+    error_type = PYTHON_ERROR_ALIASES.get(classified["type"], classified["type"])
+    if error_type not in PYTHON_ERROR_PATTERNS:
+        return None
+
+    return {
+        "type": error_type,
+        "message": classified["message"],
+        "line": classified["line"],
+        "frames": classified["frames"],
+        "full_message": error_message,
+    }
 
 
 def extract_code_from_error(error_data):
@@ -147,77 +166,517 @@ def extract_code_from_error(error_data):
     return ""
 
 
+# --- 本地静态检查与修复 ---
+# 本地修复循环的最大轮数（每轮只在本进程内编译，不启动运）
+MAX_REPAIR_ROUNDS = 5
+# 一次最多给出的修复候选数（由主循环并发试运行）
+MAX_CANDIDATES = 4
+
+# 不需要定义就能使用的名字
+BUILTIN_NAMES = set(dir(builtins)) | {"__file__", "__builtins__"}
+
+# 必须以冒号结尾的语句开头
+BLOCK_KEYWORDS = (
+    "if",
+    "elif",
+    "else",
+    "for",
+    "while",
+    "def",
+    "class",
+    "try",
+    "except",
+    "finally",
+    "with",
+    "async",
+)
+
+BRACKET_PAIRS = {"(": ")", "[": "]", "{": "}"}
+
+
+def check_code(code):
+    """编译检查代码，能编译返回 None，否则返回编译错误"""
+    try:
+        compile(code, "<code>", "exec", dont_inherit=True)
+    except SyntaxError as e:
+        return {"type": type(e).__name__, "message": e.msg, "line": e.lineno}
+    except ValueError as e:
+        return {"type": "SyntaxError", "message": str(e), "line": None}
+    return None
+
+
+def indent_of(line):
+    """行首缩进宽度"""
+    return len(line) - len(line.lstrip())
+
+
+def previous_code_line(lines, index):
+    """index 之前最近的一行代码（跳过空行和注释）"""
+    for i in range(index - 1, -1, -1):
+        stripped = lines[i].strip()
+        if stripped and not stripped.startswith("#"):
+            return lines[i]
+    return ""
+
+
+def normalize_indentation(code):
+    """把行首的 Tab 统一换成4个空格"""
+    lines = code.split("\n")
+    for i, line in enumerate(lines):
+        body = line.lstrip(" \t")
+        lines[i] = line[: len(line) - len(body)].expandtabs(4) + body
+    return "\n".join(lines)
+
+
+def fix_syntax_error(code, error):
+    """针对一个编译错误做一次文本级修复，修不了返回 None"""
+    message = error.get("message", "")
+    line_num = error.get("line")
+
+    if error["type"] == "TabError" or "inconsistent use of tabs" in message:
+        return normalize_indentation(code)
+
+    lines = code.split("\n")
+    if not line_num or line_num < 1:
+        return None
+
+    index = line_num - 1
+    prev = previous_code_line(lines, min(index, len(lines)))
+    prev_indent = indent_of(prev)
+    block_indent = prev_indent + 4 if prev.rstrip().endswith(":") else prev_indent
+
+    if "expected an indented block" in message:
+        # 新版本的消息里带有代码块开头所在的行号
+        match = re.search(r"on line (\d+)", message)
+        header = int(match.group(1)) - 1 if match else None
+        if header is not None and header < len(lines):
+            prev_indent = indent_of(lines[header])
+        else:
+            header = index - 1
+        if index <= header or index >= len(lines) or not lines[index].strip():
+            # 代码块是空的，补一个 pass
+            lines.insert(header + 1, " " * (prev_indent + 4) + "pass")
+        else:
+            lines[index] = " " * (prev_indent + 4) + lines[index].lstrip()
+        return "\n".join(lines)
+
+    if index >= len(lines):
+        return None
+    line = lines[index]
+    stripped = line.strip()
+
+    if "unexpected indent" in message:
+        lines[index] = " " * block_indent + line.lstrip()
+    elif "unindent does not match" in message:
+        # 退到前面出现过的、不超过当前缩进的最近一级
+        levels = [
+            indent_of(l)
+            for l in lines[:index]
+            if l.strip() and not l.strip().startswith("#")
+        ]
+        level = max([n for n in levels if n <= indent_of(line)], default=0)
+        lines[index] = " " * level + line.lstrip()
+    elif "Missing parentheses in call to 'print'" in message:
+        match = re.match(r"(\s*)print\s+(.*)$", line)
+        if not match:
+            return None
+        lines[index] = f"{match.group(1)}print({match.group(2)})"
+    elif "was never closed" in message:
+        match = re.search(r"'(.)' was never closed", message)
+        if not match or match.group(1) not in BRACKET_PAIRS:
+            return None
+        lines[index] = line.rstrip() + BRACKET_PAIRS[match.group(1)]
+    elif (
+        stripped.split(" ", 1)[0].rstrip(":") in BLOCK_KEYWORDS
+        and not stripped.endswith(":")
+    ):
+        # expected ':'，以及旧版本里同样情况下的 invalid syntax
+        lines[index] = line.rstrip() + ":"
+    else:
+        return None
+
+    return "\n".join(lines)
+
+
+def node_start(node):
+    """语句的起始行（带装饰器时从第一个装饰器算起）"""
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def string_lines(tree):
+    """行首落在多行字符串内部的行号，加缩进时不能改动这些行"""
+    inside = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Constant, ast.JoinedStr)) and (
+            node.end_lineno > node.lineno
+        ):
+            inside.update(range(node.lineno + 1, node.end_lineno + 1))
+    return inside
+
+
+def owns_lines(lines, node):
+    """语句是否独占它所在的行（同一行没有别的语句）"""
+    start = node_start(node) - 1
+    if lines[start][: indent_of(lines[start])].strip() or (
+        lines[start].lstrip() and node.col_offset != indent_of(lines[start])
+    ):
+        return False
+    rest = lines[node.end_lineno - 1][node.end_col_offset :].strip()
+    return not rest or rest.startswith("#")
+
+
+def wrap_in_try(lines, node, exception, handler, skip=()):
+    """把语句包进 try/except，保持原有缩进（原地修改 lines）"""
+    start = node_start(node) - 1
+    end = node.end_lineno
+    pad = lines[start][: indent_of(lines[start])]
+    body = [
+        line if (start + i + 1) in skip or not line.strip() else "    " + line
+        for i, line in enumerate(lines[start:end])
+    ]
+    lines[start:end] = (
+        [f"{pad}try:"]
+        + body
+        + [f"{pad}except {exception}:"]
+        + [f"{pad}    {h}" for h in handler]
+    )
+
+
+def handles_import_error(node):
+    """try 语句是否已经捕获了导入失败"""
+    for handler in node.handlers:
+        if handler.type is None:
+            return True
+        types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [
+            handler.type
+        ]
+        for t in types:
+            if isinstance(t, ast.Name) and t.id in (
+                "ImportError",
+                "ModuleNotFoundError",
+                "Exception",
+            ):
+                return True
+    return False
+
+
+def module_exists(name):
+    """模块能否导入（只查找，不真正导入）"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def import_bindings(node):
+    """导入语句的 (顶层模块名, 绑定的名字) 列表"""
+    if isinstance(node, ast.Import):
+        return [
+            (a.name.split(".")[0], a.asname or a.name.split(".")[0])
+            for a in node.names
+        ]
+    if node.level or not node.module or node.module == "__future__":
+        return []
+    top = node.module.split(".")[0]
+    return [(top, a.asname or a.name) for a in node.names if a.name != "*"]
+
+
+def guard_imports(code, modules=None):
+    """
+    把导入失败的语句包进 try/except ImportError，并把导入的名字置为 None
+
+    Args:
+        code: 源代码
+        modules: 需要保护的模块名；为空时保护当前环境里找不到的模块
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    guarded = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Try) and handles_import_error(node):
+            for stmt in node.body:
+                guarded.update(id(n) for n in ast.walk(stmt))
+
+    lines = code.split("\n")
+    targets = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Import, ast.ImportFrom)) or id(node) in guarded:
+            continue
+        bindings = import_bindings(node)
+        if modules is None:
+            hit = any(not module_exists(m) for m, _ in bindings)
+        else:
+            hit = any(m in modules for m, _ in bindings)
+        if hit and owns_lines(lines, node):
+            targets.append(node)
+
+    if not targets:
+        return code
+
+    skip = string_lines(tree)
+    # 从后往前改，前面语句的行号保持不变
+    for node in sorted(targets, key=lambda n: n.lineno, reverse=True):
+        names = dict.fromkeys(name for _, name in import_bindings(node))
+        handler = [f"{name} = None  # 模块未安装" for name in names]
+        wrap_in_try(lines, node, "ImportError", handler, skip)
+    return "\n".join(lines)
+
+
+def undefined_names(tree):
+    """用到了、但在代码任何地方都没有定义的名字（按首次出现的顺序）"""
+    bound = set(BUILTIN_NAMES)
+    loaded = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                loaded.append(node)
+            else:
+                bound.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    # 星号导入的名字无法静态确定
+                    return []
+                bound.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+        elif getattr(node, "name", None) and type(node).__name__ in (
+            "MatchAs",
+            "MatchStar",
+        ):
+            bound.add(node.name)
+        elif getattr(node, "rest", None) and type(node).__name__ == "MatchMapping":
+            bound.add(node.rest)
+
+    return list(dict.fromkeys(n.id for n in loaded if n.id not in bound))
+
+
+def stub_undefined_names(code, names=()):
+    """
+    给未定义的名字补上 `名字 = None` 的定义
+
+    桩定义放在模块文档字符串和 __future__ 导入之后。
+    names 中的名字即使在后面才定义（先用后定义）也会补桩。
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    missing = list(dict.fromkeys(list(names) + undefined_names(tree)))
+    if not missing:
+        return code
+
+    stubs = [f"{name} = None  # 自动修复: 定义变量" for name in missing]
+    return insert_prologue(code, tree, stubs)
+
+
+def insert_prologue(code, tree, new_lines):
+    """在模块文档字符串和 __future__ 导入之后插入几行代码"""
+    lines = code.split("\n")
+    position = len(lines)
+    for i, node in enumerate(tree.body):
+        if i == 0 and isinstance(node, ast.Expr):
+            value = getattr(node.value, "value", None)
+            if isinstance(node.value, ast.Constant) and isinstance(value, str):
+                continue
+        if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+            continue
+        position = node_start(node) - 1
+        break
+
+    lines[position:position] = new_lines
+    return "\n".join(lines)
+
+
+def wrap_statement(code, line_num, exception, note):
+    """把第 line_num 行所在的最内层语句包进 try/except"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    target = None
+    for node in ast.walk(tree):
+        if isinstance(node, ast.stmt) and node.lineno <= line_num <= node.end_lineno:
+            span = node.end_lineno - node.lineno
+            if target is None or span <= target.end_lineno - target.lineno:
+                target = node
+
+    lines = code.split("\n")
+    if target is None or not owns_lines(lines, target):
+        return None
+
+    wrap_in_try(lines, target, exception, [f"pass  # {note}"], string_lines(tree))
+    return "\n".join(lines)
+
+
+def defined_names(tree):
+    """代码中定义过的名字"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+    return names
+
+
+def name_error_proposals(code, name, line_num):
+    """NameError 的其他修复思路：补上同名模块的导入、改成拼写相近的名字"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+
+    proposals = []
+    if module_exists(name):
+        proposals.append(insert_prologue(code, tree, [f"import {name}"]))
+
+    known = sorted(defined_names(tree) | BUILTIN_NAMES)
+    close = difflib.get_close_matches(name, known, n=1, cutoff=0.8)
+    lines = code.split("\n")
+    if close and line_num and line_num <= len(lines):
+        pattern = re.compile(rf"\b{re.escape(name)}\b")
+        lines[line_num - 1] = pattern.sub(close[0], lines[line_num - 1])
+        proposals.append("\n".join(lines))
+
+    return proposals
+
+
+def repair_candidates(error_info, original_code, fixed_code=None):
+    """
+    为同一个错误生成多个互不相同的修复候选，供主循环并发试运行
+
+    第一个候选是常规修复 fixed_code，其余是换一种思路的修复；
+    所有候选都经过本地修复循环，保证能编译。
+    """
+    error_type = error_info.get("type", "")
+    line_num = error_info.get("line")
+    proposals = [fixed_code]
+
+    if error_type == "NameError":
+        message = error_info.get("message", "")
+        match = re.search(r"name '(\w+)' is not defined", message)
+        if match:
+            proposals += name_error_proposals(original_code, match.group(1), line_num)
+
+    candidates = []
+    for code in proposals:
+        if not code:
+            continue
+        repaired = repair_code(code)
+        if (
+            repaired["compiles"]
+            and repaired["code"] != original_code
+            and repaired["code"] not in candidates
+        ):
+            candidates.append(repaired["code"])
+    return candidates[:MAX_CANDIDATES]
+
+
+def repair_code(code, max_rounds=MAX_REPAIR_ROUNDS):
+    """
+    本地修复循环：编译检查 → 修复 → 再检查，直到代码能编译
+
+    能编译之后再做语法树级修复：保护找不到的模块的导入、给未定义的名字补桩。
+
+    Returns:
+        dict: {
+            "code": 修复后的代码,
+            "compiles": 是否能编译,
+            "fixes": 做过的修复说明,
+            "error": 仍然存在的编译错误 (能编译时为 None),
+        }
+    """
+    fixes = []
+    error = check_code(code)
+
+    for _ in range(max_rounds):
+        if error is None:
+            break
+        fixed = fix_syntax_error(code, error)
+        if not fixed or fixed == code:
+            break
+        fixes.append(f"第{error['line']}行 {error['type']}: {error['message']}")
+        code = fixed
+        error = check_code(code)
+
+    if error is None:
+        for label, repair in (
+            ("保护缺失模块的导入", guard_imports),
+            ("补全未定义的名字", stub_undefined_names),
+        ):
+            fixed = repair(code)
+            if fixed and fixed != code and check_code(fixed) is None:
+                fixes.append(label)
+                code = fixed
+
+    return {"code": code, "compiles": error is None, "fixes": fixes, "error": error}
+
+
 def auto_fix_python_error(error_info, original_code):
     """尝试自动修复Python代码错误"""
     if not error_info or not original_code:
         return None
 
     error_type = error_info.get("type", "")
+    error_msg = error_info.get("message", "")
+    line_num = error_info.get("line")
     lines = original_code.split("\n")
 
     # 根据错误类型进行修复
-    if error_type == "IndentationError":
-        # 修正缩进 - 检查上一行
-        line_num = error_info.get("line")
-        if line_num and line_num > 1:
-            # 检查上一行的缩进
-            prev_line = lines[line_num - 2] if line_num > 1 else ""
-            indent = len(prev_line) - len(prev_line.lstrip())
-            lines[line_num - 1] = " " * indent + lines[line_num - 1].lstrip()
-            return "\n".join(lines)
+    if error_type in ("SyntaxError", "IndentationError"):
+        # 语法和缩进错误交给本地修复循环
+        repaired = repair_code(original_code)
+        if repaired["compiles"] and repaired["code"] != original_code:
+            return repaired["code"]
 
     elif error_type == "NameError":
         # 可能是未定义的变量，尝试添加定义
-        error_msg = error_info.get("message", "")
-        # 提取变量名
         var_match = re.search(r"name '(\w+)' is not defined", error_msg)
         if var_match:
-            var_name = var_match.group(1)
-            # 在第一行后添加变量定义
-            lines.insert(1, f"{var_name} = None  # 自动修复: 定义变量")
-            return "\n".join(lines)
+            return stub_undefined_names(original_code, [var_match.group(1)])
 
     elif error_type == "ImportError":
-        # 模块导入失败，尝试修改导入方式
-        error_msg = error_info.get("message", "")
-        # 提取模块名
-        mod_match = re.search(r" No module named '(\w+)'", error_msg)
+        # 模块导入失败，把导入语句包进 try-except
+        mod_match = re.search(r"No module named '(\w+)'", error_msg)
         if mod_match:
-            mod_name = mod_match.group(1)
-            # 尝试添加 try-except
-            for i, line in enumerate(lines):
-                if f"import {mod_name}" in line or f"from {mod_name}" in line:
-                    lines[i] = (
-                        f"try:\n    {line}\nexcept ImportError:\n    {mod_name} = None  # 模块未安装"
-                    )
-                    return "\n".join(lines)
+            fixed = guard_imports(original_code, {mod_match.group(1)})
+            if fixed != original_code:
+                return fixed
 
     elif error_type == "TypeError":
         # 类型错误，尝试添加类型转换
-        error_msg = error_info.get("message", "")
         # 简单修复: 尝试将参数转换为字符串
         if "unsupported operand type" in error_msg:
             # 找到问题行并添加 str() 转换
-            line_num = error_info.get("line")
             if line_num and line_num <= len(lines):
                 # 简化处理：将 + 改为字符串拼接
                 lines[line_num - 1] = "# 尝试修复类型错误: " + lines[line_num - 1]
                 return "\n".join(lines)
 
     elif error_type == "IndexError":
-        # 索引错误，添加边界检查
-        line_num = error_info.get("line")
+        # 索引错误，给出错的语句加上边界保护
         if line_num and line_num <= len(lines):
-            lines[line_num - 1] = (
-                "try:\n    "
-                + lines[line_num - 1]
-                + "\nexcept IndexError:\n    pass  # 索引越界已处理"
+            return wrap_statement(
+                original_code, line_num, "IndexError", "索引越界已处理"
             )
-            return "\n".join(lines)
 
     elif error_type == "FileNotFoundError":
         # 文件不存在，添加文件检查
-        line_num = error_info.get("line")
         if line_num and line_num <= len(lines):
             # 提取文件路径
             path_match = re.search(
@@ -237,27 +696,21 @@ def auto_fix_python_error(error_info, original_code):
     return None
 
 
-def detect_error_type(error_message):
+def detect_error_type(error_message, classified=None):
     """检测错误类型"""
-    error_message = error_message.lower()
+    if classified is None:
+        classified = classify(error_message)
 
-    for pattern, info in ERROR_PATTERNS.items():
-        if pattern.lower() in error_message:
+    for pattern in ERROR_PATTERNS:
+        if has_keyword(classified, pattern):
             return pattern
 
     # 尝试从错误信息中提取
-    if "not found" in error_message or "不存在" in error_message:
-        return "SkillNotFound"
-    elif "network" in error_message or "网络" in error_message:
-        return "NetworkError"
-    elif "invalid" in error_message or "无效" in error_message:
-        return "InvalidInput"
-    elif "timeout" in error_message or "超时" in error_message:
-        return "Timeout"
-    elif "permission" in error_message or "权限" in error_message:
-        return "PermissionError"
-    else:
-        return "ExecutionError"
+    for words, error_type in KEYWORD_ERROR_TYPES:
+        if has_keyword(classified, *words):
+            return error_type
+
+    return "ExecutionError"
 
 
 def analyze_error(error, original_plan=None, attempt=0):
@@ -265,14 +718,17 @@ def analyze_error(error, original_plan=None, attempt=0):
     error_type = error.get("type", "")
     error_message = error.get("message", "")
 
+    # 整段错误信息只扫描一次
+    classified = classify(error_message)
+
     # 优先检测Python代码错误
-    python_error = parse_python_error(error_message)
+    python_error = parse_python_error(error_message, classified)
     if python_error:
         return analyze_python_error(python_error, error, original_plan)
 
     # 如果没有明确类型，从消息中检测
     if not error_type:
-        error_type = detect_error_type(error_message)
+        error_type = detect_error_type(error_message, classified)
 
     # 获取错误模式信息
     pattern_info = ERROR_PATTERNS.get(
@@ -318,9 +774,42 @@ def analyze_python_error(error_info, original_error, original_plan=None):
     line_info = f" 第{line_num}行" if line_num else ""
     diagnosis = f"[Python {error_type}]{line_info}: {error_msg}"
 
-    # 尝试自动修复
+    # 同样的代码出过同样的错时，直接用缓存的修复
     original_code = original_error.get("code", "")
-    fixed_code = auto_fix_python_error(error_info, original_code)
+    signature = error_signature(error_type, error_msg)
+    cached = lookup_fix(signature, original_code) if original_code else None
+
+    static_fixes = []
+    if cached:
+        fixed_code = cached["fixed_code"]
+        verified = "已验证" if cached.get("passed") else "待验证"
+        diagnosis += f"（命中修复缓存，{verified}）"
+    else:
+        # 尝试自动修复
+        fixed_code = auto_fix_python_error(error_info, original_code)
+
+    # 交回运之前先在本地编译检查，修到能编译为止
+    if not cached and (fixed_code or original_code):
+        repaired = repair_code(fixed_code or original_code)
+        static_fixes = repaired["fixes"]
+        if not repaired["compiles"]:
+            fixed_code = None
+            compile_error = repaired["error"]
+            diagnosis += (
+                f"（本地修复后仍无法编译: "
+                f"第{compile_error['line']}行 {compile_error['message']}）"
+            )
+        elif repaired["code"] != original_code:
+            fixed_code = repaired["code"]
+
+    # 多给几个不同思路的候选，由主循环并发试运行（已验证的缓存修复不必再试）
+    candidates = []
+    if original_code and not (cached and cached.get("passed")):
+        candidates = repair_candidates(error_info, original_code, fixed_code)
+        fixed_code = fixed_code or (candidates[0] if candidates else None)
+
+    if fixed_code and original_code and not cached:
+        store_fix(signature, original_code, fixed_code)
 
     if fixed_code:
         suggested_fix = f"已自动修复: {pattern_info.get('fix_template', '').format(error_msg=error_msg)}"
@@ -343,6 +832,10 @@ def analyze_python_error(error_info, original_error, original_plan=None):
         "diagnosis": diagnosis,
         "suggested_fix": suggested_fix,
         "fixed_code": fixed_code,
+        "static_fixes": static_fixes,
+        "candidates": candidates,
+        "signature": signature,
+        "cached": bool(cached),
         "new_plan": new_plan,
         "can_retry": True,
         "max_retries": 3,
@@ -389,6 +882,10 @@ def execute(params):
     original_plan = params.get("original_plan")
     attempt = params.get("attempt", 0)
 
+    # 只给代码、不给错误时做执行前的静态检查与修复
+    if not error and params.get("code"):
+        return {"status": "success", "data": repair_code(params["code"])}
+
     return fix(error, original_plan, attempt)
 
 
@@ -3,20 +3,537 @@
 """
 运 (yun) - 代码执行技能
 真正运行生成的代码并返回结果
+
+代码在沙箱解释器中运行：沙箱预先启动并设好资源限制，
+代码通过管道送入，每个沙箱只运行一次，用完即回收。
 """
 
 import sys
 import json
 import subprocess
 import tempfile
+import traceback
+import threading
+import shutil
+import atexit
+import hashlib
+import marshal
+import importlib.util
+import codecs
+import time
 import os
+import signal
 
+try:
+    import resource
 
-def run_code(code, language="python"):
-    """运行代码并返回结果"""
-    if language != "python":
-        return {"status": "error", "message": f"Unsupported language: {language}"}
+    HAS_SANDBOX = hasattr(os, "wait4")
+except ImportError:
+    HAS_SANDBOX = False
+
+# 执行超时（秒）
+TIMEOUT = 30
+
+# 沙箱资源限制: CPU 秒数（略长于超时，正常由超时先结束）、地址空间字节数、打开文件数
+SANDBOX_LIMITS = {
+    "RLIMIT_CPU": TIMEOUT + 5,
+    "RLIMIT_AS": 2 * 1024 * 1024 * 1024,
+    "RLIMIT_NOFILE": 256,
+}
+
+# 常驻进程中保持预热的沙箱数
+POOL_SIZE = 2
+
+# 每个输出流最多保留的字节数，超出时只保留开头和结尾各一半
+MAX_OUTPUT = 64 * 1024
+READ_CHUNK = 4096
+
+# 程序结束后等待读完剩余输出的秒数（脱离进程组的子进程仍占着管道时不再等下去）
+READER_GRACE = 2
+
+# 编译结果缓存：按代码内容哈希保存 marshal 后的代码对象，所有沙箱共用
+BYTECODE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    ".cache",
+    "bytecode",
+)
+MAX_BYTECODE_ENTRIES = 256
+
+# 沙箱启动脚本：设好资源限制，然后等待代码
+SANDBOX_BOOTSTRAP = r"""
+import io, os, sys, json, shutil, marshal, linecache, traceback, resource
+
+for _name, _value in json.loads(sys.argv[1]).items():
+    _kind = getattr(resource, _name, None)
+    if _kind is None:
+        continue
+    _soft, _hard = resource.getrlimit(_kind)
+    if _hard != resource.RLIM_INFINITY:
+        _value = min(_value, _hard)
+    try:
+        resource.setrlimit(_kind, (_value, _hard))
+    except (ValueError, OSError):
+        pass
+
+_header = sys.stdin.buffer.readline()
+if not _header:
+    # 没有分配到代码就被回收
+    shutil.rmtree(os.getcwd(), ignore_errors=True)
+    sys.exit(0)
+
+_request = json.loads(_header)
+_code = sys.stdin.buffer.read().decode("utf-8")
+# 没有提供输入时 stdin 为空，input() 立即抛出 EOFError 而不是等到超时
+if _request.get("stdin") is None:
+    sys.stdin = open(os.devnull, "r")
+else:
+    sys.stdin = io.StringIO(_request["stdin"])
+if _request.get("workdir"):
+    os.chdir(_request["workdir"])
+
+def _write_stats():
+    # 程序结束后的内存峰值（VmHWM 只统计 exec 之后的本进程，不含父进程留下的峰值）
+    _peak = None
+    try:
+        with open("/proc/self/status") as _f:
+            for _line in _f:
+                if _line.startswith("VmHWM:"):
+                    _peak = int(_line.split()[1])
+    except (OSError, ValueError):
+        pass
+    if _peak is None:
+        # Linux 下 ru_maxrss 以 KB 为单位，macOS 下以字节为单位
+        _peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            _peak //= 1024
+    try:
+        with open(_request["stats"], "w") as _f:
+            json.dump({"peak_rss_kb": _peak}, _f)
+    except (KeyError, OSError):
+        pass
+
+
+linecache.cache["<code>"] = (len(_code), None, _code.splitlines(True), "<code>")
+sys.argv = ["<code>"]
+_namespace = {
+    "__name__": "__main__",
+    "__file__": "<code>",
+    "__builtins__": __builtins__,
+}
+try:
+    _compiled = None
+    if _request.get("bytecode"):
+        try:
+            with open(_request["bytecode"], "rb") as _f:
+                _compiled = marshal.load(_f)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+    if _compiled is None:
+        _compiled = compile(_code, "<code>", "exec", dont_inherit=True)
+    exec(_compiled, _namespace)
+except SystemExit:
+    raise
+except BaseException as _e:
+    # 去掉启动脚本自身的栈帧，只保留生成代码的部分
+    traceback.print_exception(type(_e), _e, _e.__traceback__.tb_next)
+    sys.exit(1)
+finally:
+    _write_stats()
+"""
+
+
+class CappedBuffer:
+    """只保留开头和结尾的输出缓冲，程序输出再多也不会占满内存"""
+
+    def __init__(self, limit=MAX_OUTPUT):
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, chunk):
+        self.total += len(chunk)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self.tail += chunk
+            if len(self.tail) > self.tail_limit:
+                del self.tail[: len(self.tail) - self.tail_limit]
+
+    @property
+    def dropped(self):
+        """被丢弃的字节数"""
+        return self.total - len(self.head) - len(self.tail)
+
+    def getvalue(self):
+        if not self.dropped:
+            return bytes(self.head + self.tail).decode("utf-8", errors="replace")
+        head = bytes(self.head).decode("utf-8", errors="replace")
+        tail = bytes(self.tail).decode("utf-8", errors="replace")
+        return f"{head}\n...[已截断 {self.dropped} 字节]...\n{tail}"
+
+
+def start_capture(proc, max_output=MAX_OUTPUT, on_output=None):
+    """
+    边运行边读取子进程的 stdout / stderr
+
+    Args:
+        on_output: 回调 on_output(流名称, 文本)，每读到一段输出调用一次
+            （缓冲仍然只保留开头和结尾，转发的是全部输出）
+
+    Returns:
+        tuple: (读取线程列表, {"stdout": CappedBuffer, "stderr": CappedBuffer})
+    """
+    buffers = {}
+
+    def pump(name, pipe, buffer):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            chunk = pipe.read1(READ_CHUNK)
+            if not chunk:
+                break
+            buffer.write(chunk)
+            if on_output:
+                text = decoder.decode(chunk)
+                if text:
+                    on_output(name, text)
+        if on_output:
+            text = decoder.decode(b"", True)
+            if text:
+                on_output(name, text)
+
+    readers = []
+    for name, pipe in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+        buffers[name] = CappedBuffer(max_output)
+        readers.append(
+            threading.Thread(
+                target=pump, args=(name, pipe, buffers[name]), daemon=True
+            )
+        )
+    for reader in readers:
+        reader.start()
+    return readers, buffers
+
+
+def kill_group(proc):
+    """结束进程所在的进程组（程序启动的子进程一并结束）"""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (OSError, AttributeError):
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+
+def join_readers(readers):
+    """等待读完输出，最多等 READER_GRACE 秒"""
+    deadline = time.monotonic() + READER_GRACE
+    for reader in readers:
+        reader.join(max(0, deadline - time.monotonic()))
+
+
+def captured_output(buffers):
+    """整理读取到的输出"""
+    return {
+        "stdout": buffers["stdout"].getvalue(),
+        "stderr": buffers["stderr"].getvalue(),
+        "truncated": any(b.dropped for b in buffers.values()),
+    }
+
+
+class Sandbox:
+    """一个预先启动、等待代码的解释器"""
+
+    def __init__(self):
+        self.readers = []
+        self.scratch = tempfile.mkdtemp(prefix="yun_sandbox_")
+        # 沙箱在程序结束后把内存峰值写到这里
+        self.stats_file = os.path.join(self.scratch, ".yun_stats.json")
+        env = {**os.environ, "TMPDIR": self.scratch, "PYTHONIOENCODING": "utf-8"}
+        self.proc = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                SANDBOX_BOOTSTRAP,
+                json.dumps(SANDBOX_LIMITS),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.scratch,
+            env=env,
+            # 独立的会话和进程组：超时或结束时连同程序启动的子进程一起结束
+            start_new_session=True,
+        )
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def run(
+        self,
+        code,
+        workdir=None,
+        stdin=None,
+        bytecode=None,
+        max_output=MAX_OUTPUT,
+        on_output=None,
+        timeout=TIMEOUT,
+    ):
+        """
+        把代码送进沙箱运行，等待结束
+
+        Returns:
+            dict: {"stdout", "stderr", "truncated", "returncode", "timed_out",
+                   "wall_time", "cpu_time", "peak_rss_kb"}
+        """
+        proc = self.proc
+        readers, buffers = start_capture(proc, max_output, on_output)
+        self.readers = readers
+
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            kill_group(proc)
+
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+        started = time.monotonic()
+        try:
+            header = json.dumps(
+                {
+                    "workdir": workdir or os.getcwd(),
+                    "stdin": stdin,
+                    "bytecode": bytecode,
+                    "stats": self.stats_file,
+                }
+            )
+            proc.stdin.write(header.encode("utf-8") + b"\n" + code.encode("utf-8"))
+            proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall_time = time.monotonic() - started
+        timer.cancel()
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # 程序留下的子进程可能还占着输出管道
+        kill_group(proc)
+        join_readers(readers)
+
+        return {
+            **captured_output(buffers),
+            "returncode": proc.returncode,
+            "timed_out": timed_out.is_set(),
+            "wall_time": round(wall_time, 3),
+            "cpu_time": round(usage.ru_utime + usage.ru_stime, 3),
+            "peak_rss_kb": self.peak_rss(),
+        }
+
+    def peak_rss(self):
+        """沙箱报告的内存峰值（KB），程序被强制结束等没有报告时为 None"""
+        try:
+            with open(self.stats_file, "r", encoding="utf-8") as f:
+                return json.load(f).get("peak_rss_kb")
+        except (OSError, ValueError):
+            return None
 
+    def discard(self):
+        """回收沙箱：结束进程并删除临时目录"""
+        if self.alive():
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proc.kill()
+                self.proc.wait()
+        # 还在读的管道（脱离进程组的子进程仍占着）不能关闭，否则会等到读完为止
+        if not any(reader.is_alive() for reader in self.readers):
+            for pipe in (self.proc.stdout, self.proc.stderr):
+                if pipe:
+                    pipe.close()
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+
+class SandboxPool:
+    """预热的沙箱池：取出一个运行一次，然后按需补足"""
+
+    def __init__(self):
+        self.idle = []
+        self.keep = 0
+        self.lock = threading.Lock()
+
+    def fill(self, count):
+        with self.lock:
+            while len(self.idle) < count:
+                self.idle.append(Sandbox())
+
+    def acquire(self):
+        with self.lock:
+            sandbox = self.idle.pop(0) if self.idle else None
+        if sandbox is None or not sandbox.alive():
+            if sandbox:
+                sandbox.discard()
+            sandbox = Sandbox()
+        if self.keep:
+            self.fill(self.keep)
+        return sandbox
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for sandbox in idle:
+            sandbox.discard()
+
+
+_pool = SandboxPool()
+atexit.register(_pool.close)
+
+
+def prewarm(count=POOL_SIZE, keep=False):
+    """
+    提前启动沙箱，解释器启动与前面的步骤（如写生成代码）同时进行
+
+    Args:
+        count: 启动的沙箱数
+        keep: 为真时每次取用后自动补足（常驻进程使用）
+    """
+    if not HAS_SANDBOX:
+        return
+    if keep:
+        _pool.keep = count
+    _pool.fill(count)
+
+
+def bytecode_path(code):
+    """代码对应的编译缓存文件（键包含解释器的字节码版本）"""
+    digest = hashlib.sha256(importlib.util.MAGIC_NUMBER + code.encode("utf-8"))
+    return os.path.join(BYTECODE_DIR, digest.hexdigest()[:32] + ".bin")
+
+
+def store_bytecode(path, compiled):
+    """写入编译缓存，超出上限时删除最久未用的条目"""
+    try:
+        os.makedirs(BYTECODE_DIR, exist_ok=True)
+        temp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, "wb") as f:
+            marshal.dump(compiled, f)
+        os.replace(temp_file, path)
+
+        entries = [
+            os.path.join(BYTECODE_DIR, name)
+            for name in os.listdir(BYTECODE_DIR)
+            if name.endswith(".bin")
+        ]
+        if len(entries) > MAX_BYTECODE_ENTRIES:
+            entries.sort(key=os.path.getmtime)
+            for old_path in entries[: len(entries) - MAX_BYTECODE_ENTRIES]:
+                os.unlink(old_path)
+    except OSError:
+        return None
+    return path
+
+
+def compile_cached(code):
+    """
+    编译代码，已经编译过的代码直接复用缓存
+
+    Returns:
+        str | None: 编译缓存文件路径（无法缓存时为 None）
+
+    Raises:
+        SyntaxError, ValueError: 代码无法编译
+    """
+    path = bytecode_path(code)
+    if os.path.exists(path):
+        try:
+            # 更新访问时间，淘汰时按最久未用排序
+            os.utime(path)
+            return path
+        except OSError:
+            pass
+
+    compiled = compile(code, "<code>", "exec", dont_inherit=True)
+    return store_bytecode(path, compiled)
+
+
+def stdin_exhausted(stderr):
+    """程序是否因为读不到输入而失败"""
+    lines = [line for line in stderr.strip().splitlines() if line.strip()]
+    return bool(lines) and lines[-1].startswith("EOFError")
+
+
+def format_result(result, stats=None):
+    """把运行结果整理成技能输出"""
+    extra = {}
+    if result["truncated"]:
+        extra["truncated"] = True
+    if stats:
+        extra["stats"] = stats
+
+    if result["returncode"] == 0:
+        return {
+            "status": "success",
+            "data": {
+                "output": result["stdout"] or "(无输出)",
+                "returncode": 0,
+                **extra,
+            },
+        }
+    return {
+        "status": "error",
+        "data": {
+            "output": result["stdout"],
+            "error": result["stderr"],
+            "returncode": result["returncode"],
+            "stdin_exhausted": stdin_exhausted(result["stderr"]),
+            **extra,
+        },
+    }
+
+
+def timeout_result(output):
+    """超时的结果：附带已经读到的输出（如死循环打印时的开头和结尾）"""
+    # 最后一行写明超时，修(xiu) 按最后一行的异常分类
+    error = output["stderr"].rstrip("\n")
+    error += f"\nTimeoutError: 运行超过 {TIMEOUT} 秒被结束"
+    return {
+        "status": "error",
+        "message": "Timeout",
+        "data": {
+            "output": output["stdout"],
+            "error": error.lstrip("\n"),
+            "truncated": output["truncated"],
+            "timed_out": True,
+        },
+    }
+
+
+def run_in_sandbox(code, workdir=None, stdin=None, bytecode=None, **capture):
+    """在沙箱中运行代码（bytecode 为编译缓存文件，沙箱直接加载而不重新编译）"""
+    sandbox = _pool.acquire()
+    try:
+        result = sandbox.run(code, workdir, stdin, bytecode, **capture)
+    finally:
+        sandbox.discard()
+
+    if result["timed_out"]:
+        return timeout_result(result)
+
+    stats = {
+        "wall_time": result["wall_time"],
+        "cpu_time": result["cpu_time"],
+        "peak_rss_kb": result["peak_rss_kb"],
+    }
+    return format_result(result, stats)
+
+
+def run_in_subprocess(code, workdir=None, stdin=None, **capture):
+    """写入临时文件后用新的解释器运行（没有沙箱支持的平台使用）"""
     # 创建临时文件
     with tempfile.NamedTemporaryFile(
         mode="w", suffix=".py", delete=False, encoding="utf-8"
@@ -26,35 +543,35 @@ def run_code(code, language="python"):
 
     try:
         # 运行代码
-        result = subprocess.run(
+        proc = subprocess.Popen(
             [sys.executable, temp_file],
-            capture_output=True,
-            timeout=30,
-            encoding="utf-8",
-            errors="replace",
+            stdin=subprocess.DEVNULL if stdin is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=workdir or None,
+            env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+            start_new_session=hasattr(os, "killpg"),
         )
+        readers, buffers = start_capture(proc, **capture)
+        if stdin is not None:
+            try:
+                proc.stdin.write(stdin.encode("utf-8"))
+                proc.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
 
-        output = result.stdout
-        error = result.stderr
-
-        if result.returncode == 0:
-            return {
-                "status": "success",
-                "data": {"output": output or "(无输出)", "returncode": 0},
-            }
-        else:
-            return {
-                "status": "error",
-                "data": {
-                    "output": output,
-                    "error": error,
-                    "returncode": result.returncode,
-                },
-            }
-    except subprocess.TimeoutExpired:
-        return {"status": "error", "message": "Timeout"}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+        try:
+            proc.wait(timeout=TIMEOUT)
+        except subprocess.TimeoutExpired:
+            kill_group(proc)
+            proc.wait()
+            join_readers(readers)
+            return timeout_result(captured_output(buffers))
+        finally:
+            kill_group(proc)
+            join_readers(readers)
+
+        return format_result({**captured_output(buffers), "returncode": proc.returncode})
     finally:
         # 清理临时文件
         try:
@@ -63,14 +580,81 @@ def run_code(code, language="python"):
             pass
 
 
-def execute(params):
+def run_code(
+    code,
+    language="python",
+    workdir=None,
+    stdin=None,
+    max_output=MAX_OUTPUT,
+    on_output=None,
+):
+    """
+    运行代码并返回结果
+
+    Args:
+        workdir: 代码运行时的工作目录，默认当前目录
+        stdin: 提供给程序的输入文本，默认没有输入
+        max_output: 每个输出流最多保留的字节数
+        on_output: 回调 on_output(流名称, 文本)，程序运行中实时收到输出
+    """
+    if language != "python":
+        return {"status": "error", "message": f"Unsupported language: {language}"}
+
+    # 先在本进程编译检查（编译过的代码直接取缓存），语法错误不必启动子进程
+    try:
+        bytecode = compile_cached(code)
+    except (SyntaxError, ValueError) as e:
+        return {
+            "status": "error",
+            "data": {
+                "output": "",
+                "error": "".join(traceback.format_exception_only(type(e), e)),
+                "returncode": 1,
+            },
+        }
+
+    capture = {"max_output": max_output, "on_output": on_output}
+    try:
+        if HAS_SANDBOX:
+            return run_in_sandbox(code, workdir, stdin, bytecode, **capture)
+        return run_in_subprocess(code, workdir, stdin, **capture)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+def execute(params, on_output=None):
     code = params.get("code", "")
     language = params.get("language", "python")
+    workdir = params.get("workdir")
+    stdin = params.get("stdin")
+    inputs = params.get("inputs")
+
+    # 没有指定输入时，使用上一步（如写的模板）给出的示例输入
+    previous = params.get("data")
+    if stdin is None and inputs is None and isinstance(previous, dict):
+        inputs = previous.get("inputs")
+    if stdin is None and inputs is not None:
+        stdin = "".join(f"{line}\n" for line in inputs)
 
     if not code:
         return {"status": "error", "message": "Code required"}
 
-    return run_code(code, language)
+    if workdir and not os.path.isdir(workdir):
+        return {"status": "error", "message": f"Workdir not found: {workdir}"}
+
+    max_output = int(params.get("max_output") or MAX_OUTPUT)
+    return run_code(code, language, workdir, stdin, max_output, on_output)
+
+
+_forward_lock = threading.Lock()
+
+
+def forward_output(name, text):
+    """把程序输出实时转发给调用方，每段一行JSON"""
+    line = json.dumps({"stream": name, "data": text}, ensure_ascii=False)
+    with _forward_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
 
 
 if __name__ == "__main__":
@@ -79,7 +663,9 @@ if __name__ == "__main__":
         if not input_str.strip():
             raise ValueError("Empty input")
         params = json.loads(input_str)
-        result = execute(params)
+        # stream 为真时先逐段输出 {"stream", "data"}，最后一行是运行结果
+        on_output = forward_output if params.get("stream") else None
+        result = execute(params, on_output)
         print(json.dumps(result, ensure_ascii=False))
     except Exception as e:
         print(json.dumps({"status": "error", "message": str(e)}), file=sys.stderr)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+错误分类 - 仓颉造字计划
+修(xiu)、交付(delivery)、进化(evo) 共用的错误分类器。
+所有规则预编译成一个带命名分组的正则，一次扫描就能得到：
+异常类型、异常消息、出错行号、完整调用栈，以及命中的关键词。
+"""
+
+import re
+import builtins
+
+# 内置异常名（小写 → 标准写法），用于规范大小写
+BUILTIN_EXCEPTIONS = {
+    name.lower(): name
+    for name, obj in vars(builtins).items()
+    if isinstance(obj, type) and issubclass(obj, BaseException)
+}
+
+# 调用栈帧: File "x.py", line 3, in <module>
+FRAME_PATTERN = (
+    r'^[ \t]*File "(?P<file>[^"\n]+)", line (?P<frame_line>\d+)'
+    r"(?:, in (?P<function>[^\n]+))?$"
+)
+
+# 异常行: NameError: name 'x' is not defined
+# 只消费异常类型，消息部分继续参与关键词扫描
+EXCEPTION_PATTERN = (
+    r"(?<![\w.])(?P<type>(?:[A-Za-z_]\w*\.)*"
+    r"[A-Za-z_]\w*(?:Error|Exception|Warning))"
+    r"(?=:[ \t]*(?P<message>[^\n]*)|[ \t]*$)"
+)
+
+# 不带文件名的行号: line 3
+LINE_PATTERN = r"\bline (?P<bare_line>\d+)"
+
+# 已登记的关键词（小写）
+_keywords = set()
+_compiled = None
+
+
+def register_keywords(*groups):
+    """
+    登记需要识别的关键词
+
+    各模块在导入时登记自己关心的关键词，分类器在第一次使用时统一编译。
+    """
+    global _compiled
+    for group in groups:
+        words = [group] if isinstance(group, str) else list(group)
+        for word in words:
+            word = str(word).lower()
+            if word and word not in _keywords:
+                _keywords.add(word)
+                _compiled = None
+
+
+def _trie_pattern(words):
+    """把关键词合并成前缀树形式的正则，匹配时不必逐个尝试"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [
+            re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch
+        ]
+        if not branches:
+            return ""
+        if len(branches) == 1:
+            pattern = branches[0]
+        else:
+            pattern = "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            pattern = f"(?:{pattern})?"
+        return pattern
+
+    return build(trie)
+
+
+def _compile():
+    """编译组合正则"""
+    global _compiled
+    words = sorted(_keywords)
+    # 同一位置只会匹配最长的关键词，记下它覆盖的较短前缀
+    prefixes = {w: [k for k in words if w.startswith(k)] for w in words}
+
+    branches = [FRAME_PATTERN, EXCEPTION_PATTERN, LINE_PATTERN]
+    keyword_re = None
+    if words:
+        keyword_pattern = f"(?=(?P<keyword>{_trie_pattern(words)}))"
+        branches.append(keyword_pattern)
+        keyword_re = re.compile(keyword_pattern, re.IGNORECASE)
+
+    combined = re.compile("|".join(branches), re.IGNORECASE | re.MULTILINE)
+    _compiled = (combined, keyword_re, prefixes)
+    return _compiled
+
+
+def _collect_keywords(match, prefixes, hits):
+    word = match.group("keyword")
+    if word:
+        hits.update(prefixes.get(word.lower(), [word.lower()]))
+
+
+def classify(text):
+    """
+    对错误文本做一次扫描并分类
+
+    Args:
+        text: 错误信息或完整的 traceback
+
+    Returns:
+        dict: {
+            "type": 最后一个异常的类型 (没有则为 None),
+            "message": 异常消息,
+            "line": 出错行号 (用户脚本中最深的一帧),
+            "frames": [{"file", "line", "function"}],
+            "keywords": 命中的已登记关键词 (小写),
+        }
+    """
+    combined, keyword_re, prefixes = _compiled or _compile()
+    text = str(text or "")
+
+    frames = []
+    bare_lines = []
+    error_type = None
+    message = ""
+    hits = set()
+
+    for match in combined.finditer(text):
+        if match.group("file"):
+            frames.append(
+                {
+                    "file": match.group("file"),
+                    "line": int(match.group("frame_line")),
+                    "function": (match.group("function") or "").strip() or None,
+                }
+            )
+        elif match.group("type"):
+            name = match.group("type")
+            short = name.rsplit(".", 1)[-1]
+            error_type = BUILTIN_EXCEPTIONS.get(short.lower(), short)
+            message = (match.group("message") or "").strip()
+            # 异常名本身被消费了，单独补扫一次关键词
+            if keyword_re:
+                for sub in keyword_re.finditer(name):
+                    _collect_keywords(sub, prefixes, hits)
+        elif match.group("bare_line"):
+            bare_lines.append(int(match.group("bare_line")))
+        else:
+            _collect_keywords(match, prefixes, hits)
+
+    # 行号取入口脚本中最深的一帧；没有调用栈时取第一个 "line N"
+    line = None
+    if frames:
+        script = frames[0]["file"]
+        line = [f["line"] for f in frames if f["file"] == script][-1]
+    elif bare_lines:
+        line = bare_lines[0]
+
+    return {
+        "type": error_type,
+        "message": message,
+        "line": line,
+        "frames": frames,
+        "keywords": hits,
+    }
+
+
+def has_keyword(result, *words):
+    """分类结果中是否命中任一关键词"""
+    hits = result.get("keywords", set())
+    return any(w.lower() in hits for w in words)
+
+
+# 测试
+if __name__ == "__main__":
+    print("=== 错误分类 ===")
+    register_keywords(["error", "timeout", "FileNotFoundError", "not found"])
+    sample = """Traceback (most recent call last):
+  File "/tmp/demo.py", line 7, in <module>
+    main()
+  File "/tmp/demo.py", line 4, in main
+    open("missing.txt")
+FileNotFoundError: [Errno 2] No such file or directory: 'missing.txt'"""
+    result = classify(sample)
+    print(f"类型: {result['type']}")
+    print(f"消息: {result['message']}")
+    print(f"行号: {result['line']}")
+    print(f"调用栈: {len(result['frames'])}帧")
+    print(f"关键词: {sorted(result['keywords'])}")
@@ -13,6 +13,8 @@ import json
 import os
 from datetime import datetime
 
+from classifier import classify, has_keyword, register_keywords
+
 # --- 错误翻译字典 ---
 ERROR_TRANSLATIONS = {
     # 网络错误
@@ -49,6 +51,8 @@ ERROR_TRANSLATIONS = {
     "exception": "遇到异常",
 }
 
+register_keywords(ERROR_TRANSLATIONS)
+
 # --- 技能说明字典 ---
 SKILL_GUIDES = {
     "sou": "搜索功能 - 帮你找到网上的信息",
@@ -90,12 +94,12 @@ def explain_error(error_msg, skill_name=None):
             },
         }
 
-    error_lower = str(error_msg).lower()
+    classified = classify(error_msg)
     chinese_errors = []
 
     # 匹配错误翻译
     for eng, chi in ERROR_TRANSLATIONS.items():
-        if eng.lower() in error_lower:
+        if has_keyword(classified, eng):
             chinese_errors.append(chi)
 
     if chinese_errors:
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段下载 - 仓颉造字计划
+取(qu) 的下载器，建立在 httpclient 之上。
+服务端支持 Range 时把文件分成几段，用多个连接并行下载，
+各段直接写入预先分配好大小的临时文件的对应位置 (os.pwrite)。
+下载进度记在日志文件中，连接断开或进程中断后再次下载同一文件时从断点继续；
+下载完成后可以校验 sha256/md5，校验通过才替换目标文件。
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from httpclient import READ_CHUNK, HTTPError, request
+
+# 默认分段数，以及每段的最小大小（文件太小时不分段）
+SEGMENTS = 4
+MIN_SEGMENT_BYTES = 1024 * 1024
+
+# 每段失败后的重试次数（从已下载的位置继续）
+SEGMENT_RETRIES = 3
+
+# 进度日志最多每隔这么多秒写一次
+JOURNAL_INTERVAL = 1.0
+
+PART_SUFFIX = ".part"
+JOURNAL_SUFFIX = ".part.json"
+
+CHECKSUM_ALGORITHMS = {64: "sha256", 32: "md5"}
+
+
+class DownloadError(OSError):
+    """下载失败（进度日志会保留，下次可以继续）"""
+
+
+def write_at(fd, data, offset, lock):
+    """在文件的指定位置写入（没有 os.pwrite 的平台加锁后 seek + write）"""
+    if hasattr(os, "pwrite"):
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data, offset = data[written:], offset + written
+        return
+    with lock:
+        os.lseek(fd, offset, os.SEEK_SET)
+        os.write(fd, data)
+
+
+def parse_checksum(checksum):
+    """
+    "sha256:<hex>" / "md5:<hex>" / 按长度识别的十六进制 → (算法, 小写 hex)
+    """
+    if not checksum:
+        return None
+    algorithm, _, digest = str(checksum).strip().rpartition(":")
+    digest = digest.lower()
+    algorithm = algorithm.lower() or CHECKSUM_ALGORITHMS.get(len(digest))
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"Unsupported checksum: {checksum}")
+    if len(digest) != hashlib.new(algorithm).digest_size * 2:
+        raise ValueError(f"Invalid {algorithm} checksum: {digest}")
+    return algorithm, digest
+
+
+def file_digest(path, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_checksum(path, checksum):
+    """
+    校验文件
+
+    Returns:
+        str | None: 使用的算法（没有指定 checksum 时为 None）
+    """
+    parsed = parse_checksum(checksum)
+    if not parsed:
+        return None
+    algorithm, expected = parsed
+    actual = file_digest(path, algorithm)
+    if actual != expected:
+        raise DownloadError(f"Checksum mismatch ({algorithm}): {actual} != {expected}")
+    return algorithm
+
+
+def content_total(response):
+    """206 的 Content-Range 中的总大小（未知时为 None）"""
+    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def validator(headers):
+    """判断服务端文件是否变化的依据：ETag，没有时用 Last-Modified"""
+    return headers.get("ETag") or headers.get("Last-Modified")
+
+
+def plan_segments(size, segments):
+    """把 [0, size) 分成若干段: [[起点, 终点(含), 已下载字节数], ...]"""
+    count = max(1, min(segments, size // MIN_SEGMENT_BYTES))
+    step = -(-size // count)
+    return [[start, min(size, start + step) - 1, 0] for start in range(0, size, step)]
+
+
+def load_journal(path, url, size, version):
+    """读取进度日志；地址、大小或服务端文件版本不一致时作废"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (journal.get("url"), journal.get("size"), journal.get("validator")) != (
+        url,
+        size,
+        version,
+    ):
+        return None
+    return journal
+
+
+def save_journal(path, journal):
+    temp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(journal, f)
+    os.replace(temp_file, path)
+
+
+def preallocate(path, size):
+    """创建临时文件并分配好大小（支持时用 posix_fallocate 真正占用磁盘空间）"""
+    with open(path, "wb") as f:
+        if size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass
+        f.truncate(size)
+
+
+def remove_quietly(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class SegmentedDownload:
+    """一次分段下载：各段共用同一个文件描述符和进度日志"""
+
+    def __init__(self, url, part_path, journal_path, journal, headers, timeout):
+        self.url = url
+        self.part_path = part_path
+        self.journal_path = journal_path
+        self.journal = journal
+        self.headers = headers
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.saved = time.monotonic()
+        self.downloaded = 0
+        self.fd = None
+
+    def checkpoint(self, force=False):
+        with self.lock:
+            if force or time.monotonic() - self.saved >= JOURNAL_INTERVAL:
+                save_journal(self.journal_path, self.journal)
+                self.saved = time.monotonic()
+
+    def fetch_segment(self, segment):
+        """下载一段，连接断开时从已写入的位置继续"""
+        for attempt in range(SEGMENT_RETRIES + 1):
+            start, end, done = segment
+            if start + done > end:
+                return
+            headers = dict(self.headers)
+            headers["Range"] = f"bytes={start + done}-{end}"
+            # 服务端文件变了会返回 200 整个文件，不能拼到旧的内容后面
+            if self.journal.get("validator"):
+                headers["If-Range"] = self.journal["validator"]
+            try:
+                response = request(
+                    "GET", self.url, headers=headers, timeout=self.timeout, stream=True
+                )
+                with response:
+                    if response.status != 206:
+                        raise DownloadError(
+                            f"Range not honored (HTTP {response.status}), "
+                            "the file may have changed on the server"
+                        )
+                    for chunk in response.iter_content(READ_CHUNK):
+                        chunk = chunk[: end + 1 - (start + segment[2])]
+                        write_at(self.fd, chunk, start + segment[2], self.write_lock)
+                        with self.lock:
+                            segment[2] += len(chunk)
+                            self.downloaded += len(chunk)
+                        self.checkpoint()
+                        if start + segment[2] > end:
+                            break
+                if start + segment[2] > end:
+                    return
+            except HTTPError:
+                if attempt == SEGMENT_RETRIES:
+                    raise
+        raise DownloadError(f"Segment incomplete: bytes={start}-{end}")
+
+    def run(self):
+        self.fd = os.open(self.part_path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        try:
+            segments = self.journal["segments"]
+            with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+                futures = [pool.submit(self.fetch_segment, s) for s in segments]
+                errors = [f.exception() for f in futures]
+            os.fsync(self.fd)
+        finally:
+            os.close(self.fd)
+            self.checkpoint(force=True)
+        for error in errors:
+            if error:
+                raise error
+
+
+def stream_to(response, part_path):
+    """不支持 Range 时单连接顺序写入"""
+    size = 0
+    with open(part_path, "wb") as f:
+        for chunk in response.iter_content(READ_CHUNK):
+            f.write(chunk)
+            size += len(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    return size
+
+
+def download(url, output, segments=SEGMENTS, checksum=None, headers=None, timeout=None):
+    """
+    下载到 output（完成并校验通过后才替换目标文件）
+
+    先发一个只要第一个字节的 Range 请求探测：返回 206 且有总大小说明支持分段，
+    按总大小分段并行下载；返回 200 时直接用这个响应单连接下载。
+
+    Returns:
+        dict: {"path", "size", "segments", "resumed", "downloaded", "elapsed",
+               "throughput", "checksum", "headers"}
+    """
+    parse_checksum(checksum)
+    started = time.monotonic()
+    part_path = output + PART_SUFFIX
+    journal_path = output + JOURNAL_SUFFIX
+    headers = dict(headers or {})
+    headers["Accept-Encoding"] = "identity"
+
+    probe = request(
+        "GET",
+        url,
+        headers={**headers, "Range": "bytes=0-0"},
+        timeout=timeout,
+        stream=True,
+    )
+    if probe.status == 416 or (probe.status == 206 and not content_total(probe)):
+        # 空文件没有第一个字节；总大小未知（bytes 0-0/*）时 206 响应只有探测的
+        # 一个字节，不能分段。都改用不带 Range 的普通请求下载
+        probe.close()
+        probe = request("GET", url, headers=headers, timeout=timeout, stream=True)
+    if probe.status >= 400:
+        probe.close()
+        raise HTTPError(f"HTTP Error {probe.status}: {probe.reason}", probe.status, url)
+
+    size = content_total(probe) if probe.status == 206 else None
+    resumed = 0
+    if size:
+        probe.read()
+        version = validator(probe.headers)
+        journal = load_journal(journal_path, url, size, version)
+        if journal and os.path.exists(part_path):
+            resumed = sum(s[2] for s in journal["segments"])
+        else:
+            journal = {
+                "url": url,
+                "size": size,
+                "validator": version,
+                "segments": plan_segments(size, max(1, int(segments))),
+            }
+            preallocate(part_path, size)
+            save_journal(journal_path, journal)
+        task = SegmentedDownload(
+            url, part_path, journal_path, journal, headers, timeout
+        )
+        task.run()
+        downloaded = task.downloaded
+        used_segments = len(journal["segments"])
+    else:
+        # 不支持 Range：探测请求（或重发的普通请求）本身就是完整的下载
+        with probe:
+            downloaded = size = stream_to(probe, part_path)
+        used_segments = 1
+
+    try:
+        algorithm = verify_checksum(part_path, checksum)
+    except DownloadError:
+        # 内容有误，进度日志也不可信，下次重新下载
+        remove_quietly(part_path, journal_path)
+        raise
+    os.replace(part_path, output)
+    remove_quietly(journal_path)
+
+    elapsed = time.monotonic() - started
+    return {
+        "path": output,
+        "size": size,
+        "segments": used_segments,
+        "resumed": resumed,
+        "downloaded": downloaded,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(downloaded / elapsed) if elapsed > 0 else None,
+        "checksum": algorithm,
+        "headers": probe.headers,
+    }
+
+
+# 测试
+if __name__ == "__main__":
+    import sys
+
+    print("=== 分段下载 ===")
+    if len(sys.argv) < 3:
+        print("用法: python downloader.py <URL> <输出文件> [分段数] [checksum]")
+        sys.exit(0)
+    result = download(
+        sys.argv[1],
+        sys.argv[2],
+        int(sys.argv[3]) if len(sys.argv) > 3 else SEGMENTS,
+        sys.argv[4] if len(sys.argv) > 4 else None,
+    )
+    result.pop("headers")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
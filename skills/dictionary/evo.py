@@ -12,9 +12,21 @@ import sys
 from datetime import datetime
 from glob import glob
 
+from classifier import classify, has_keyword, register_keywords
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SKILLS_DIR = os.path.join(BASE_DIR, "characters")
 
+# 错误关键词 → 问题类型
+ISSUE_KEYWORDS = [
+    (("not found", "不存在"), "MISSING_SKILL"),
+    (("template", "required"), "BAD_INPUT"),
+    (("timeout", "超时"), "PERFORMANCE"),
+    (("invalid", "无效"), "INVALID_DATA"),
+]
+
+register_keywords(*(words for words, _ in ISSUE_KEYWORDS))
+
 
 class SelfEvolver:
     """自我进化器"""
@@ -25,25 +37,19 @@ class SelfEvolver:
 
     def diagnose(self, requirement, result, error):
         """自我诊断 - 分析失败原因"""
+        classified = classify(error)
         diagnosis = {
             "requirement": requirement,
             "error": str(error)[:200],
+            "error_type": classified["type"],
             "timestamp": datetime.now().isoformat(),
             "issues": [],
         }
 
         # 诊断问题类型
-        if "not found" in str(error).lower() or "不存在" in str(error):
-            diagnosis["issues"].append("MISSING_SKILL")
-
-        if "template" in str(error).lower() or "required" in str(error).lower():
-            diagnosis["issues"].append("BAD_INPUT")
-
-        if "timeout" in str(error).lower() or "超时" in str(error):
-            diagnosis["issues"].append("PERFORMANCE")
-
-        if "invalid" in str(error).lower() or "无效" in str(error):
-            diagnosis["issues"].append("INVALID_DATA")
+        for words, issue in ISSUE_KEYWORDS:
+            if has_keyword(classified, *words):
+                diagnosis["issues"].append(issue)
 
         # 意图未被识别
         if "execute" in str(result).lower() and "search" not in str(result).lower():
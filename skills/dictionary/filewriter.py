@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+原子写入 - 仓颉造字计划
+存(cun) 的写文件工具：先写同目录下的临时文件，按同步策略 fsync 后再用 os.replace
+替换目标文件，进程崩溃或断电时目标文件要么是旧内容，要么是完整的新内容，不会只写了一半。
+可以边写边压缩（gzip / lzma），也可以在一次调用中用线程池写入多个文件。
+"""
+
+import os
+import stat
+import gzip
+import lzma
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 压缩方式和对应的文件后缀（未指定时按后缀推断）
+COMPRESSIONS = {"gzip": ".gz", "lzma": ".xz"}
+
+# 同步策略：
+#   always - 每个文件 fsync，替换后再 fsync 所在目录
+#   batch  - 每个文件 fsync，全部替换完后每个目录只 fsync 一次
+#   never  - 不 fsync（进程崩溃时仍是原子的，断电时可能丢失）
+FSYNC_POLICIES = ("always", "batch", "never")
+
+# 每次写入（和压缩）的块大小
+WRITE_CHUNK = 1024 * 1024
+
+# 批量写入的最大并发数
+MAX_WORKERS = 8
+
+
+def compression_for(path, compress=None):
+    """指定的压缩方式；未指定时按 .gz / .xz 后缀推断，都不是时不压缩"""
+    if compress:
+        if compress not in COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compress}")
+        return compress
+    for name, suffix in COMPRESSIONS.items():
+        if path.lower().endswith(suffix):
+            return name
+    return None
+
+
+def to_bytes(content):
+    """文本按 UTF-8 编码，bytes 原样写入，其他内容（如搜索结果）写成 JSON"""
+    if isinstance(content, bytes):
+        return content
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False, indent=2)
+    return content.encode("utf-8")
+
+
+def write_stream(f, data, compress):
+    """分块写入已打开的文件，压缩时边压缩边写（不在内存中先压缩整个文件）"""
+    if compress == "gzip":
+        stream = gzip.GzipFile(filename="", mode="wb", fileobj=f)
+    elif compress == "lzma":
+        stream = lzma.LZMAFile(f, mode="wb")
+    else:
+        stream = f
+    view = memoryview(data)
+    for start in range(0, len(view), WRITE_CHUNK):
+        stream.write(view[start : start + WRITE_CHUNK])
+    if stream is not f:
+        # 写入压缩流的结尾，不关闭底层文件
+        stream.close()
+    f.flush()
+
+
+def fsync_directory(path):
+    """fsync 目录，让 os.replace 本身也落盘（不支持的平台忽略）"""
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def copy_mode(source, target):
+    """替换前把原文件的权限复制到临时文件（原文件不存在时保持默认权限）"""
+    try:
+        mode = stat.S_IMODE(os.stat(source).st_mode)
+    except FileNotFoundError:
+        return
+    os.chmod(target, mode)
+
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def write_file(path, content, mode="write", compress=None, fsync="batch"):
+    """
+    写入一个文件
+
+    path 是符号链接时写入它指向的文件（链接本身保留），原文件的权限也保留。
+
+    Args:
+        mode: write（原子替换）/ append（追加，压缩时追加一个新的 gzip/xz 片段）
+        fsync: 同步策略，见 FSYNC_POLICIES；batch 时目录由调用方统一 fsync
+
+    Returns:
+        dict: {"path", "bytes_written"（压缩前）, "size"（磁盘上）, "compress"}
+    """
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"Unsupported fsync policy: {fsync}")
+    compress = compression_for(path, compress)
+    data = to_bytes(content)
+    target = os.path.realpath(path)
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+
+    if mode == "append":
+        with open(target, "ab") as f:
+            write_stream(f, data, compress)
+            if fsync != "never":
+                os.fsync(f.fileno())
+    else:
+        temp_file = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_file, "wb") as f:
+                write_stream(f, data, compress)
+                if fsync != "never":
+                    os.fsync(f.fileno())
+            copy_mode(target, temp_file)
+            os.replace(temp_file, target)
+        except BaseException:
+            remove_quietly(temp_file)
+            raise
+        if fsync == "always":
+            fsync_directory(directory)
+
+    return {
+        "path": path,
+        "bytes_written": len(data),
+        "size": os.path.getsize(target),
+        "compress": compress,
+    }
+
+
+def write_files(items, fsync="batch", workers=MAX_WORKERS):
+    """
+    用线程池写入多个文件，单个文件失败不影响其他文件
+
+    Args:
+        items: [{"path", "content", "mode"?, "compress"?}, ...]
+
+    Returns:
+        list: 与 items 顺序一致的 [{"path", "status", "data" | "message"}]
+    """
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"Unsupported fsync policy: {fsync}")
+
+    def write_item(item):
+        try:
+            data = write_file(
+                item["path"],
+                item.get("content", ""),
+                item.get("mode", "write"),
+                item.get("compress"),
+                fsync,
+            )
+            return {"path": item["path"], "status": "success", "data": data}
+        except Exception as e:
+            return {"path": item["path"], "status": "error", "message": str(e)}
+
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items)))) as pool:
+        results = list(pool.map(write_item, items))
+
+    if fsync == "batch":
+        directories = {
+            os.path.dirname(os.path.realpath(r["path"]))
+            for r in results
+            if r["status"] == "success"
+        }
+        for directory in directories:
+            fsync_directory(directory)
+    return results
+
+
+# 测试
+if __name__ == "__main__":
+    import time
+    import tempfile
+
+    print("=== 原子写入 ===")
+    with tempfile.TemporaryDirectory() as directory:
+        items = [
+            {"path": os.path.join(directory, f"{i:03d}.txt"), "content": "仓颉\n" * 99}
+            for i in range(200)
+        ]
+        archive = os.path.join(directory, "all.json.gz")
+        items.append({"path": archive, "content": list(items)})
+        for policy in FSYNC_POLICIES:
+            started = time.time()
+            results = write_files(items, policy)
+            failed = sum(r["status"] != "success" for r in results)
+            elapsed = (time.time() - started) * 1000
+            print(f"{policy}: {len(results)}个文件, 失败{failed}, {elapsed:.0f}ms")
+        print(f"压缩: {results[-1]['data']}")
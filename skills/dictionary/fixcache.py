@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+修复缓存 - 仓颉造字计划
+记录 (错误签名, 代码哈希) → 修复后的代码，以及修复后的代码是否通过了验证。
+同样的代码再出同样的错时，修直接取用验证过的修复；写据此标记已知有问题的模板。
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(BASE_DIR, ".cache", "fixes.json")
+
+# 最多保留的修复记录数，超出时淘汰最久未更新的
+MAX_ENTRIES = 200
+
+# 错误消息中与修复无关、每次运行都会变化的部分
+VOLATILE_PATTERNS = [
+    (re.compile(r"0x[0-9a-fA-F]+"), "0x?"),
+    (re.compile(r"\bline \d+"), "line ?"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def code_hash(code):
+    """代码哈希（忽略换行符差异和行尾空白）"""
+    lines = str(code or "").replace("\r\n", "\n").split("\n")
+    normalized = "\n".join(line.rstrip() for line in lines).strip("\n")
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def error_signature(error_type, message):
+    """规范化的错误签名：错误类型 + 去掉易变部分的消息"""
+    message = str(message or "")
+    for pattern, replacement in VOLATILE_PATTERNS:
+        message = pattern.sub(replacement, message)
+    return f"{error_type or 'Error'}: {message.strip()}"
+
+
+def make_key(signature, code):
+    """缓存键：代码哈希 + 签名哈希"""
+    digest = hashlib.sha256(signature.encode("utf-8")).hexdigest()[:12]
+    return f"{code_hash(code)}:{digest}"
+
+
+def load_cache():
+    """加载缓存"""
+    if os.path.exists(CACHE_FILE):
+        try:
+            with open(CACHE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {"entries": {}}
+
+
+def save_cache(cache):
+    """保存缓存（先写临时文件再替换，避免并发读到半个文件）"""
+    entries = cache.get("entries", {})
+    if len(entries) > MAX_ENTRIES:
+        keep = sorted(entries, key=lambda k: entries[k].get("updated", ""))
+        for key in keep[: len(entries) - MAX_ENTRIES]:
+            del entries[key]
+
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        temp_file = f"{CACHE_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, CACHE_FILE)
+    except OSError:
+        pass
+
+
+def lookup_fix(signature, code):
+    """
+    查找已知的修复
+
+    Returns:
+        dict | None: 修复记录；验证失败过的修复不再返回
+    """
+    entry = load_cache()["entries"].get(make_key(signature, code))
+    if not entry or entry.get("passed") is False:
+        return None
+    return entry
+
+
+def store_fix(signature, code, fixed_code):
+    """记录一次修复（是否通过验证待 record_result 回填）"""
+    cache = load_cache()
+    key = make_key(signature, code)
+    entry = cache["entries"].get(key, {})
+    fixed_hash = code_hash(fixed_code)
+
+    if entry.get("fixed_hash") != fixed_hash:
+        entry = {"passed": None, "hits": 0}
+    entry.update(
+        {
+            "signature": signature,
+            "code_hash": code_hash(code),
+            "fixed_code": fixed_code,
+            "fixed_hash": fixed_hash,
+            "hits": entry.get("hits", 0) + 1,
+            "updated": datetime.now().isoformat(),
+        }
+    )
+    cache["entries"][key] = entry
+    save_cache(cache)
+    return entry
+
+
+def record_result(fixed_code, passed):
+    """回填修复后的代码是否通过了验证，返回更新的记录数"""
+    cache = load_cache()
+    fixed_hash = code_hash(fixed_code)
+    updated = 0
+
+    for entry in cache["entries"].values():
+        if entry.get("fixed_hash") == fixed_hash:
+            entry["passed"] = bool(passed)
+            entry["updated"] = datetime.now().isoformat()
+            updated += 1
+
+    if updated:
+        save_cache(cache)
+    return updated
+
+
+def known_failures(code):
+    """这段代码出过的错及对应的修复（写用来标记有问题的模板）"""
+    target = code_hash(code)
+    return [e for e in load_cache()["entries"].values() if e.get("code_hash") == target]
+
+
+# 测试
+if __name__ == "__main__":
+    print("=== 修复缓存 ===")
+    entries = load_cache()["entries"]
+    passed = sum(1 for e in entries.values() if e.get("passed"))
+    failed = sum(1 for e in entries.values() if e.get("passed") is False)
+    print(f"修复记录: {len(entries)}条 (通过 {passed}, 失败 {failed})")
+    for entry in sorted(entries.values(), key=lambda e: -e.get("hits", 0))[:5]:
+        print(f"  [{entry.get('passed')}] x{entry.get('hits', 0)} {entry['signature']}")
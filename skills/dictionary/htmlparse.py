@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML 解析 - 仓颉造字计划
+基于 html.parser 的流式解析，边下载边解析，不需要先拿到完整页面。
+搜(sou) 用 SearchResultParser 从结果页中提取标题、链接和摘要，
+取够条数就停止读取；读(du) 用 read_document 识别编码并提取网页正文。
+"""
+
+import re
+import codecs
+import itertools
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, urlunsplit
+
+# 摘要最多保留的字符数
+SNIPPET_CHARS = 200
+
+# 内容不参与提取的标签
+SKIP_TAGS = ("script", "style", "noscript", "template")
+
+# 结果容器的 class（百度: result / c-container，必应: b_algo）
+RESULT_CLASSES = ("result", "c-container", "b_algo")
+
+# 可以作为结果容器的标签
+CONTAINER_TAGS = ("div", "li", "article", "section")
+
+
+def normalize_url(url):
+    """去重用的规范化 URL：协议和主机小写，去掉默认端口、片段和末尾的斜杠"""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    default_port = {"http": ":80", "https": ":443"}.get(scheme)
+    if default_port and netloc.endswith(default_port):
+        netloc = netloc[: -len(default_port)]
+    path = parts.path.rstrip("/")
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+def clean_text(parts):
+    return " ".join("".join(parts).split())
+
+
+class SearchResultParser(HTMLParser):
+    """
+    搜索结果页的流式解析器
+
+    结果取自标题标签（默认 <h3>）中的链接，摘要是结果容器中标题之后的文字；
+    页面没有标题结果时，退回到页面中普通的外部链接。
+    """
+
+    def __init__(
+        self,
+        limit=10,
+        exclude_hosts=(),
+        title_tags=("h3",),
+        result_classes=RESULT_CLASSES,
+    ):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.exclude_hosts = tuple(exclude_hosts)
+        self.title_tags = tuple(title_tags)
+        self.result_classes = tuple(result_classes)
+        self.results = []
+        self.fallback = []
+        self.seen = set()
+        self.done = False
+
+        self._skip = 0
+        self._title = 0
+        self._containers = []
+        self._container_url = None
+        self._link = None
+        self._link_text = []
+        self._pending = None
+        self._snippet = []
+        self._snippet_len = 0
+
+    # --- 结果 ---
+
+    def _accept(self, url, title, target):
+        if not title or len(title) < 2 or not url.startswith(("http://", "https://")):
+            return None
+        key = normalize_url(url)
+        if key in self.seen:
+            return None
+        self.seen.add(key)
+        result = {"title": title, "url": url, "snippet": ""}
+        target.append(result)
+        return result
+
+    def _excluded(self, url):
+        host = urlsplit(url).hostname or ""
+        return any(host == h or host.endswith(f".{h}") for h in self.exclude_hosts)
+
+    def _finish_pending(self):
+        """结束当前结果的摘要；取够条数后标记完成"""
+        if self._pending is not None:
+            self._pending["snippet"] = clean_text(self._snippet)[:SNIPPET_CHARS]
+            self._pending = None
+        if len(self.results) >= self.limit:
+            self.done = True
+
+    # --- HTMLParser 回调 ---
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag in SKIP_TAGS:
+            self._skip += 1
+            return
+        attrs = dict(attrs)
+
+        if tag in CONTAINER_TAGS:
+            classes = (attrs.get("class") or "").split()
+            is_result = any(c in self.result_classes for c in classes)
+            if is_result:
+                self._finish_pending()
+                # 百度在容器的 mu 属性里给出真实地址，链接本身是跳转地址
+                mu = attrs.get("mu") or ""
+                self._container_url = mu if mu.startswith("http") else None
+            self._containers.append(is_result)
+        elif tag in self.title_tags:
+            self._finish_pending()
+            self._title += 1
+        elif tag == "a" and attrs.get("href"):
+            self._link = attrs["href"]
+            self._link_text = []
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+            return
+
+        if tag in CONTAINER_TAGS and self._containers:
+            if self._containers.pop():
+                self._finish_pending()
+                self._container_url = None
+        elif tag in self.title_tags:
+            self._title = max(0, self._title - 1)
+        elif tag == "a" and self._link is not None:
+            url, title = self._link, clean_text(self._link_text)
+            self._link = None
+            if self._title:
+                url = self._container_url or url
+                result = self._accept(url, title, self.results)
+                if result is not None:
+                    self._pending = result
+                    self._snippet = []
+                    self._snippet_len = 0
+            elif len(title) <= 50 and len(self.fallback) < self.limit:
+                if not self._excluded(url):
+                    self._accept(url, title, self.fallback)
+
+    def handle_data(self, data):
+        if self.done or self._skip:
+            return
+        if self._link is not None:
+            self._link_text.append(data)
+        elif self._pending is not None and not self._title:
+            self._snippet.append(data)
+            self._snippet_len += len(data)
+            if self._snippet_len >= SNIPPET_CHARS:
+                self._finish_pending()
+
+    def finish(self):
+        """解析结束：收尾最后一条结果；没有标题结果时使用普通链接"""
+        self._finish_pending()
+        if not self.results:
+            self.results = self.fallback
+        return self.results[: self.limit]
+
+
+# 换行分隔的块级标签
+BLOCK_TAGS = (
+    "p",
+    "div",
+    "br",
+    "li",
+    "tr",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "pre",
+    "section",
+    "article",
+    "main",
+    "header",
+    "blockquote",
+    "table",
+)
+
+# 页面框架（导航、侧栏、页脚、表单等），提取正文时整块跳过
+BOILERPLATE_TAGS = ("nav", "aside", "footer", "form", "iframe", "svg", "select")
+BOILERPLATE_ROLES = ("navigation", "banner", "contentinfo", "complementary", "search")
+
+# 没有结束标签的元素
+VOID_TAGS = ("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta")
+
+# 正文容器：其中的文字足够多时只取正文容器的文字
+MAIN_TAGS = ("main", "article")
+MIN_MAIN_CHARS = 200
+
+# 识别编码时查看的开头字节数
+SNIFF_BYTES = 16 * 1024
+
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.I)
+
+# GB2312/GBK 都按它们的超集 GB18030 解码
+CHARSET_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "x-gbk": "gb18030"}
+
+
+def normalize_charset(name):
+    """规范化编码名称，不认识的编码返回 None"""
+    name = (name or "").strip().strip("\"'").lower()
+    name = CHARSET_ALIASES.get(name, name)
+    try:
+        return codecs.lookup(name).name if name else None
+    except LookupError:
+        return None
+
+
+def header_charset(content_type):
+    for part in (content_type or "").split(";")[1:]:
+        key, _, value = part.strip().partition("=")
+        if key.lower() == "charset":
+            return normalize_charset(value)
+    return None
+
+
+def declared_charset(head, content_type=None):
+    """内容声明的编码：BOM > Content-Type > <meta charset>，都没有时返回 None"""
+    for bom, charset in BOMS:
+        if head.startswith(bom):
+            return charset
+    charset = header_charset(content_type)
+    if charset:
+        return charset
+    match = META_CHARSET.search(head[:SNIFF_BYTES])
+    return normalize_charset(match.group(1).decode("ascii")) if match else None
+
+
+def detect_charset(head, content_type=None):
+    """
+    识别编码：BOM > Content-Type > <meta charset> > 按内容猜测（UTF-8，否则 GB18030）
+
+    Args:
+        head: 内容开头的 bytes（一般取 SNIFF_BYTES）
+    """
+    charset = declared_charset(head, content_type)
+    if charset:
+        return charset
+    for guess in ("utf-8", "gb18030"):
+        try:
+            # 开头可能在多字节字符中间截断，不做最终检查
+            codecs.getincrementaldecoder(guess)().decode(head)
+            return guess
+        except UnicodeDecodeError:
+            continue
+    return "utf-8"
+
+
+def redetect_charset(data):
+    """
+    按完整内容重新猜测编码：开头是纯 ASCII 被猜成 UTF-8、后面却不是 UTF-8 时
+    （出现了替换字符），整个内容能按 GB18030 解码就改用 GB18030
+
+    Returns:
+        str | None: 需要改用的编码，不需要改时返回 None
+    """
+    try:
+        data.decode("utf-8")
+        return None
+    except UnicodeDecodeError:
+        pass
+    try:
+        data.decode("gb18030")
+        return "gb18030"
+    except UnicodeDecodeError:
+        return None
+
+
+def looks_like_html(content):
+    head = content[:1000] if content else ""
+    if isinstance(head, bytes):
+        head = head.decode("latin-1")
+    head = head.lower()
+    return "<html" in head or "<!doctype html" in head or "<body" in head
+
+
+class TextExtractor(HTMLParser):
+    """
+    提取网页的标题和正文文字
+
+    跳过脚本、样式和页面框架（导航、侧栏、页脚等），块级标签之间换行；
+    页面有 <main>/<article> 且其中文字足够多时只取其中的文字。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.parts = []
+        self.main_parts = []
+        self._skip = 0
+        self._in_title = False
+        self._boilerplate = None
+        self._boilerplate_depth = 0
+        self._main = None
+        self._main_depth = 0
+
+    def _block(self):
+        self.parts.append("\n")
+        if self._main:
+            self.main_parts.append("\n")
+
+    def handle_starttag(self, tag, attrs):
+        if self._boilerplate:
+            if tag == self._boilerplate:
+                self._boilerplate_depth += 1
+            return
+        role = (dict(attrs).get("role") or "").lower()
+        if tag in BOILERPLATE_TAGS or (
+            role in BOILERPLATE_ROLES and tag not in VOID_TAGS
+        ):
+            self._boilerplate = tag
+            self._boilerplate_depth = 1
+        elif tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag == "title":
+            self._in_title = True
+        else:
+            if tag in MAIN_TAGS and not self._main:
+                self._main = tag
+            if tag == self._main:
+                self._main_depth += 1
+            if tag in BLOCK_TAGS:
+                self._block()
+
+    def handle_endtag(self, tag):
+        if self._boilerplate:
+            if tag == self._boilerplate:
+                self._boilerplate_depth -= 1
+                if not self._boilerplate_depth:
+                    self._boilerplate = None
+            return
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag == "title":
+            self._in_title = False
+        else:
+            if tag in BLOCK_TAGS:
+                self._block()
+            if tag == self._main:
+                self._main_depth -= 1
+                if not self._main_depth:
+                    self._main = None
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/> 等自闭合标签不改变层级
+        if not self._boilerplate and tag in BLOCK_TAGS:
+            self._block()
+
+    def handle_data(self, data):
+        if self._skip or self._boilerplate:
+            return
+        if self._in_title:
+            self.title += data
+            return
+        self.parts.append(data)
+        if self._main:
+            self.main_parts.append(data)
+
+    def text(self):
+        main = join_lines(self.main_parts)
+        return main if len(main) >= MIN_MAIN_CHARS else join_lines(self.parts)
+
+
+def join_lines(parts):
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def html_to_text(html):
+    """
+    网页 → (标题, 正文文字)
+    """
+    extractor = TextExtractor()
+    extractor.feed(str(html or ""))
+    extractor.close()
+    return " ".join(extractor.title.split()), extractor.text()
+
+
+def read_document(chunks, content_type=None, keep_raw=False):
+    """
+    边读边解码，编码从开头的内容识别；网页同时用 TextExtractor 提取标题和正文，
+    不需要先拿到完整的页面
+
+    Args:
+        chunks: 内容的 bytes 块
+        content_type: Content-Type（可以为 None），其中的 charset 和 html 类型优先
+        keep_raw: 是否同时保留解码后的原文
+
+    Returns:
+        dict: {"text", "title", "encoding", "html", "bytes", "raw", "replaced"}
+    """
+    chunks = iter(chunks)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= SNIFF_BYTES:
+            break
+
+    is_html = "html" in (content_type or "").lower() or looks_like_html(head)
+    chunks = itertools.chain((head,), chunks)
+    encoding = declared_charset(head, content_type)
+    if encoding:
+        return decode_document(chunks, encoding, is_html, keep_raw)
+
+    # 编码是从开头猜的：保留原始内容，后面出现替换字符时按完整内容重新识别
+    blocks = []
+    encoding = detect_charset(head, content_type)
+    document = decode_document(chunks, encoding, is_html, keep_raw, blocks)
+    if document["replaced"]:
+        better = redetect_charset(b"".join(blocks))
+        if better and better != encoding:
+            document = decode_document(blocks, better, is_html, keep_raw)
+    return document
+
+
+def decode_document(chunks, encoding, is_html, keep_raw=False, blocks=None):
+    """
+    按给定的编码边读边解码 read_document 的内容
+
+    Args:
+        blocks: 不为 None 时把读到的 bytes 块加入这个列表（供换编码后重新解码）
+
+    Returns:
+        dict: read_document 的结果，另有 "replaced"（是否出现了替换字符）
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    extractor = TextExtractor() if is_html else None
+    parts = []
+    raw = []
+    size = 0
+    replaced = False
+
+    def consume(data, final=False):
+        nonlocal replaced
+        text = decoder.decode(data, final)
+        replaced = replaced or "\ufffd" in text
+        if keep_raw:
+            raw.append(text)
+        if extractor is not None:
+            extractor.feed(text)
+        else:
+            parts.append(text)
+
+    for data in chunks:
+        size += len(data)
+        if blocks is not None:
+            blocks.append(data)
+        consume(data)
+    consume(b"", final=True)
+
+    if extractor is not None:
+        extractor.close()
+        title, text = " ".join(extractor.title.split()), extractor.text()
+    else:
+        title, text = None, "".join(parts)
+    return {
+        "text": text,
+        "title": title,
+        "encoding": encoding,
+        "html": is_html,
+        "bytes": size,
+        "raw": "".join(raw) if keep_raw else None,
+        "replaced": replaced,
+    }
+
+
+def parse_results(chunks, limit=10, encoding="utf-8", **options):
+    """
+    边读边解析搜索结果页，取够 limit 条就停止读取
+
+    Args:
+        chunks: 页面内容的 bytes 块（可迭代对象，停止迭代即停止下载）
+        options: 传给 SearchResultParser 的 exclude_hosts / title_tags / result_classes
+
+    Returns:
+        tuple: (结果列表, 实际读取的字节数)
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parser = SearchResultParser(limit, **options)
+    consumed = 0
+    for chunk in chunks:
+        consumed += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.done:
+            break
+    else:
+        parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return parser.finish(), consumed
+
+
+# 测试
+if __name__ == "__main__":
+    import os
+    import sys
+
+    print("=== HTML 解析 ===")
+    fixture = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "characters",
+        "sou",
+        "fixtures",
+        "baidu_results.html",
+    )
+    path = sys.argv[1] if len(sys.argv) > 1 else fixture
+    with open(path, "rb") as f:
+        page = f.read()
+
+    for limit in (2, 10):
+        chunks = (page[i : i + 512] for i in range(0, len(page), 512))
+        results, consumed = parse_results(chunks, limit, exclude_hosts=["baidu.com"])
+        print(f"limit={limit}: {len(results)}条, 读取 {consumed}/{len(page)} 字节")
+        for r in results:
+            print(f"  {r['title']} | {r['url']}")
+            print(f"    {r['snippet'][:60]}")
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 缓存 - 仓颉造字计划
+读(du)、搜(sou) 共用的磁盘 HTTP 缓存，建立在 httpclient 之上。
+按 Cache-Control / Expires 判断缓存是否新鲜：新鲜的直接从磁盘返回，不发请求；
+过期但有 ETag / Last-Modified 的发条件请求，服务端回 304 时正文仍从磁盘读取。
+缓存总大小有上限，超出时按最近使用时间淘汰。
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import email.message
+from email.utils import parsedate_to_datetime
+
+from httpclient import READ_CHUNK, HTTPError, Response, get
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, ".cache", "http")
+
+# 缓存总大小上限，以及单个响应的大小上限（超过的不缓存）
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+MAX_ENTRY_BYTES = 32 * 1024 * 1024
+
+# 缓存时保留的响应头（正文已解压，Content-Encoding 等不再适用）
+STORED_HEADERS = (
+    "Content-Type",
+    "ETag",
+    "Last-Modified",
+    "Cache-Control",
+    "Expires",
+    "Date",
+)
+
+
+class CachedResponse(Response):
+    """
+    带缓存状态的响应（正文已在内存中）
+
+    cache_status: hit（新鲜缓存）/ revalidated（304）/ stale（网络出错时的过期缓存）
+                  / miss（新请求）/ bypass（不可缓存）
+    """
+
+    def __init__(self, status, reason, headers, url, content, cache_status):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.url = url
+        self.history = []
+        self.cache_status = cache_status
+        self._content = content
+        self._released = True
+
+
+def cache_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+
+def entry_paths(url):
+    base = os.path.join(CACHE_DIR, cache_key(url))
+    return f"{base}.json", f"{base}.body"
+
+
+def parse_cache_control(value):
+    """Cache-Control → {指令: 值}（没有值的指令为 True）"""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else True
+    return directives
+
+
+def parse_http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_deadline(headers, now=None):
+    """响应在什么时间之前是新鲜的（0 表示每次都要重新验证）"""
+    now = now or time.time()
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-cache" in directives:
+        return 0
+
+    max_age = directives.get("max-age")
+    if max_age not in (None, True):
+        try:
+            age = int(headers.get("Age") or 0)
+            return now + int(max_age) - age
+        except ValueError:
+            return 0
+
+    expires = parse_http_date(headers.get("Expires"))
+    if expires is not None:
+        date = parse_http_date(headers.get("Date")) or now
+        return now + (expires - date)
+    return 0
+
+
+def is_storable(response):
+    """只缓存 200，遵守 no-store 和 Vary: *，且至少能新鲜一段时间或可以重新验证"""
+    if response.status != 200:
+        return False
+    directives = parse_cache_control(response.headers.get("Cache-Control"))
+    if "no-store" in directives or response.headers.get("Vary", "").strip() == "*":
+        return False
+    has_validator = response.headers.get("ETag") or response.headers.get(
+        "Last-Modified"
+    )
+    return bool(has_validator) or freshness_deadline(response.headers) > time.time()
+
+
+def load_entry(url):
+    """读取缓存元数据（正文文件缺失时视为没有缓存）"""
+    meta_path, body_path = entry_paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("url") != url or not os.path.exists(body_path):
+        return None
+    return entry
+
+
+def write_atomic(path, data, mode="w"):
+    temp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if "b" in mode:
+        with open(temp_file, mode) as f:
+            f.write(data)
+    else:
+        with open(temp_file, mode, encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_file, path)
+
+
+def save_entry(url, response, body_file=None):
+    """
+    写入缓存
+
+    Args:
+        body_file: 正文已经在磁盘上时（下载的文件）直接复制，不经过内存
+    """
+    meta_path, body_path = entry_paths(url)
+    entry = {
+        "url": url,
+        "status": response.status,
+        "reason": response.reason,
+        "headers": {
+            name: response.headers[name]
+            for name in STORED_HEADERS
+            if response.headers.get(name)
+        },
+        "stored": time.time(),
+        "fresh_until": freshness_deadline(response.headers),
+    }
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        if body_file:
+            temp_file = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(body_file, temp_file)
+            os.replace(temp_file, body_path)
+        else:
+            write_atomic(body_path, response.read(), "wb")
+        write_atomic(meta_path, entry)
+    except OSError:
+        return None
+    evict()
+    return entry
+
+
+def refresh_entry(url, entry, response):
+    """304 响应：用新的缓存头更新元数据"""
+    headers = dict(entry["headers"])
+    for name in STORED_HEADERS:
+        if response.headers.get(name):
+            headers[name] = response.headers[name]
+    entry["headers"] = headers
+    entry["fresh_until"] = freshness_deadline(response.headers)
+    try:
+        write_atomic(entry_paths(url)[0], entry)
+    except OSError:
+        pass
+    return entry
+
+
+def touch(url):
+    """记录最近使用时间（淘汰按正文文件的修改时间）"""
+    try:
+        os.utime(entry_paths(url)[1])
+    except OSError:
+        pass
+
+
+def entry_headers(entry):
+    headers = email.message.Message()
+    for name, value in entry.get("headers", {}).items():
+        headers[name] = value
+    return headers
+
+
+def cached_response(url, entry, cache_status):
+    with open(entry_paths(url)[1], "rb") as f:
+        content = f.read()
+    touch(url)
+    return CachedResponse(
+        entry["status"],
+        entry.get("reason", "OK"),
+        entry_headers(entry),
+        url,
+        content,
+        cache_status,
+    )
+
+
+def evict():
+    """缓存超过上限时按最近使用时间淘汰"""
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    bodies = []
+    total = 0
+    for name in names:
+        if not name.endswith(".body"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        bodies.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    for _, size, path in sorted(bodies):
+        if total <= MAX_CACHE_BYTES:
+            break
+        for victim in (path, path[: -len(".body")] + ".json"):
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+        total -= size
+
+
+def conditional_headers(headers, entry):
+    """在请求头上加上条件请求头"""
+    headers = dict(headers or {})
+    stored = entry.get("headers", {})
+    if stored.get("ETag"):
+        headers["If-None-Match"] = stored["ETag"]
+    if stored.get("Last-Modified"):
+        headers["If-Modified-Since"] = stored["Last-Modified"]
+    return headers
+
+
+def bypasses_cache(headers):
+    names = {name.lower() for name in (headers or {})}
+    return "range" in names or "authorization" in names
+
+
+def revalidate(url, headers, timeout, refresh, stream):
+    """
+    查缓存并在需要时发请求
+
+    Returns:
+        tuple: (缓存条目或 None, 响应)，响应为 None 表示直接使用缓存
+    """
+    entry = None if bypasses_cache(headers) else load_entry(url)
+    if entry and not refresh and entry.get("fresh_until", 0) > time.time():
+        return entry, None
+
+    request_headers = conditional_headers(headers, entry) if entry else headers
+    try:
+        response = get(url, headers=request_headers, timeout=timeout, stream=stream)
+    except HTTPError:
+        if entry:
+            return entry, "stale"
+        raise
+    return entry, response
+
+
+def fetch(url, headers=None, timeout=None, refresh=False):
+    """
+    带缓存的 GET 请求，状态码 >= 400 时抛出 HTTPError
+
+    Args:
+        refresh: 忽略新鲜度，强制向服务端验证
+
+    Returns:
+        CachedResponse
+    """
+    entry, response = revalidate(url, headers, timeout, refresh, stream=False)
+    if response is None:
+        return cached_response(url, entry, "hit")
+    if response == "stale":
+        return cached_response(url, entry, "stale")
+    if response.status == 304 and entry:
+        refresh_entry(url, entry, response)
+        return cached_response(url, entry, "revalidated")
+    if response.status >= 400:
+        raise HTTPError(
+            f"HTTP Error {response.status}: {response.reason}", response.status, url
+        )
+
+    content = response.read()
+    cache_status = "bypass"
+    if not bypasses_cache(headers) and is_storable(response):
+        if len(content) <= MAX_ENTRY_BYTES and save_entry(url, response):
+            cache_status = "miss"
+    return CachedResponse(
+        response.status, response.reason, response.headers, url, content, cache_status
+    )
+
+
+def iter_cached(url, headers=None, timeout=None, refresh=False):
+    """
+    带缓存的流式 GET：逐块返回正文，调用方可以随时停止读取
+
+    从网络读取时边读边写临时文件，完整读完才存入缓存；
+    中途停止时连接关闭，已读的部分丢弃。
+    """
+    entry, response = revalidate(url, headers, timeout, refresh, stream=True)
+    body_path = entry_paths(url)[1]
+    if isinstance(response, Response) and response.status == 304 and entry:
+        refresh_entry(url, entry, response)
+        response.close()
+        response = None
+
+    # 新鲜缓存、304 或网络出错时的过期缓存：从磁盘读
+    if not isinstance(response, Response):
+        touch(url)
+        with open(body_path, "rb") as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+                yield chunk
+        return
+
+    with response:
+        if response.status >= 400:
+            raise HTTPError(
+                f"HTTP Error {response.status}: {response.reason}",
+                response.status,
+                url,
+            )
+        if bypasses_cache(headers) or not is_storable(response):
+            yield from response.iter_content()
+            return
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_file = f"{body_path}.{os.getpid()}.{threading.get_ident()}.part"
+        size = 0
+        completed = False
+        try:
+            with open(temp_file, "wb") as f:
+                for chunk in response.iter_content():
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if completed and size <= MAX_ENTRY_BYTES:
+                save_entry(url, response, body_file=temp_file)
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+
+def download(url, output, headers=None, timeout=None, refresh=False):
+    """
+    带缓存的下载：缓存命中时从磁盘复制，否则流式写入 output 后再存入缓存
+
+    Returns:
+        str: 缓存状态
+    """
+    entry, response = revalidate(url, headers, timeout, refresh, stream=True)
+    if response is None or response == "stale":
+        shutil.copyfile(entry_paths(url)[1], output)
+        touch(url)
+        return "hit" if response is None else "stale"
+
+    with response:
+        if response.status == 304 and entry:
+            refresh_entry(url, entry, response)
+            shutil.copyfile(entry_paths(url)[1], output)
+            touch(url)
+            return "revalidated"
+        if response.status >= 400:
+            raise HTTPError(
+                f"HTTP Error {response.status}: {response.reason}",
+                response.status,
+                url,
+            )
+        with open(output, "wb") as f:
+            for chunk in response.iter_content():
+                f.write(chunk)
+
+    if bypasses_cache(headers) or not is_storable(response):
+        return "bypass"
+    if os.path.getsize(output) > MAX_ENTRY_BYTES:
+        return "bypass"
+    return "miss" if save_entry(url, response, body_file=output) else "bypass"
+
+
+def cache_stats():
+    """缓存条目数和总大小"""
+    count = 0
+    total = 0
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(".body"):
+                count += 1
+                total += os.path.getsize(os.path.join(CACHE_DIR, name))
+    return {"entries": count, "bytes": total}
+
+
+# 测试
+if __name__ == "__main__":
+    import sys
+
+    print("=== HTTP 缓存 ===")
+    target = sys.argv[1] if len(sys.argv) > 1 else "https://example.com/"
+    for i in range(2):
+        try:
+            response = fetch(target)
+            print(
+                f"  第{i + 1}次: {response.status} {response.cache_status} "
+                f"{len(response.read())}字节"
+            )
+        except HTTPError as e:
+            print(f"  第{i + 1}次: {e}")
+    print(f"缓存: {cache_stats()}")
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 客户端 - 仓颉造字计划
+搜(sou)、读(du)、取(qu) 和仓颉(cangjie) 共用的 HTTP 客户端，基于 http.client。
+每个主机一个连接池，连接保持 keep-alive，同一主机的后续请求不再重新握手；
+自动解压 gzip/deflate，跟随重定向，并限制每个主机的最大连接数。
+和 urllib 一样使用环境变量中的代理（http_proxy / https_proxy / no_proxy）。
+同一进程（包括行的工作进程）中加载的技能共用同一组连接池。
+"""
+
+import ssl
+import time
+import zlib
+import base64
+import threading
+import http.client
+import urllib.request
+from urllib.parse import unquote, urljoin, urlsplit, urlunsplit
+
+TIMEOUT = 15
+MAX_REDIRECTS = 5
+# 每个主机同时打开的最大连接数
+MAX_CONNECTIONS = 4
+# 空闲连接超过这个时间（秒）就不再复用，服务端多半已经关掉了
+IDLE_TIMEOUT = 30
+READ_CHUNK = 64 * 1024
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "*/*",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+# 复用的连接可能已被服务端关闭，这些错误在复用连接上出现时换新连接重试一次
+STALE_ERRORS = (ConnectionError, http.client.BadStatusLine)
+
+_pools = {}
+_pools_lock = threading.Lock()
+_ssl_context = None
+
+
+class HTTPError(OSError):
+    """网络错误或 HTTP 错误状态（status 为 None 表示没有拿到响应）"""
+
+    def __init__(self, message, status=None, url=None):
+        super().__init__(message)
+        self.status = status
+        self.url = url
+
+
+class DeflateDecoder:
+    """deflate 解码：服务端可能发送带 zlib 头的数据，也可能是裸 deflate"""
+
+    def __init__(self):
+        self._decoder = zlib.decompressobj()
+        self._first = True
+
+    def decompress(self, data):
+        if self._first:
+            self._first = False
+            try:
+                return self._decoder.decompress(data)
+            except zlib.error:
+                self._decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._decoder.decompress(data)
+
+    def flush(self):
+        return self._decoder.flush()
+
+
+def make_decoder(encoding):
+    """按 Content-Encoding 创建增量解码器（不需要解码时返回 None）"""
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return DeflateDecoder()
+    return None
+
+
+def ssl_context():
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def proxy_for(scheme, host):
+    """
+    按环境变量为这个主机选择代理（规则同 urllib），不走代理时返回 None
+
+    Returns:
+        tuple: (代理主机, 端口, 发给代理的请求头)
+    """
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    parts = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    if parts.scheme != "http" or not parts.hostname:
+        raise HTTPError(f"Unsupported proxy: {proxy}")
+    headers = {}
+    if parts.username:
+        credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+        token = base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+        headers["Proxy-Authorization"] = f"Basic {token}"
+    return parts.hostname, parts.port or 80, headers
+
+
+class ConnectionPool:
+    """
+    单个主机的连接池
+
+    有代理时 http 请求发给代理（请求行中是完整 URL），
+    https 请求先通过代理 CONNECT 建立隧道，隧道连接同样保持 keep-alive。
+    """
+
+    def __init__(
+        self, scheme, host, port, max_connections=MAX_CONNECTIONS, proxy=None
+    ):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.proxy = proxy
+        self.idle = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.created = 0
+        self.reused = 0
+
+    @property
+    def forwarding(self):
+        """请求是否由 http 代理转发（而不是经隧道直接发给主机）"""
+        return self.proxy is not None and self.scheme == "http"
+
+    def new_connection(self, timeout):
+        host, port = self.proxy[:2] if self.proxy else (self.host, self.port)
+        if self.scheme == "https":
+            conn = http.client.HTTPSConnection(
+                host, port, timeout=timeout, context=ssl_context()
+            )
+            if self.proxy:
+                conn.set_tunnel(self.host, self.port, headers=self.proxy[2])
+            return conn
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def acquire(self, timeout):
+        """
+        取一个连接：优先复用空闲连接，连接数已满时等待其他请求释放
+
+        Returns:
+            tuple: (连接, 是否复用)
+        """
+        if not self.slots.acquire(timeout=timeout):
+            raise HTTPError(f"Connection pool exhausted: {self.host}")
+
+        with self.lock:
+            while self.idle:
+                conn, released = self.idle.pop()
+                if time.monotonic() - released < IDLE_TIMEOUT:
+                    self.reused += 1
+                    return conn, True
+                conn.close()
+            self.created += 1
+        return self.new_connection(timeout), False
+
+    def release(self, conn, reusable):
+        """归还连接：响应已读完且服务端没有要求关闭时放回空闲列表"""
+        if reusable:
+            with self.lock:
+                self.idle.append((conn, time.monotonic()))
+        else:
+            conn.close()
+        self.slots.release()
+
+    def close(self):
+        with self.lock:
+            for conn, _ in self.idle:
+                conn.close()
+            self.idle = []
+
+
+def get_pool(scheme, host, port):
+    """主机的连接池（代理在创建连接池时按当时的环境变量确定）"""
+    key = (scheme, host, port)
+    with _pools_lock:
+        if key not in _pools:
+            proxy = proxy_for(scheme, host)
+            _pools[key] = ConnectionPool(scheme, host, port, MAX_CONNECTIONS, proxy)
+        return _pools[key]
+
+
+def configure(max_connections=None, timeout=None):
+    """调整每个主机的最大连接数和默认超时（只影响之后新建的连接池）"""
+    global MAX_CONNECTIONS, TIMEOUT
+    if max_connections:
+        MAX_CONNECTIONS = max(1, int(max_connections))
+    if timeout:
+        TIMEOUT = timeout
+
+
+def close_all():
+    """关闭所有空闲连接"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """各主机新建和复用的连接数"""
+    with _pools_lock:
+        return {
+            f"{p.scheme}://{p.host}:{p.port}": {
+                "created": p.created,
+                "reused": p.reused,
+            }
+            for p in _pools.values()
+        }
+
+
+class Response:
+    """
+    HTTP 响应
+
+    非流式请求返回时正文已经读完，连接已归还；
+    流式请求要读完 iter_content() 或调用 close() 才会归还连接。
+    """
+
+    def __init__(self, pool, conn, raw, url, method):
+        self.status = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers
+        self.url = url
+        self.history = []
+        self._pool = pool
+        self._conn = conn
+        self._raw = raw
+        self._content = None
+        self._released = False
+        if method == "HEAD":
+            self._decoder = None
+        else:
+            self._decoder = make_decoder(raw.headers.get("Content-Encoding"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _release(self, reusable):
+        if self._released:
+            return
+        self._released = True
+        reusable = reusable and not self._raw.will_close
+        self._raw.close()
+        self._pool.release(self._conn, reusable)
+
+    def close(self):
+        """提前结束读取（未读完的连接不再复用）"""
+        self._release(False)
+
+    def iter_content(self, chunk_size=READ_CHUNK):
+        """逐块读取解码后的正文"""
+        if self._content is not None:
+            yield self._content
+            return
+
+        completed = False
+        try:
+            while True:
+                chunk = self._raw.read1(chunk_size)
+                if not chunk:
+                    break
+                if self._decoder:
+                    chunk = self._decoder.decompress(chunk)
+                if chunk:
+                    yield chunk
+            # 连接提前断开时 read1() 也返回空，按 Content-Length 检查是否读完
+            if self._raw.length:
+                raise http.client.IncompleteRead(b"", self._raw.length)
+            if self._decoder:
+                tail = self._decoder.flush()
+                if tail:
+                    yield tail
+            completed = True
+        except (http.client.HTTPException, OSError, zlib.error) as e:
+            raise HTTPError(f"Network error: {e}", self.status, self.url) from e
+        finally:
+            self._release(completed)
+
+    def read(self):
+        """读取全部正文（解码后的 bytes）"""
+        if self._content is None:
+            self._content = b"".join(self.iter_content())
+        return self._content
+
+    def charset(self, default="utf-8"):
+        content_type = self.headers.get("Content-Type", "")
+        for part in content_type.split(";")[1:]:
+            name, _, value = part.strip().partition("=")
+            if name.lower() == "charset" and value:
+                return value.strip("\"' ")
+        return default
+
+    def text(self, encoding=None, errors="replace"):
+        """正文文本，默认按 Content-Type 中的编码（没有时用 UTF-8）"""
+        try:
+            return self.read().decode(encoding or self.charset(), errors=errors)
+        except LookupError:
+            return self.read().decode("utf-8", errors=errors)
+
+
+def merge_headers(headers):
+    """在默认请求头上叠加调用方的请求头（名称不区分大小写）"""
+    merged = {k.lower(): (k, v) for k, v in DEFAULT_HEADERS.items()}
+    for name, value in (headers or {}).items():
+        if value is None:
+            merged.pop(name.lower(), None)
+        else:
+            merged[name.lower()] = (name, value)
+    return dict(merged.values())
+
+
+def send(method, url, headers, body, timeout):
+    """发送一次请求（不处理重定向）"""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise HTTPError(f"Unsupported URL: {url}", url=url)
+
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    pool = get_pool(parts.scheme, parts.hostname, port)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    if pool.forwarding:
+        netloc = parts.netloc.rpartition("@")[2]
+        path = urlunsplit((parts.scheme, netloc, parts.path or "/", parts.query, ""))
+        headers = {**headers, **pool.proxy[2]}
+
+    for attempt in range(2):
+        conn, reused = pool.acquire(timeout)
+        try:
+            conn.timeout = timeout
+            if conn.sock:
+                conn.sock.settimeout(timeout)
+            conn.request(method, path, body=body, headers=headers)
+            raw = conn.getresponse()
+        except (http.client.HTTPException, OSError) as e:
+            pool.release(conn, False)
+            if reused and attempt == 0 and isinstance(e, STALE_ERRORS):
+                continue
+            raise HTTPError(f"Network error: {e}", url=url) from e
+        return Response(pool, conn, raw, url, method)
+
+
+def request(
+    method,
+    url,
+    headers=None,
+    body=None,
+    timeout=None,
+    stream=False,
+    max_redirects=MAX_REDIRECTS,
+):
+    """
+    发送请求并跟随重定向
+
+    Args:
+        headers: 额外的请求头，值为 None 表示去掉同名的默认请求头
+        stream: 为 True 时不预先读取正文，由调用方 iter_content() 或 read()
+
+    Returns:
+        Response: 任何状态码都返回响应，不抛出 HTTPError（网络错误除外）
+    """
+    timeout = timeout or TIMEOUT
+    merged = merge_headers(headers)
+    history = []
+
+    while True:
+        response = send(method, url, merged, body, timeout)
+        location = response.headers.get("Location")
+        if response.status not in REDIRECT_CODES or not location:
+            break
+        if len(history) >= max_redirects:
+            response.close()
+            raise HTTPError(f"Too many redirects: {url}", response.status, url)
+
+        # 重定向响应的正文很小，读完以便复用连接
+        response.read()
+        history.append(response)
+        url = urljoin(url, location)
+        if response.status == 303 or (
+            response.status in (301, 302) and method not in ("GET", "HEAD")
+        ):
+            method, body = "GET", None
+
+    response.history = history
+    if not stream:
+        response.read()
+    return response
+
+
+def get(url, headers=None, timeout=None, stream=False):
+    return request("GET", url, headers=headers, timeout=timeout, stream=stream)
+
+
+def fetch(url, headers=None, timeout=None, stream=False):
+    """GET 请求，状态码 >= 400 时抛出 HTTPError"""
+    response = get(url, headers=headers, timeout=timeout, stream=stream)
+    if response.status >= 400:
+        response.close()
+        raise HTTPError(
+            f"HTTP Error {response.status}: {response.reason}", response.status, url
+        )
+    return response
+
+
+# 测试
+if __name__ == "__main__":
+    import sys
+
+    print("=== HTTP 客户端 ===")
+    target = sys.argv[1] if len(sys.argv) > 1 else "https://example.com/"
+    for i in range(3):
+        started = time.time()
+        try:
+            response = fetch(target)
+            print(
+                f"  第{i + 1}次: {response.status} {len(response.read())}字节 "
+                f"{time.time() - started:.3f}s"
+            )
+        except HTTPError as e:
+            print(f"  第{i + 1}次: {e}")
+    print(f"连接池: {pool_stats()}")
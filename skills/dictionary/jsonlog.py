@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结构化日志 - 仓颉造字计划
+记(ji) 的日志写入器：每条记录是一行 JSON（JSON Lines），先攒在内存缓冲中，
+缓冲满了或调用 flush() 时一次写入；文件保持打开，不再每条记录打开、关闭一次。
+日志文件超过大小上限或跨过时间周期（按小时 / 按天）时轮转，
+轮转出的旧文件可以用 gzip 压缩，超过保留个数的旧文件自动删除。
+"""
+
+import os
+import re
+import json
+import gzip
+import time
+import shutil
+import atexit
+import threading
+from datetime import datetime
+
+# 缓冲超过这么多字节时写入文件
+BUFFER_BYTES = 64 * 1024
+
+# 默认的轮转条件和保留的旧文件个数（0 表示不删除）
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+# 按时间轮转的周期（同一周期内的记录写在同一个文件中）
+ROTATE_INTERVALS = {"hourly": "%Y%m%d%H", "daily": "%Y%m%d"}
+
+LEVELS = ("debug", "info", "warning", "error", "critical")
+
+# 常见的级别别名；其他不认识的级别原样记录，不让记录日志失败
+LEVEL_ALIASES = {
+    "trace": "debug",
+    "information": "info",
+    "notice": "info",
+    "warn": "warning",
+    "err": "error",
+    "fatal": "critical",
+    "crit": "critical",
+}
+
+# 轮转出的旧文件: <日志文件>.<最后写入时间>[.<序号>][.gz]
+ROTATED_SUFFIX = re.compile(r"^\.(\d{8}-\d{6})(?:\.(\d+))?(?:\.gz)?$")
+
+
+def make_record(message, level="info", fields=None):
+    """
+    一条日志记录：时间、级别、消息，以及附加字段（不覆盖前三项）
+    """
+    level = str(level or "info").strip().lower() or "info"
+    level = LEVEL_ALIASES.get(level, level)
+    record = dict(fields or {})
+    record.update(
+        {
+            "time": datetime.now().astimezone().isoformat(timespec="milliseconds"),
+            "level": level,
+            "message": message,
+        }
+    )
+    return record
+
+
+class JsonLogWriter:
+    """一个日志文件的带缓冲写入器（线程安全）"""
+
+    def __init__(
+        self,
+        path,
+        max_bytes=MAX_BYTES,
+        when=None,
+        backup_count=BACKUP_COUNT,
+        compress=False,
+    ):
+        if when and when not in ROTATE_INTERVALS:
+            raise ValueError(f"Unsupported rotation interval: {when}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.when = when
+        self.backup_count = backup_count
+        self.compress = compress
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.pending = 0
+        self.fd = None
+        self.period = None
+        self.rotated = []
+
+    def configure(
+        self, max_bytes=MAX_BYTES, when=None, backup_count=BACKUP_COUNT, compress=False
+    ):
+        """更新轮转设置（同一个文件被不同设置的调用共用时以最近一次为准）"""
+        if when and when not in ROTATE_INTERVALS:
+            raise ValueError(f"Unsupported rotation interval: {when}")
+        with self.lock:
+            self.max_bytes = max_bytes
+            self.when = when
+            self.backup_count = backup_count
+            self.compress = compress
+
+    def write(self, record):
+        """加入缓冲，缓冲满时写入文件"""
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        line = line.encode("utf-8")
+        with self.lock:
+            self.buffer.append(line)
+            self.pending += len(line)
+            if self.pending >= BUFFER_BYTES:
+                self._flush()
+        return len(line)
+
+    def flush(self):
+        """
+        把缓冲写入文件
+
+        Returns:
+            list: 本次轮转出的旧文件
+        """
+        with self.lock:
+            self._flush()
+            rotated, self.rotated = self.rotated, []
+        return rotated
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+    def _period(self, timestamp):
+        return time.strftime(ROTATE_INTERVALS[self.when], time.localtime(timestamp))
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        self.fd = os.open(self.path, flags, 0o644)
+        # 已有的日志属于它最后一次写入时的周期
+        stat = os.fstat(self.fd)
+        self.period = stat.st_mtime if stat.st_size else time.time()
+
+    def _should_rotate(self):
+        stat = os.fstat(self.fd)
+        if not stat.st_size:
+            return False
+        if self.max_bytes and stat.st_size + self.pending > self.max_bytes:
+            return True
+        if self.when and self._period(self.period) != self._period(time.time()):
+            return True
+        return False
+
+    def _reopen_if_moved(self):
+        """其他进程已经轮转过（文件被改名或删除）时重新打开"""
+        try:
+            moved = not os.path.samestat(os.fstat(self.fd), os.stat(self.path))
+        except OSError:
+            moved = True
+        if moved:
+            os.close(self.fd)
+            self._open()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        if self.fd is None:
+            self._open()
+        else:
+            self._reopen_if_moved()
+
+        if self._should_rotate():
+            self.rotated.append(self._rotate())
+
+        data = b"".join(self.buffer)
+        self.buffer = []
+        self.pending = 0
+        view = memoryview(data)
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+        self.period = time.time()
+
+    def _rotate(self):
+        """把当前文件改名为带时间的旧文件，打开新文件"""
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.period))
+        # 同一秒内多次轮转时序号接着已有的最大序号往后排，不重用被删掉的名字，
+        # 否则新文件会排在最前面被当成最旧的删掉
+        counts = [
+            order[1] for order, _ in rotated_entries(self.path) if order[0] == stamp
+        ]
+        if counts:
+            target = f"{self.path}.{stamp}.{max(counts) + 1}"
+        else:
+            target = f"{self.path}.{stamp}"
+        os.close(self.fd)
+        self.fd = None
+        os.replace(self.path, target)
+        self._open()
+        if self.compress:
+            target = compress_file(target)
+        self._prune()
+        return target
+
+    def _prune(self):
+        """只保留最近的 backup_count 个旧文件"""
+        if not self.backup_count:
+            return
+        for path in rotated_files(self.path)[: -self.backup_count]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def compress_file(path):
+    """gzip 压缩旧日志（边读边压缩），完成后删除原文件"""
+    target = path + ".gz"
+    temp_file = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(path, "rb") as source, gzip.open(temp_file, "wb") as output:
+            shutil.copyfileobj(source, output)
+        os.replace(temp_file, target)
+    except OSError:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        return path
+    os.remove(path)
+    return target
+
+
+def rotated_entries(path):
+    """日志文件轮转出的旧文件: [((时间, 序号), 路径)]，从旧到新排列"""
+    directory = os.path.dirname(path) or "."
+    name = os.path.basename(path)
+    found = []
+    for entry in os.listdir(directory):
+        match = ROTATED_SUFFIX.match(entry[len(name) :])
+        if entry.startswith(name) and match:
+            order = (match.group(1), int(match.group(2) or 0))
+            found.append((order, os.path.join(directory, entry)))
+    return sorted(found)
+
+
+def rotated_files(path):
+    """日志文件轮转出的旧文件，按文件名中的时间和序号从旧到新排列"""
+    return [p for _, p in rotated_entries(path)]
+
+
+# 同一进程中每个日志文件共用一个写入器（在工作进程中连续记录时文件保持打开）
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path, **options):
+    key = os.path.abspath(path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = JsonLogWriter(path, **options)
+        elif options:
+            writer.configure(**options)
+    return writer
+
+
+@atexit.register
+def close_all():
+    """进程退出时写入所有缓冲"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        try:
+            writer.close()
+        except OSError:
+            pass
+
+
+# 测试
+if __name__ == "__main__":
+    import tempfile
+
+    print("=== 结构化日志 ===")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "logs.jsonl")
+        writer = JsonLogWriter(path, max_bytes=256 * 1024, compress=True)
+        started = time.time()
+        for i in range(20000):
+            writer.write(make_record(f"第{i}条", fields={"step": i}))
+        writer.close()
+        elapsed = (time.time() - started) * 1000
+        print(f"20000条记录, {elapsed:.0f}ms")
+        for name in sorted(os.listdir(directory)):
+            print(f"  {name}: {os.path.getsize(os.path.join(directory, name))}")
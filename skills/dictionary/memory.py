@@ -84,6 +84,38 @@ def learn_failure(requirement, intent, plan, error):
     save_memory(memory)
 
 
+def record_skill_runs(results):
+    """
+    记录每一步技能的耗时与成败（供成本规划使用）
+
+    合并到工作进程中执行的步骤（fused）没有进程启动开销，
+    记在 fused_runs / fused_time / fused_errors 中，不计入成本规划用的 runs / total_time。
+    """
+    if not results:
+        return
+
+    memory = load_memory()
+
+    for r in results:
+        skill_name = r.get("skill", "")
+        if not skill_name:
+            continue
+        if skill_name not in memory["skills"]:
+            memory["skills"][skill_name] = {"success": 0, "failed": 0}
+        stats = memory["skills"][skill_name]
+        if r.get("fused"):
+            runs_key, time_key, errors_key = "fused_runs", "fused_time", "fused_errors"
+        else:
+            runs_key, time_key, errors_key = "runs", "total_time", "errors"
+        stats[runs_key] = stats.get(runs_key, 0) + 1
+        total_time = stats.get(time_key, 0.0) + r.get("elapsed", 0.0)
+        stats[time_key] = round(total_time, 3)
+        if r.get("status") != "success":
+            stats[errors_key] = stats.get(errors_key, 0) + 1
+
+    save_memory(memory)
+
+
 def get_suggested_skills(requirement):
     """根据历史推荐技能"""
     memory = load_memory()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+计划优化 - 仓颉造字计划
+在策制定计划之后、行执行之前，对计划做一次整理：
+1. 去掉重复步骤和空操作步骤
+2. 把相邻的可进程内执行的步骤合并成一次调用
+3. 把互相独立的网络步骤提前并发执行
+4. 按成本调整执行顺序
+"""
+
+import json
+
+try:
+    from planner import chain_cost
+except ImportError:
+
+    def chain_cost(chain, stats=None):
+        return float(len(chain))
+
+
+# --- 技能特性 ---
+# 技能必需的输入：每组里至少有一个键有值
+REQUIRED_INPUTS = {
+    "sou": [("keywords",)],
+    "du": [("source", "sources")],
+    "qu": [("url",), ("output",)],
+    "xie": [("description", "text")],
+    "cun": [("content", "items"), ("path", "directory", "items")],
+    "yun": [("code",)],
+    "ji": [("message", "messages")],
+    "yi_mem": [("content", "query")],
+}
+
+# 需要联网的技能
+NETWORK_SKILLS = {"sou", "qu"}
+
+# 可以在同一个工作进程里直接调用 execute() 的技能
+IN_PROCESS_SKILLS = {
+    "xie",
+    "yun",
+    "cun",
+    "bi",
+    "lian",
+    "yi",
+    "gai",
+    "mu",
+    "pei",
+    "wen",
+    "ji",
+}
+
+# 表示"取上一步结果"的占位符（${data.results} 这样取其中一项的也算）
+PLACEHOLDERS = ("${data}", "__FROM_CONTEXT_DATA_RESULT__")
+
+
+def is_placeholder(value):
+    """是否为引用上一步结果的占位符"""
+    if not isinstance(value, str):
+        return False
+    return value in PLACEHOLDERS or (value.startswith("${data.") and value[-1] == "}")
+
+
+def missing_inputs(step):
+    """返回步骤缺少的必需输入（占位符视为会由上一步提供）"""
+    step_input = step.get("input") or {}
+    missing = []
+    for keys in REQUIRED_INPUTS.get(step.get("skill", ""), []):
+        if not any(step_input.get(k) not in (None, "") for k in keys):
+            missing.append("/".join(keys))
+    return missing
+
+
+def is_independent(step):
+    """步骤是否不依赖上一步的结果"""
+    step_input = step.get("input") or {}
+    if any(is_placeholder(v) for v in step_input.values()):
+        return False
+    return step.get("skill", "") in REQUIRED_INPUTS and not missing_inputs(step)
+
+
+def is_network(step):
+    """步骤是否需要联网"""
+    skill = step.get("skill", "")
+    if skill in NETWORK_SKILLS:
+        return True
+    if skill != "du":
+        return False
+    step_input = step.get("input") or {}
+    for source in step_input.get("sources") or [step_input.get("source", "")]:
+        if isinstance(source, dict):
+            source = source.get("source", "")
+        if str(source).startswith(("http://", "https://")):
+            return True
+    return False
+
+
+def step_key(step):
+    """用于判断重复步骤的键"""
+    return json.dumps(
+        [step.get("skill", ""), step.get("input") or {}],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+
+
+def remove_redundant(plan, changes):
+    """去掉重复步骤和空操作步骤"""
+    kept = []
+    seen = set()
+    for step in plan:
+        skill = step.get("skill", "")
+        label = f"步骤{step['step']}({skill})"
+
+        if not skill:
+            changes.append(f"移除空操作 {label}: 没有技能名")
+            continue
+
+        missing = missing_inputs(step)
+        if missing:
+            changes.append(f"移除空操作 {label}: 缺少 {', '.join(missing)}")
+            continue
+
+        # 只有不依赖上一步的步骤才能按输入判重
+        if is_independent(step):
+            key = step_key(step)
+            if key in seen:
+                changes.append(f"移除重复 {label}")
+                continue
+            seen.add(key)
+
+        kept.append(step)
+    return kept
+
+
+def split_segments(plan):
+    """
+    把计划切成互不依赖的片段
+
+    每个片段以一个独立步骤开头，后面跟着依赖上一步结果的步骤，
+    片段之间可以自由调整顺序。
+    """
+    segments = []
+    for step in plan:
+        if not segments or is_independent(step):
+            segments.append([step])
+        else:
+            segments[-1].append(step)
+    return segments
+
+
+def fuse_segment(segment, changes):
+    """把片段内相邻的可进程内执行的步骤合并成一次调用"""
+    fused = []
+    run = []
+
+    def flush():
+        if len(run) > 1:
+            skills = "→".join(s["skill"] for s in run)
+            steps = ",".join(str(s["step"]) for s in run)
+            changes.append(f"合并步骤 {steps} ({skills}) 为一次调用")
+            fused.append(
+                {"step": run[0]["step"], "group": "fused", "steps": list(run)}
+            )
+        else:
+            fused.extend(run)
+        run.clear()
+
+    for step in segment:
+        if step["skill"] in IN_PROCESS_SKILLS:
+            run.append(step)
+        else:
+            flush()
+            fused.append(step)
+    flush()
+    return fused
+
+
+def optimize_plan(plan, stats=None):
+    """
+    优化执行计划
+
+    Args:
+        plan: 策生成的计划
+        stats: 技能统计 (memory.get_skill_stats() 的返回值)
+
+    Returns:
+        tuple: (优化后的计划, 修改说明列表)
+    """
+    if not plan or not isinstance(plan, list):
+        return plan, []
+
+    changes = []
+
+    # 统一步骤编号，行按编号还原原始顺序
+    numbered = []
+    for i, step in enumerate(plan, 1):
+        step = dict(step)
+        step["step"] = i
+        numbered.append(step)
+
+    # 1. 去重 / 去空操作
+    steps = remove_redundant(numbered, changes)
+    if not steps:
+        return numbered, changes + ["优化后计划为空，保留原计划"]
+
+    # 2. 切分片段，独立的单步网络请求并发执行
+    segments = split_segments(steps)
+    network = [s for s in segments if len(s) == 1 and is_network(s[0])]
+    if len(network) > 1:
+        segments = [s for s in segments if s not in network]
+        labels = ", ".join(f"{s[0]['step']}({s[0]['skill']})" for s in network)
+        changes.append(f"并发执行网络步骤 {labels}")
+    else:
+        network = []
+
+    # 3. 按成本排序（稳定排序，成本相同保持原顺序）
+    ordered = sorted(
+        segments, key=lambda seg: chain_cost([s["skill"] for s in seg], stats)
+    )
+    if ordered != segments:
+        order = " → ".join("+".join(str(s["step"]) for s in seg) for seg in ordered)
+        changes.append(f"按成本调整顺序: {order}")
+
+    # 4. 组装：并发网络组在前，其余片段内合并进程内步骤
+    optimized = []
+    if network:
+        optimized.append(
+            {
+                "step": network[0][0]["step"],
+                "group": "parallel",
+                "steps": [s[0] for s in network],
+            }
+        )
+    for segment in ordered:
+        optimized.extend(fuse_segment(segment, changes))
+
+    return optimized, changes
+
+
+# 测试
+if __name__ == "__main__":
+    print("=== 计划优化 ===")
+    demo_plan = [
+        {"skill": "du", "input": {"source": "https://example.com/a"}},
+        {"skill": "du", "input": {"source": "https://example.com/b"}},
+        {"skill": "du", "input": {"source": "https://example.com/a"}},
+        {"skill": "xie", "input": {"description": "写个计算器"}},
+        {"skill": "yun", "input": {"code": "__FROM_CONTEXT_DATA_RESULT__"}},
+        {"skill": "cun", "input": {"path": "a.py"}},
+    ]
+    new_plan, notes = optimize_plan(demo_plan)
+    for note in notes:
+        print(f"  - {note}")
+    print(json.dumps(new_plan, ensure_ascii=False, indent=2))
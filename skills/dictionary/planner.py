@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成本规划 - 仓颉造字计划
+根据技能的实测耗时与成功率，从多条候选技能链中选出期望完成时间最短的一条
+"""
+
+# --- 默认估计（没有历史数据时使用） ---
+# 网络技能往返慢，本地技能基本只有进程启动开销
+DEFAULT_LATENCY = {
+    "sou": 3.0,
+    "du": 2.0,
+    "qu": 5.0,
+    "ting": 4.0,
+    "jian": 10.0,
+    "yun": 1.0,
+}
+LOCAL_LATENCY = 0.3
+
+# 成功率的先验（相当于预先看到 1 次成功、1 次失败）
+PRIOR_SUCCESS = 1
+PRIOR_FAILED = 1
+
+# 成功率下限，避免全失败的技能得到无穷大的成本
+MIN_SUCCESS_RATE = 0.05
+
+
+def skill_estimate(skill, stats=None):
+    """
+    估计单个技能的耗时与成功率
+
+    Args:
+        skill: 技能名
+        stats: 技能统计 (memory.get_skill_stats() 的返回值)
+
+    Returns:
+        tuple: (平均耗时秒数, 成功率)
+    """
+    info = (stats or {}).get(skill, {})
+
+    runs = info.get("runs", 0)
+    if runs and info.get("total_time") is not None:
+        latency = info["total_time"] / runs
+    else:
+        latency = DEFAULT_LATENCY.get(skill, LOCAL_LATENCY)
+
+    # 优先使用逐步执行的统计，其次是整条计划的成败统计
+    if runs:
+        success = runs - info.get("errors", 0)
+        failed = info.get("errors", 0)
+    else:
+        success = info.get("success", 0)
+        failed = info.get("failed", 0)
+
+    rate = (success + PRIOR_SUCCESS) / (
+        success + failed + PRIOR_SUCCESS + PRIOR_FAILED
+    )
+    return latency, max(rate, MIN_SUCCESS_RATE)
+
+
+def chain_cost(chain, stats=None):
+    """
+    计算技能链的期望完成时间
+
+    一次尝试耗时为各步耗时之和，整条链成功的概率为各步成功率之积；
+    失败后整条链重试，期望完成时间 = 单次耗时 / 成功概率。
+    """
+    attempt_time = 0.0
+    success_rate = 1.0
+    for skill in chain:
+        latency, rate = skill_estimate(skill, stats)
+        attempt_time += latency
+        success_rate *= rate
+
+    return attempt_time / success_rate
+
+
+def choose_chain(candidates, stats=None):
+    """
+    从候选技能链中选择期望完成时间最短的一条
+
+    成本相同时保留候选列表中靠前的技能链。
+
+    Returns:
+        tuple: (技能链, 期望完成时间)，没有候选时返回 ([], 0.0)
+    """
+    best_chain, best_cost = [], 0.0
+    for chain in candidates:
+        if not chain:
+            continue
+        cost = chain_cost(chain, stats)
+        if not best_chain or cost < best_cost:
+            best_chain, best_cost = list(chain), cost
+
+    return best_chain, best_cost
+
+
+# 测试
+if __name__ == "__main__":
+    print("=== 成本规划 ===")
+    demo_stats = {
+        "bi": {"runs": 10, "errors": 4, "total_time": 3.0},
+        "lian": {"runs": 10, "errors": 0, "total_time": 4.0},
+    }
+    for chain in (["bi"], ["lian"], ["sou", "du"]):
+        print(f"{chain}: {chain_cost(chain, demo_stats):.2f}s")
+    print(f"选择: {choose_chain([['bi'], ['lian']], demo_stats)}")
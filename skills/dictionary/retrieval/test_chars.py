@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 单字技能检测工具
-检测所有单字技能是否可用
+检测所有单字技能是否可用，并用保存的页面（fixtures）检查共享的解析模块
 """
 
 import os
@@ -19,6 +19,19 @@ if sys.platform == "win32":
 # 获取字符目录 - 向上两级到 dictionary
 chars_dir = os.path.join(os.path.dirname(__file__), "..", "characters")
 
+# 能力登记：依赖不齐全的技能直接跳过，不再启动进程试错
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+try:
+    from capability import is_available, missing_dependencies
+except ImportError:
+
+    def is_available(skill):
+        return True
+
+    def missing_dependencies(skill):
+        return []
+
+
 # 测试用例
 TEST_CASES = {
     "sou": {"keywords": "test"},
@@ -52,6 +65,10 @@ def test_char(char_name):
     if not os.path.exists(main_py):
         return {"status": "not_found", "message": "main.py not found"}
 
+    if not is_available(char_name):
+        missing = ", ".join(missing_dependencies(char_name))
+        return {"status": "unavailable", "message": f"Missing: {missing}"}
+
     test_input = TEST_CASES.get(char_name, {})
 
     try:
@@ -79,6 +96,40 @@ def test_char(char_name):
         return {"status": "error", "message": str(e)}
 
 
+# 保存的百度结果页：5 条结果，其中第 3 条与第 2 条规范化后是同一个地址
+SEARCH_FIXTURE = os.path.join(chars_dir, "sou", "fixtures", "baidu_results.html")
+
+
+def test_search_fixture():
+    """用保存的结果页检查 htmlparse.parse_results：提前停止、去重、摘要"""
+    from htmlparse import normalize_url, parse_results
+
+    with open(SEARCH_FIXTURE, "rb") as f:
+        page = f.read()
+
+    def chunks():
+        return (page[i : i + 512] for i in range(0, len(page), 512))
+
+    # 取够条数就停止读取，不读完整个页面
+    results, consumed = parse_results(chunks(), 2, exclude_hosts=["baidu.com"])
+    assert len(results) == 2, results
+    assert consumed < len(page), f"读取了整个页面: {consumed}/{len(page)}"
+
+    # 规范化后相同的地址只保留一条，百度自己的链接被排除
+    results, consumed = parse_results(chunks(), 10, exclude_hosts=["baidu.com"])
+    assert consumed == len(page)
+    urls = [normalize_url(r["url"]) for r in results]
+    assert len(results) == 4, urls
+    assert len(set(urls)) == len(urls), urls
+    assert not any("baidu.com" in url for url in urls), urls
+
+    # 每条结果都有标题和摘要
+    for r in results:
+        assert r["title"].strip(), r
+        assert r["snippet"].strip(), r
+    return len(results)
+
+
 def main():
     print("=" * 60)
     print("单字技能检测报告")
@@ -122,6 +173,13 @@ def main():
     for char in results["not_found"]:
         print(f"  - {char}")
 
+    print("\n📄 页面解析 (fixtures):")
+    try:
+        count = test_search_fixture()
+        print(f"  - baidu_results.html: 通过（{count} 条结果）")
+    except AssertionError as e:
+        print(f"  - baidu_results.html: 失败 {e}")
+
     print("\n" + "=" * 60)
 
 
@@ -15,10 +15,20 @@ import sys
 import json
 import subprocess
 import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- 自我学习模块 ---
 try:
-    from memory import learn_success, learn_failure, get_suggested_skills
+    from memory import (
+        learn_success,
+        learn_failure,
+        get_suggested_skills,
+        get_skill_stats,
+        record_skill_runs,
+    )
 
     HAS_MEMORY = True
 except ImportError:
@@ -33,6 +43,51 @@ except ImportError:
     def get_suggested_skills(*args, **kwargs):
         return None
 
+    def get_skill_stats(*args, **kwargs):
+        return {}
+
+    def record_skill_runs(*args, **kwargs):
+        pass
+
+
+# --- 成本规划模块 ---
+try:
+    from planner import choose_chain
+
+    HAS_PLANNER = True
+except ImportError:
+    HAS_PLANNER = False
+
+
+# --- 能力登记模块 ---
+try:
+    from capability import is_available, missing_dependencies
+except ImportError:
+
+    def is_available(*args, **kwargs):
+        return True
+
+    def missing_dependencies(*args, **kwargs):
+        return []
+
+
+# --- 计划优化模块 ---
+try:
+    from optimizer import optimize_plan
+
+    HAS_OPTIMIZER = True
+except ImportError:
+    HAS_OPTIMIZER = False
+
+
+# --- 修复缓存模块 ---
+try:
+    from fixcache import record_result as record_fix_result, store_fix
+
+    HAS_FIX_CACHE = True
+except ImportError:
+    HAS_FIX_CACHE = False
+
 
 # --- 交付模块 ---
 try:
@@ -60,6 +115,11 @@ except ImportError:
 
 # --- 配置 ---
 MAX_LOOPS = 5
+# 修复候选并发试运行时复制到各自临时目录的当前目录文件总量上限，以及不复制的目录
+RACE_COPY_LIMIT = 32 * 1024 * 1024
+RACE_SKIP_DIRS = (".git", "__pycache__", "node_modules", ".cache", ".venv", "venv")
+# 计划中表示"取上一步结果"的占位符
+CODE_PLACEHOLDERS = ("${data}", "__FROM_CONTEXT_DATA_RESULT__")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 SKILLS = {
@@ -100,57 +160,109 @@ def run_skill(skill_name, params):
         if result.returncode != 0:
             return {"status": "error", "message": stdout or "Execution failed"}
 
-        return json.loads(stdout)
+        # 最后一行是结果（如运的 stream 模式先逐行输出程序的输出）
+        lines = stdout.strip().splitlines()
+        return json.loads(lines[-1] if lines else "")
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
-def detect_complex_intent(requirement):
-    """检测复杂意图，自动组合技能链"""
+# --- 复杂意图规则 ---
+# 按优先级排列：(需要同时满足的需求, 可以完成该需求的候选技能链)
+# 同一条规则下的多条候选链由成本规划按期望耗时挑选
+COMPLEX_INTENT_RULES = [
+    (("read", "compare"), [["du", "bi"]]),  # 读取多个来源后对比
+    (("compare",), [["bi"]]),
+    (("search", "save"), [["sou", "cun"]]),
+    (("search", "read"), [["sou", "du"]]),
+    (("write", "run"), [["xie", "yun"]]),  # 运行优先于单纯写作
+    (("write", "save"), [["xie", "cun"]]),
+    (("search",), [["sou"]]),  # 仅搜索
+    (("write",), [["xie"]]),  # 仅写作
+    (("read",), [["du"]]),
+    (("draw",), [["hua"]]),
+    (("run",), [["xie", "yun"]]),  # 生成代码并运行
+    (("send",), [["fa"]]),
+    (("remember",), [["ji"], ["yi_mem"]]),
+    (("control",), [["kong"]]),
+]
+
+
+def detect_needs(requirement):
+    """检测需求中包含的动作"""
     req = requirement
+    needs = {
+        "search": "搜" in req or "索" in req or "找" in req,
+        "read": "读" in req or "看" in req or "打开" in req,
+        "write": "写" in req or "生成" in req or "创建" in req,
+        "save": "保存" in req or "存" in req or "写入" in req,
+        "run": "运" in req or "行" in req or "跑" in req or "编" in req or "程" in req,
+        "compare": "比" in req or "比较" in req or "对比" in req or "分析" in req,
+        "draw": "画" in req or "图" in req,
+        "send": "发" in req or "送" in req,
+        "remember": "记" in req or "忆" in req,
+        "control": "控" in req or "制" in req,
+    }
+    return {name for name, hit in needs.items() if hit}
 
-    # 检测需要多步骤的场景
-    has_search = "搜" in req or "索" in req or "找" in req
-    has_read = "读" in req or "看" in req or "打开" in req
-    has_write = "写" in req or "生成" in req or "创建" in req
-    has_save = "保存" in req or "存" in req or "写入" in req
-    has_run = "运" in req or "行" in req or "跑" in req or "编" in req or "程" in req
-    has_compare = "比" in req or "比较" in req or "对比" in req or "分析" in req
-
-    # 返回技能链 - 运行优先于单纯写作
-    chain = []
-    if has_compare:
-        chain = ["bi"]
-    elif has_search and has_save:
-        chain = ["sou", "cun"]
-    elif has_search and has_read:
-        chain = ["sou", "du"]
-    elif has_write and has_run:
-        chain = ["xie", "yun"]  # 生成代码并运行
-    elif has_write and has_save:
-        chain = ["xie", "cun"]
-    elif has_search:
-        chain = ["sou"]  # 仅搜索
-    elif has_write:
-        chain = ["xie"]  # 仅写作
-    elif has_read:
-        chain = ["du"]
-    elif has_compare:
-        chain = ["bi"]
-    elif "画" in req or "图" in req:
-        chain = ["hua"]
-    elif has_run:
-        chain = ["xie", "yun"]  # 生成代码并运行
-    elif "发" in req or "送" in req:
-        chain = ["fa"]  # 需要自动创建
-    elif "记" in req or "忆" in req:
-        chain = ["ji"]  # 需要自动创建
-    elif "控" in req or "制" in req:
-        chain = ["kong"]  # 需要自动创建
-    else:
-        chain = ["sou"]  # 默认搜索
 
-    return chain
+def detect_complex_intent(requirement):
+    """检测复杂意图，自动组合技能链"""
+    needs = detect_needs(requirement)
+
+    candidates = [["sou"]]  # 默认搜索
+    for required, chains in COMPLEX_INTENT_RULES:
+        if all(n in needs for n in required):
+            candidates = chains
+            break
+
+    # 跳过依赖不齐全、当前环境无法运行的技能链
+    runnable = [c for c in candidates if all(is_available(s) for s in c)]
+    if not runnable:
+        for skill in sorted({s for c in candidates for s in c if not is_available(s)}):
+            print(f"[CAP] {skill} 缺少依赖: {', '.join(missing_dependencies(skill))}")
+        return []
+    candidates = runnable
+
+    # 在候选技能链中选择期望完成时间最短的一条
+    if HAS_PLANNER and len(candidates) > 1:
+        stats = get_skill_stats() if HAS_MEMORY else {}
+        chain, cost = choose_chain(candidates, stats)
+        print(f"[PLAN] 候选 {candidates} -> {chain} (预计 {cost:.1f}s)")
+        return chain
+
+    return list(candidates[0])
+
+
+def read_input(entities, requirement=""):
+    """
+    读(du) 的输入：实体中的所有文件和 URL（去重，按在需求中出现的顺序）
+
+    只有一个来源时用 source，多个时用 sources 让读一步并发读取全部来源。
+    """
+    values = []
+    for e in entities or []:
+        value = e.get("value", "")
+        if e.get("type") in ["file", "url"] and value and value not in values:
+            values.append(value)
+    # 按在需求中出现的位置排序（找不到的排在最后）
+    order = {v: requirement.find(v) for v in values}
+    values.sort(key=lambda v: order[v] if order[v] >= 0 else len(requirement))
+    if len(values) > 1:
+        return {"sources": values}
+    return {"source": values[0]} if values else {}
+
+
+def save_input(previous):
+    """
+    存(cun) 的输入：搜索结果每条存成 output/ 下的一个文件（一次调用并发写入），
+    生成的代码存为 output.txt，其他结果存为 JSON
+    """
+    if previous == "sou":
+        return {"items": "${data.results}", "directory": "output"}
+    if previous == "xie":
+        return {"content": "${data.result}", "path": "output.txt"}
+    return {"content": "${data}", "path": "output.txt"}
 
 
 def smart_plan(intent, entities, constraints, requirement):
@@ -158,7 +270,7 @@ def smart_plan(intent, entities, constraints, requirement):
     # 首先尝试从历史中学习 - 如果有相似的成功案例，直接使用
     if HAS_MEMORY:
         suggested_skills = get_suggested_skills(requirement)
-        if suggested_skills:
+        if suggested_skills and all(is_available(s) for s in suggested_skills):
             print(f"[MEMORY] 使用历史成功模式: {suggested_skills}")
             # 从历史技能链构建计划
             plan = []
@@ -172,13 +284,10 @@ def smart_plan(intent, entities, constraints, requirement):
                 elif skill == "xie":
                     auto_input = {"description": requirement, "text": requirement}
                 elif skill == "du":
-                    if entities:
-                        for e in entities:
-                            if e.get("type") in ["file", "url"]:
-                                auto_input = {"source": e.get("value", "")}
-                                break
+                    auto_input = read_input(entities, requirement)
                 elif skill == "cun":
-                    auto_input = {"content": "${data}", "path": "output.txt"}
+                    previous = suggested_skills[i - 2] if i > 1 else None
+                    auto_input = save_input(previous)
                 elif skill == "yun":
                     auto_input = {
                         "code": "__FROM_CONTEXT_DATA_RESULT__",
@@ -208,15 +317,11 @@ def smart_plan(intent, entities, constraints, requirement):
             elif skill == "xie":
                 auto_input = {"description": requirement, "text": requirement}
             elif skill == "du":
-                # 从实体中提取文件/URL
-                if entities:
-                    for e in entities:
-                        if e.get("type") in ["file", "url"]:
-                            auto_input = {"source": e.get("value", "")}
-                            break
+                # 从实体中提取文件/URL，多个时一步并发读取
+                auto_input = read_input(entities, requirement)
             elif skill == "cun":
-                # 自动生成保存路径
-                auto_input = {"content": "${data}", "path": "output.txt"}
+                # 按上一步的结果决定保存方式
+                auto_input = save_input(skill_chain[i - 2] if i > 1 else None)
             elif skill == "yun":
                 # 运行代码 - 从上一步(xie)的输出获取代码
                 # xie输出在 data.result 中
@@ -227,6 +332,10 @@ def smart_plan(intent, entities, constraints, requirement):
                 }
             elif skill == "bi":
                 auto_input = {"action": "compare", "text1": requirement, "text2": ""}
+            elif skill == "ji":
+                auto_input = {"message": requirement}
+            elif skill == "yi_mem":
+                auto_input = {"content": requirement}
 
             plan.append(
                 {
@@ -249,6 +358,127 @@ def smart_plan(intent, entities, constraints, requirement):
     return []
 
 
+def executed_code(plan, execution_data):
+    """取出实际交给运执行的代码（计划里是占位符时，从上一步的输出中取）"""
+    for index, step in enumerate(plan, 1):
+        if step.get("skill") != "yun":
+            continue
+        code = step.get("input", {}).get("code", "")
+        if code and code not in CODE_PLACEHOLDERS:
+            return code
+
+        # 结果按步骤编号记录，取运之前最后一个给出代码的步骤
+        for result in reversed(execution_data.get("results", [])):
+            output = result.get("output")
+            if result.get("step", 0) >= index or not isinstance(output, dict):
+                continue
+            data = output.get("data")
+            if isinstance(data, dict) and isinstance(data.get("result"), str):
+                return data["result"]
+        return ""
+    return ""
+
+
+def snapshot(directory):
+    """目录中每个文件的 (大小, 修改时间)，用于找出运行后新建或修改的文件"""
+    files = {}
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = [d for d in dirs if d not in RACE_SKIP_DIRS]
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files[os.path.relpath(path, directory)] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def copy_inputs(source, target):
+    """
+    把当前目录的文件复制到候选的临时目录，修复后的代码照样能读到相对路径的文件
+
+    Returns:
+        dict | None: 复制后的快照；当前目录太大不适合复制时为 None
+    """
+    files = snapshot(source)
+    total = 0
+    for relative in files:
+        total += files[relative][0]
+        if total > RACE_COPY_LIMIT:
+            return None
+    for relative in files:
+        path = os.path.join(target, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy2(os.path.join(source, relative), path)
+    return snapshot(target)
+
+
+def copy_changes(source, before, target):
+    """只把运行中新建或修改的文件复制回来"""
+    for relative, state in snapshot(source).items():
+        if before.get(relative) != state:
+            path = os.path.join(target, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copy2(os.path.join(source, relative), path)
+
+
+def trial_candidate(code, expectations, workdir=None):
+    """由运执行一个候选、再由验验证，返回 (运的输出, 是否通过)"""
+    output = run_skill("yun", {"code": code, "language": "python", "workdir": workdir})
+    if output.get("status") != "success":
+        return output, False
+    yan_result = run_skill("yan", {"result": output, "expectations": expectations})
+    return output, yan_result.get("data", {}).get("passed", False)
+
+
+def race_candidates(candidates, expectations):
+    """
+    并发试运行多个修复候选
+
+    每个候选在独立的临时目录中（复制了当前目录的文件）由运执行、再由验验证，
+    第一个通过验证的候选胜出，它新建或修改的文件复制回当前目录。
+    当前目录太大不适合复制时，在当前目录中依次试运行。
+
+    Returns:
+        tuple | None: (胜出的代码, 运的输出)，全部失败时为 None
+    """
+    cwd = os.getcwd()
+    scratch = [tempfile.mkdtemp(prefix="cangjie_fix_") for _ in candidates]
+    before = [copy_inputs(cwd, path) for path in scratch]
+    if any(state is None for state in before):
+        for path in scratch:
+            shutil.rmtree(path, ignore_errors=True)
+        for code in candidates:
+            output, passed = trial_candidate(code, expectations)
+            if passed:
+                return code, output
+        return None
+
+    def trial(index):
+        output, passed = trial_candidate(candidates[index], expectations, scratch[index])
+        return index, output, passed
+
+    def cleanup():
+        # 等落后的候选跑完（运有超时）再删除它们的目录
+        pool.shutdown(wait=True, cancel_futures=True)
+        for path in scratch:
+            shutil.rmtree(path, ignore_errors=True)
+
+    pool = ThreadPoolExecutor(max_workers=len(candidates))
+    try:
+        futures = [pool.submit(trial, i) for i in range(len(candidates))]
+        for future in as_completed(futures):
+            index, output, passed = future.result()
+            if passed:
+                copy_changes(scratch[index], before[index], cwd)
+                return candidates[index], output
+        return None
+    finally:
+        # 胜出后不必等落后的候选，清理放到后台
+        threading.Thread(target=cleanup, name="race-cleanup").start()
+
+
 def auto_execute(requirement, expectations=None):
     """自动执行闭环"""
     if expectations is None:
@@ -257,59 +487,85 @@ def auto_execute(requirement, expectations=None):
     loop_count = 0
     current_plan = None
     final_result = None
+    # 修给出的重试计划，以及其中使用的修复代码（验证后回填修复缓存）
+    retry_plan = None
+    applied_fix = None
 
     while loop_count < MAX_LOOPS:
         loop_count += 1
         print(f"\n=== Loop {loop_count}/{MAX_LOOPS} ===")
 
-        # Step 1: Dong
-        dong_result = run_skill("dong", {"requirement": requirement})
-        if dong_result.get("status") != "success":
-            print(f"[FAIL] Dong: {dong_result.get('message')}")
-            # 记忆失败模式
-            if HAS_MEMORY:
-                learn_failure(
-                    requirement, {"type": "dong_failed"}, [], dong_result.get("message")
-                )
-            return {"status": "error", "message": "Failed at Dong", "loops": loop_count}
-
-        intent_data = dong_result.get("data", {})
-        if not isinstance(intent_data, dict):
-            intent_data = {
-                "intent": {"type": "execute"},
-                "entities": [],
-                "constraints": {},
-            }
+        if retry_plan:
+            # 按修给出的计划重试，不再重新理解需求和制定计划
+            current_plan, retry_plan = retry_plan, None
+            print(
+                f"[OK] retry plan={len(current_plan)} steps: "
+                f"{[s['skill'] for s in current_plan]}"
+            )
+        else:
+            # Step 1: Dong
+            dong_result = run_skill("dong", {"requirement": requirement})
+            if dong_result.get("status") != "success":
+                print(f"[FAIL] Dong: {dong_result.get('message')}")
+                # 记忆失败模式
+                if HAS_MEMORY:
+                    learn_failure(
+                        requirement,
+                        {"type": "dong_failed"},
+                        [],
+                        dong_result.get("message"),
+                    )
+                return {
+                    "status": "error",
+                    "message": "Failed at Dong",
+                    "loops": loop_count,
+                }
+
+            intent_data = dong_result.get("data", {})
+            if not isinstance(intent_data, dict):
+                intent_data = {
+                    "intent": {"type": "execute"},
+                    "entities": [],
+                    "constraints": {},
+                }
 
-        intent = intent_data.get("intent", {})
-        entities = intent_data.get("entities", [])
-        constraints = intent_data.get("constraints", {})
-        print(f"[OK] intent={intent.get('type')}")
+            intent = intent_data.get("intent", {})
+            entities = intent_data.get("entities", [])
+            constraints = intent_data.get("constraints", {})
+            print(f"[OK] intent={intent.get('type')}")
 
-        # Step 2: Smart Plan
-        current_plan = smart_plan(intent, entities, constraints, requirement)
-        print(
-            f"[OK] plan={len(current_plan)} steps: {[s['skill'] for s in current_plan]}"
-        )
+            # Step 2: Smart Plan
+            current_plan = smart_plan(intent, entities, constraints, requirement)
+            print(
+                f"[OK] plan={len(current_plan)} steps: {[s['skill'] for s in current_plan]}"
+            )
 
-        if not current_plan:
-            # 记忆失败模式
-            if HAS_MEMORY:
-                learn_failure(requirement, intent, [], "No plan generated")
-            return {
-                "status": "error",
-                "message": "No plan generated",
-                "loops": loop_count,
-            }
+            if not current_plan:
+                # 记忆失败模式
+                if HAS_MEMORY:
+                    learn_failure(requirement, intent, [], "No plan generated")
+                return {
+                    "status": "error",
+                    "message": "No plan generated",
+                    "loops": loop_count,
+                }
+
+        # Step 3: Optimize + Xing
+        exec_plan = current_plan
+        if HAS_OPTIMIZER:
+            exec_plan, changes = optimize_plan(current_plan, get_skill_stats())
+            for change in changes:
+                print(f"[OPT] {change}")
 
-        # Step 3: Xing
         xing_result = run_skill(
-            "xing", {"plan": current_plan, "context": {"requirement": requirement}}
+            "xing", {"plan": exec_plan, "context": {"requirement": requirement}}
         )
         xing_status = xing_result.get("status", "error")
 
         # Step 4: Check execution results
         execution_data = xing_result.get("data", {})
+        if HAS_MEMORY:
+            record_skill_runs(execution_data.get("results", []))
         final_output = execution_data.get("final_output", xing_result)
 
         # 检查最终输出是否有错误（代码执行失败）
@@ -318,12 +574,13 @@ def auto_execute(requirement, expectations=None):
             error_data = final_output.get("data", {})
             error_msg = error_data.get("error", "")
 
-            # 从当前计划中提取代码
-            original_code = ""
-            for step in current_plan:
-                if step.get("skill") == "yun":
-                    original_code = step.get("input", {}).get("code", "")
-                    break
+            # 上一轮的修复执行失败，回填修复缓存
+            if HAS_FIX_CACHE and applied_fix:
+                record_fix_result(applied_fix, False)
+            applied_fix = None
+
+            # 取出实际执行的代码
+            original_code = executed_code(current_plan, execution_data)
 
             # 获取修复后的代码
             error_info = {
@@ -343,10 +600,39 @@ def auto_execute(requirement, expectations=None):
             xiu_data = xiu_result.get("data", {})
             fixed_code = xiu_data.get("fixed_code")
 
-            if xiu_data.get("can_retry"):
+            # 有多个修复候选时并发试运行，第一个通过验证的直接作为本轮结果
+            winner = None
+            candidates = xiu_data.get("candidates") or []
+            if xiu_data.get("can_retry") and len(candidates) > 1:
+                print(f"[RACE] 并发试运行 {len(candidates)} 个修复候选")
+                winner = race_candidates(candidates, expectations)
+                if winner:
+                    fixed_code, final_output = winner
+                    print(f"[RACE] 候选 {candidates.index(fixed_code) + 1} 通过验证")
+                    if HAS_FIX_CACHE and xiu_data.get("signature"):
+                        store_fix(xiu_data["signature"], original_code, fixed_code)
+                    applied_fix = fixed_code
+                    current_plan = [
+                        {
+                            "step": 1,
+                            "skill": "yun",
+                            "input": {"code": fixed_code, "language": "python"},
+                            "reason": "使用修复后的代码",
+                        }
+                    ]
+                else:
+                    print(f"[RACE] 所有候选都未通过")
+                    if HAS_FIX_CACHE:
+                        for candidate in candidates:
+                            record_fix_result(candidate, False)
+                    fixed_code = None
+                    xiu_data = {**xiu_data, "fixed_code": None, "new_plan": None}
+
+            if not winner and xiu_data.get("can_retry"):
                 if fixed_code:
                     # 直接使用修复后的代码，跳过xie
-                    current_plan = [
+                    applied_fix = fixed_code
+                    retry_plan = [
                         {
                             "step": 1,
                             "skill": "yun",
@@ -359,7 +645,7 @@ def auto_execute(requirement, expectations=None):
                     )
                     continue
                 elif xiu_data.get("new_plan"):
-                    current_plan = xiu_data["new_plan"]
+                    retry_plan = xiu_data["new_plan"]
                     print(f"[RETRY] Adjusted plan")
                     continue
                 else:
@@ -372,6 +658,11 @@ def auto_execute(requirement, expectations=None):
         )
         yan_data = yan_result.get("data", {})
 
+        # 回填上一轮修复是否通过验证
+        if HAS_FIX_CACHE and applied_fix:
+            record_fix_result(applied_fix, yan_data.get("passed"))
+        applied_fix = None
+
         if yan_data.get("passed"):
             print(f"[SUCCESS] {yan_data.get('summary')}")
             # 记忆成功模式
@@ -398,7 +689,8 @@ def auto_execute(requirement, expectations=None):
                 # 检查是否有修复后的代码或新计划
                 fixed_code = xiu_data.get("fixed_code")
                 if fixed_code:
-                    current_plan = [
+                    applied_fix = fixed_code
+                    retry_plan = [
                         {
                             "step": 1,
                             "skill": "yun",
@@ -410,7 +702,7 @@ def auto_execute(requirement, expectations=None):
                         f"[RETRY] Fixed: {xiu_data.get('suggested_fix', 'Auto-repaired')[:50]}"
                     )
                 elif xiu_data.get("new_plan"):
-                    current_plan = xiu_data["new_plan"]
+                    retry_plan = xiu_data["new_plan"]
                     print(f"[RETRY] Adjusted plan")
                 else:
                     print(f"[WARN] Can retry but no fix")
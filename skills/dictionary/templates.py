@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板库 - 仓颉造字计划
+写(xie) 的代码模板放在磁盘上的模板包里，每个模板带有元数据：
+语言、关键词、优先级、参数和示例输入。
+模板包在第一次使用时才加载，所有关键词编译成一个关键词自动机，
+扫描一遍描述就能选出模板，再用描述中提取的参数（文件名、端口、URL 等）渲染。
+模板包目录中 index.json 只有元数据，模板正文是单独的文件，选中后才读取，
+模板再多，每次生成代码也只读索引和一个模板文件。
+"""
+
+import os
+import re
+import json
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(BASE_DIR, "characters", "xie", "templates")
+
+DEFAULT_LANGUAGE = "python"
+FALLBACK_TEMPLATE = "hello"
+
+# 参数类型 → 从描述中提取的正则（取第一个分组）
+PARAMETER_PATTERNS = {
+    "url": re.compile(r"(https?://[^\s\"'<>，。；、）)\]]+)"),
+    "port": re.compile(r"(?:端口|port)\s*(?:号)?\s*(?:[:：=]|为|是)?\s*(\d{2,5})", re.I),
+    "filename": re.compile(
+        r"[\"'“「]([^\"'”」\s]+\.\w{1,5})[\"'”」]"
+        r"|(?<![\w/.\-])([A-Za-z0-9_\-]+\.(?:txt|json|csv|md|log|py|js|html"
+        r"|xml|yaml|yml|ini|cfg|dat))(?![\w.])"
+    ),
+    "name": re.compile(
+        r"(?:名为|名叫|叫做|叫|named|called)\s*[\"'“「]?([A-Za-z_]\w*)", re.I
+    ),
+}
+
+PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+
+# 模板包目录中的索引文件
+INDEX_FILE = "index.json"
+
+_library = None
+_bodies = {}
+
+
+class KeywordAutomaton:
+    """
+    多关键词匹配自动机 (Aho-Corasick)
+
+    扫描一遍文本就能找出所有命中的关键词，耗时与关键词数量无关。
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+    def add(self, word, value):
+        """登记关键词及其对应的值"""
+        state = 0
+        for ch in word:
+            if ch not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][ch] = len(self.goto) - 1
+            state = self.goto[state][ch]
+        self.output[state].append((word, value))
+
+    def build(self):
+        """按广度优先计算失败指针"""
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, target in self.goto[state].items():
+                queue.append(target)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[target] = self.goto[fallback].get(ch, 0)
+                if self.fail[target] == target:
+                    self.fail[target] = 0
+                self.output[target] = (
+                    self.output[target] + self.output[self.fail[target]]
+                )
+        return self
+
+    def search(self, text):
+        """逐个返回命中: (起始位置, 关键词, 值)"""
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for word, value in self.output[state]:
+                yield i - len(word) + 1, word, value
+
+
+def is_word_char(ch):
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+
+def whole_word(text, start, word):
+    """英文关键词要求两侧不是英文字母或数字（"js" 不命中 "json"），中文不限"""
+    end = start + len(word)
+    if is_word_char(word[0]) and start > 0 and is_word_char(text[start - 1]):
+        return False
+    if is_word_char(word[-1]) and end < len(text) and is_word_char(text[end]):
+        return False
+    return True
+
+
+def list_packs():
+    """
+    模板目录下的所有模板包（按名称排序，后加载的同名模板覆盖先加载的）
+
+    模板包可以是带 index.json 的目录（正文按需读取），也可以是单个 JSON 文件
+    （正文直接写在 body 字段里，适合少量模板）。
+    """
+    if not os.path.isdir(TEMPLATE_DIR):
+        return []
+    packs = []
+    for entry in sorted(os.listdir(TEMPLATE_DIR)):
+        path = os.path.join(TEMPLATE_DIR, entry)
+        if os.path.isfile(os.path.join(path, INDEX_FILE)):
+            packs.append(os.path.join(path, INDEX_FILE))
+        elif entry.endswith(".json") and os.path.isfile(path):
+            packs.append(path)
+    return packs
+
+
+def load_library():
+    """加载所有模板包的索引并编译关键词自动机（每个进程只做一次）"""
+    global _library
+    if _library is not None:
+        return _library
+
+    languages = {}
+    templates = {}
+    for path in list_packs():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                pack = json.load(f)
+        except (OSError, ValueError):
+            continue
+        pack_dir = os.path.dirname(path)
+        for language, meta in pack.get("languages", {}).items():
+            languages.setdefault(language, {"keywords": []})
+            languages[language]["keywords"].extend(meta.get("keywords", []))
+        for meta in pack.get("templates", []):
+            language = meta.get("language", DEFAULT_LANGUAGE)
+            languages.setdefault(language, {"keywords": []})
+            if "file" in meta:
+                meta["path"] = os.path.join(pack_dir, meta["file"])
+            templates[(language, meta["name"])] = meta
+
+    priorities = {}
+    for (language, name), meta in templates.items():
+        priority = meta.get("priority", 100)
+        priorities[name] = min(priorities.get(name, priority), priority)
+
+    automaton = KeywordAutomaton()
+    for language, meta in languages.items():
+        for word in meta["keywords"]:
+            automaton.add(word.lower(), ("language", language))
+    # 关键词按模板名登记：不同语言的同名模板共用关键词
+    for (language, name), meta in templates.items():
+        for word in meta.get("keywords", []):
+            automaton.add(word.lower(), ("template", name))
+
+    _library = {
+        "languages": languages,
+        "templates": templates,
+        "priorities": priorities,
+        "automaton": automaton.build(),
+    }
+    return _library
+
+
+def select_template(description):
+    """
+    根据描述选择模板
+
+    每个模板的得分是命中关键词的总长度，得分相同时按优先级（数字小的优先）。
+
+    Returns:
+        tuple: (语言, 模板名)
+    """
+    library = load_library()
+    text = str(description or "").lower()
+
+    languages = {}
+    scores = {}
+    for start, word, (kind, value) in library["automaton"].search(text):
+        if not whole_word(text, start, word):
+            continue
+        if kind == "language":
+            languages.setdefault(value, start)
+        else:
+            scores[value] = scores.get(value, 0) + len(word)
+
+    # 提到多种语言时取最先提到的
+    language = min(languages, key=languages.get) if languages else DEFAULT_LANGUAGE
+
+    priorities = library["priorities"]
+    ranked = sorted(scores, key=lambda n: (-scores[n], priorities.get(n, 100), n))
+    for name in ranked:
+        if (language, name) in library["templates"]:
+            return language, name
+    return language, FALLBACK_TEMPLATE
+
+
+def get_template(language, name):
+    """模板元数据（找不到时退回该语言的 hello 模板）"""
+    templates = load_library()["templates"]
+    return templates.get((language, name)) or templates.get(
+        (language, FALLBACK_TEMPLATE)
+    )
+
+
+def load_body(meta):
+    """读取模板正文（单独存放的正文第一次用到时才读取）"""
+    if "body" in meta:
+        return meta["body"]
+    path = meta.get("path")
+    if path not in _bodies:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+        except (OSError, TypeError):
+            content = ""
+        # 模板文件末尾的换行不属于正文
+        _bodies[path] = content[:-1] if content.endswith("\n") else content
+    return _bodies[path]
+
+
+def extract_parameters(description, spec):
+    """
+    从描述中提取模板参数，提取不到的使用默认值
+
+    Args:
+        spec: {参数名: {"kind": 参数类型, "default": 默认值, "index": 第几个匹配}}
+    """
+    text = str(description or "")
+    found = {}
+    values = {}
+    for name, meta in (spec or {}).items():
+        kind = meta.get("kind", name)
+        if kind not in found:
+            pattern = PARAMETER_PATTERNS.get(kind)
+            found[kind] = []
+            if pattern:
+                for match in pattern.finditer(text):
+                    found[kind].append(next(g for g in match.groups() if g))
+        index = meta.get("index", 0)
+        matches = found[kind]
+        values[name] = matches[index] if index < len(matches) else meta.get("default")
+    return values
+
+
+def render(template, parameters):
+    """把 {{参数名}} 替换为参数值，未知的占位符原样保留"""
+
+    def substitute(match):
+        value = parameters.get(match.group(1))
+        return match.group(0) if value is None else str(value)
+
+    return PLACEHOLDER.sub(substitute, template)
+
+
+def generate(description):
+    """
+    选择模板并渲染
+
+    Returns:
+        dict: {"code", "language", "template", "parameters", "inputs"}
+    """
+    language, name = select_template(description)
+    meta = get_template(language, name)
+    if not meta:
+        return {
+            "code": "# Generated code",
+            "language": language,
+            "template": None,
+            "parameters": {},
+            "inputs": None,
+        }
+
+    parameters = extract_parameters(description, meta.get("parameters"))
+    return {
+        "code": render(load_body(meta), parameters),
+        "language": language,
+        "template": meta["name"],
+        "parameters": parameters,
+        "inputs": meta.get("inputs"),
+    }
+
+
+# 测试
+if __name__ == "__main__":
+    print("=== 模板库 ===")
+    library = load_library()
+    print(f"模板包: {len(list_packs())}个, 模板: {len(library['templates'])}个")
+    samples = [
+        "写一个计算器",
+        "写一个web服务器，端口 9000",
+        "写代码读取 config.json",
+        "写一个js函数",
+        "请求 https://httpbin.org/get 的数据",
+    ]
+    for sample in samples:
+        result = generate(sample)
+        print(f"  {sample} -> {result['language']}/{result['template']}", end="")
+        print(f" {result['parameters']}" if result["parameters"] else "")
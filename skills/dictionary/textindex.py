@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全文索引 - 仓颉造字计划
+本地的全文索引，让搜(sou) 在离线时也能从我们自己的资料中找到结果。
+存(cun) 保存的文件会自动加入索引，读(du) 读取的网页和文件在 index 为 true 时加入，
+也可以手动索引整个目录。
+索引存放在 SQLite FTS5 中，按 BM25 排序；中文按相邻两字切分（二元分词），
+英文和数字按词切分，查询时使用同样的分词。
+"""
+
+import os
+import re
+import time
+import sqlite3
+
+from htmlparse import html_to_text, looks_like_html
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_FILE = os.path.join(BASE_DIR, ".cache", "textindex.db")
+
+# 单个文档最多索引的字符数，以及索引目录时跳过的大文件
+MAX_DOCUMENT_CHARS = 200_000
+MAX_FILE_BYTES = 1024 * 1024
+
+# 索引目录时收录的文件类型
+TEXT_EXTENSIONS = (
+    ".txt",
+    ".md",
+    ".rst",
+    ".py",
+    ".js",
+    ".json",
+    ".csv",
+    ".log",
+    ".html",
+    ".htm",
+    ".xml",
+    ".yaml",
+    ".yml",
+    ".ini",
+    ".cfg",
+)
+SKIP_DIRS = ("__pycache__", "node_modules", ".git", ".cache")
+
+SNIPPET_CHARS = 160
+
+# 标题的权重高于正文
+TITLE_WEIGHT = 2.0
+
+# 英文/数字词，或连续的中日韩文字
+TOKEN_PATTERN = re.compile(
+    r"[a-z0-9]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE NOT NULL,
+    title TEXT,
+    kind TEXT,
+    content TEXT,
+    mtime REAL,
+    updated REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS postings USING fts5(title, body);
+"""
+
+
+def tokenize(text):
+    """分词：英文和数字按词，中日韩文字按相邻两字（单字的片段保留单字）"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(str(text or "").lower()):
+        word = match.group(0)
+        if word[0].isascii():
+            tokens.append(word)
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def connect():
+    """打开索引（WAL 模式，多个技能进程可以同时读写）"""
+    os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
+    conn = sqlite3.connect(INDEX_FILE, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def default_title(source, content, kind):
+    """文件用文件名（Markdown 加上第一个标题），其他内容用第一行非空文字"""
+    lines = (line.strip() for line in str(content).splitlines())
+    if kind == "file":
+        name = os.path.basename(source)
+        if name.lower().endswith(".md"):
+            for line in lines:
+                if line.startswith("# "):
+                    return f"{name} - {line[2:].strip()}"[:80]
+        return name
+    for line in lines:
+        if line:
+            return line[:80]
+    return os.path.basename(source.rstrip("/")) or source
+
+
+def write_document(conn, source, content, title=None, kind="text", mtime=None):
+    """在调用方的事务中加入或更新一个文档"""
+    content = str(content or "")
+    # 网页只索引文字，标签和脚本不参与检索
+    if looks_like_html(content):
+        page_title, content = html_to_text(content)
+        title = title or page_title
+    content = content[:MAX_DOCUMENT_CHARS]
+    title = title or default_title(source, content, kind)
+    row = conn.execute(
+        "SELECT id FROM documents WHERE source = ?", (source,)
+    ).fetchone()
+    values = (title, kind, content, mtime, time.time())
+    if row:
+        doc_id = row[0]
+        conn.execute(
+            "UPDATE documents SET title = ?, kind = ?, content = ?, "
+            "mtime = ?, updated = ? WHERE id = ?",
+            values + (doc_id,),
+        )
+        conn.execute("DELETE FROM postings WHERE rowid = ?", (doc_id,))
+    else:
+        doc_id = conn.execute(
+            "INSERT INTO documents (source, title, kind, content, mtime, "
+            "updated) VALUES (?, ?, ?, ?, ?, ?)",
+            (source,) + values,
+        ).lastrowid
+    conn.execute(
+        "INSERT INTO postings (rowid, title, body) VALUES (?, ?, ?)",
+        (doc_id, " ".join(tokenize(title)), " ".join(tokenize(content))),
+    )
+    return doc_id
+
+
+def index_document(source, content, title=None, kind="text", mtime=None):
+    """
+    加入或更新一个文档（同一来源只保留最新的内容）
+
+    Args:
+        source: 文档来源（URL 或文件的绝对路径），作为文档的唯一标识
+    """
+    conn = connect()
+    try:
+        with conn:
+            return write_document(conn, source, content, title, kind, mtime)
+    finally:
+        conn.close()
+
+
+def index_documents(documents):
+    """
+    在一个事务中加入或更新多个文档（批量读取时只提交一次）
+
+    Args:
+        documents: [{"source", "content", "title"?, "kind"?}, ...]
+    """
+    conn = connect()
+    try:
+        with conn:
+            for document in documents:
+                write_document(
+                    conn,
+                    document["source"],
+                    document["content"],
+                    document.get("title"),
+                    document.get("kind", "text"),
+                )
+    finally:
+        conn.close()
+
+
+def remove_document(source):
+    conn = connect()
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT id FROM documents WHERE source = ?", (source,)
+            ).fetchone()
+            if row:
+                conn.execute("DELETE FROM postings WHERE rowid = ?", (row[0],))
+                conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+    finally:
+        conn.close()
+    return bool(row)
+
+
+def read_text_file(path, known_mtime=None):
+    """
+    读取要索引的文本文件
+
+    Returns:
+        tuple: (indexed / unchanged / skipped, 内容, 修改时间)
+    """
+    try:
+        stat = os.stat(path)
+        if stat.st_size > MAX_FILE_BYTES:
+            return "skipped", None, None
+        if known_mtime == stat.st_mtime:
+            return "unchanged", None, None
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return "indexed", f.read(), stat.st_mtime
+    except OSError:
+        return "skipped", None, None
+
+
+def index_file(path, known_mtime=None):
+    """
+    索引单个文本文件
+
+    Returns:
+        str: indexed / unchanged / skipped
+    """
+    status, content, mtime = read_text_file(path, known_mtime)
+    if status == "indexed":
+        index_document(path, content, kind="file", mtime=mtime)
+    return status
+
+
+def index_files(paths):
+    """
+    在一个事务中索引多个文本文件（批量保存时只提交一次）
+
+    Returns:
+        dict: {"indexed", "unchanged", "skipped"}
+    """
+    counts = {"indexed": 0, "unchanged": 0, "skipped": 0}
+    conn = connect()
+    try:
+        with conn:
+            for path in paths:
+                status, content, mtime = read_text_file(path)
+                if status == "indexed":
+                    write_document(conn, path, content, kind="file", mtime=mtime)
+                counts[status] += 1
+    finally:
+        conn.close()
+    return counts
+
+
+def index_directory(path, extensions=TEXT_EXTENSIONS):
+    """
+    索引目录中的文本文件（修改时间没变的文件跳过）；path 也可以是单个文件
+
+    Returns:
+        dict: {"indexed", "unchanged", "skipped"}
+    """
+    counts = {"indexed": 0, "unchanged": 0, "skipped": 0}
+    conn = connect()
+    try:
+        known = dict(conn.execute("SELECT source, mtime FROM documents"))
+    finally:
+        conn.close()
+
+    path = os.path.abspath(path)
+    if os.path.isfile(path):
+        counts[index_file(path, known.get(path))] += 1
+        return counts
+
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith(".")]
+        for name in files:
+            if name.lower().endswith(tuple(extensions)):
+                file_path = os.path.join(root, name)
+                counts[index_file(file_path, known.get(file_path))] += 1
+    return counts
+
+
+def make_snippet(content, tokens):
+    """摘要：从第一个命中的词附近截取一段"""
+    lowered = content.lower()
+    positions = [p for p in (lowered.find(t) for t in tokens) if p >= 0]
+    start = max(0, min(positions) - 40) if positions else 0
+    return " ".join(content[start : start + SNIPPET_CHARS * 2].split())[:SNIPPET_CHARS]
+
+
+def search(query, limit=10):
+    """
+    BM25 检索
+
+    Returns:
+        list: [{"title", "url", "snippet", "score", "kind"}]，url 为文档来源
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens or not os.path.exists(INDEX_FILE):
+        return []
+
+    match = " OR ".join(f'"{t}"' for t in tokens)
+    conn = connect()
+    try:
+        rows = conn.execute(
+            "SELECT d.source, d.title, d.kind, d.content, "
+            "bm25(postings, ?, 1.0) AS rank "
+            "FROM postings JOIN documents d ON d.id = postings.rowid "
+            "WHERE postings MATCH ? ORDER BY rank LIMIT ?",
+            (TITLE_WEIGHT, match, limit),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    return [
+        {
+            "title": title,
+            "url": source,
+            "snippet": make_snippet(content, tokens),
+            "score": round(-rank, 6),
+            "kind": kind,
+        }
+        for source, title, kind, content, rank in rows
+    ]
+
+
+def stats():
+    if not os.path.exists(INDEX_FILE):
+        return {"documents": 0}
+    conn = connect()
+    try:
+        count = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    finally:
+        conn.close()
+    return {"documents": count}
+
+
+# 测试
+if __name__ == "__main__":
+    import sys
+
+    print("=== 全文索引 ===")
+    if len(sys.argv) > 2 and sys.argv[1] == "index":
+        for directory in sys.argv[2:]:
+            print(f"索引 {directory}: {index_directory(directory)}")
+    elif len(sys.argv) > 2 and sys.argv[1] == "search":
+        started = time.time()
+        results = search(" ".join(sys.argv[2:]))
+        print(f"{len(results)}条结果, {(time.time() - started) * 1000:.1f}ms")
+        for r in results:
+            print(f"  [{r['score']}] {r['title']} | {r['url']}")
+            print(f"    {r['snippet'][:80]}")
+    else:
+        print("用法: python textindex.py index <目录>... | search <关键词>")
+    print(f"索引: {stats()}")